@@ -10,3 +10,10 @@
 
 from .skiplist import *
 from .dllist import *
+from .compact import *
+from .concurrent import *
+from .snapshot import *
+from .mapped import *
+from .merge import *
+from .memtable import *
+from .sorteddict import *
@@ -0,0 +1,1024 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import sys
+from array import array
+from operator import itemgetter
+from itertools import islice
+
+from .skiplist import SkipList, _unpickle, _dump_pairs, _load_pairs
+from .merge import _union, _intersection, _difference
+
+__all__ = ['CompactSkipList']
+
+
+# Array typecodes for the supported key types. The 'q' typecode for int64 keys
+# is not available before Python 3.3.
+
+_typecodes = {'float64': 'd'}
+
+try:
+    array('q')
+    _typecodes['int64'] = 'q'
+except ValueError:
+    pass
+
+
+# The following functions are debugging functions. They are available only when
+# Python is not started with -O.
+
+if __debug__:
+
+    def fmtnode(sl, node):
+        """Format a single skiplist node."""
+        level = sl._levels[node]
+        skip = '(none)' if level == 1 else sl._skips[node]
+        return '<Node(id={}, level={}, key={}, value={}, skip={})>' \
+                    .format(node, level, sl._keys[node], sl._values[node], skip)
+
+    def dump(sl, file=sys.stdout):
+        """Dump a skiplist to standard output."""
+        print('== Dumping skiplist {0!r}'.format(sl), file=file)
+        print('Level: {}/{}'.format(sl.level, sl.maxlevel), file=file)
+        print('Size: {}'.format(len(sl)), file=file)
+        print('Slots: {} ({} free)'.format(len(sl._keys),
+                    sum(len(free) for free in sl._free)), file=file)
+        node = sl._head
+        print('{0} (head)'.format(fmtnode(sl, node)), file=file)
+        node = sl._links[sl._offsets[node]]
+        avglvl = 0
+        while node != sl._tail:
+            print('{0}'.format(fmtnode(sl, node)), file=file)
+            avglvl += sl._levels[node]
+            node = sl._links[sl._offsets[node]]
+        print('{0} (tail)'.format(fmtnode(sl, node)), file=file)
+        print('Avg level: {:.2f}'.format(avglvl/len(sl)), file=file)
+        print('Avg node memory: {:.2f}'.format(getsize(sl)/len(sl)), file=file)
+        print(file=file)
+
+    def check(sl):
+        """Check the internal structure of a skiplist."""
+        keys, values, links, offsets, levels, skips = sl._keys, sl._values, \
+                sl._links, sl._offsets, sl._levels, sl._skips
+        head, tail = sl._head, sl._tail
+        nslots = len(keys)
+        assert len(values) == len(offsets) == len(levels) == len(skips) == nslots
+        level = sl.maxlevel
+        assert level > 0
+        while links[offsets[head]+level-1] == tail and level > 1:
+            level -= 1
+        assert level == sl.level
+        nokey = sl._nokey
+        assert keys[head] == nokey and values[head] is None
+        assert levels[head] == levels[tail] == sl.maxlevel
+        assert skips[head] == 0
+        pos = 0
+        node = head
+        inbound = {head: 0, tail: len(sl)}
+        seen = set()
+        while node != tail:
+            assert 0 <= node < nslots
+            assert node not in seen
+            seen.add(node)
+            level = min(sl.level, levels[node])
+            assert 1 <= level <= sl.maxlevel
+            for i in range(1, level):
+                fnode = links[offsets[node]+i]
+                flevel = min(sl.level, levels[fnode])
+                if i == flevel-1:
+                    inbound[fnode] = pos
+            if level > 1:
+                assert node in inbound
+                assert pos == inbound[node] + skips[node]
+            for i in range(level):
+                fnode = links[offsets[node]+i]
+                assert 0 <= fnode < nslots
+                assert levels[fnode] >= i+1
+            node = links[offsets[node]]
+            pos += 1
+        assert keys[tail] == nokey and values[tail] is None
+        assert pos == len(sl) + 1
+        assert len(sl) == inbound[tail] + skips[node]
+        # Every slot is either in use, or on the free list for its level.
+        free = set()
+        for level, nodes in enumerate(sl._free):
+            for node in nodes:
+                assert node not in seen and node not in free
+                assert node > tail and levels[node] == level
+                assert keys[node] == nokey and values[node] is None
+                free.add(node)
+        assert len(seen) + len(free) + 1 == nslots
+        # The cached path must be the search path to the node at the position
+        # in _distance[0], so that it can be used as a finger.
+        fpos = sl._distance[0]
+        lastnodes = [(head, 0)] * sl.level
+        node = links[offsets[head]]
+        pos = 1
+        while node != tail and pos <= fpos:
+            for i in range(min(sl.level, levels[node])):
+                lastnodes[i] = (node, pos)
+            node = links[offsets[node]]
+            pos += 1
+        for i in range(sl.level):
+            assert sl._path[i] == lastnodes[i][0]
+            assert sl._distance[i] == lastnodes[i][1]
+
+    def getsize(sl):
+        """Return total size of a skiplist."""
+        size = sys.getsizeof(sl)
+        size += sys.getsizeof(sl._level)
+        size += sys.getsizeof(sl._size)
+        for name in ('_keys', '_values', '_links', '_offsets', '_levels', '_skips'):
+            size += sys.getsizeof(getattr(sl, name))
+        if sl.keytype is None:
+            for key in sl._keys:
+                size += sys.getsizeof(key)
+        for value in sl._values:
+            size += sys.getsizeof(value)
+        size += sys.getsizeof(sl._free)
+        for free in sl._free:
+            size += sys.getsizeof(free)
+            for el in free:
+                size += sys.getsizeof(el)
+        size += sys.getsizeof(sl._path)
+        size += sys.getsizeof(sl._distance)
+        for el in sl._path + sl._distance:
+            size += sys.getsizeof(el)
+        return size
+
+
+class CompactSkipList(object):
+    """An indexable skip list with compact node storage.
+
+    This class has the same API as :class:`SkipList`, but it stores its nodes
+    differently. A node is an integer index into a number of parallel arrays:
+    a list of keys, a list of values, a flat ``array('l')`` containing the
+    forward links of all nodes, and arrays with the level, the offset of the
+    forward links, and the skip count of each node.
+
+    This uses about half the memory overhead per pair of a :class:`SkipList`,
+    and the nodes are not tracked by the cyclic garbage collector. The
+    downside is that most operations are somewhat slower. The slots of
+    removed nodes are reused by new nodes with the same level.
+
+    If *keytype* is ``'int64'`` or ``'float64'``, then the keys are stored
+    unboxed in an ``array`` of that type, which takes 8 bytes per key. All
+    keys must then be integers or floats respectively. Inserting another
+    type raises a ``TypeError``, and an integer that does not fit in 64 bits
+    raises an ``OverflowError``. The keys are returned as ``int`` or
+    ``float``. The ``'int64'`` key type requires Python 3.3 or later.
+
+    See :class:`SkipList` for *finger*.
+    """
+
+    UNSET = SkipList.UNSET
+
+    p = SkipList.p
+    maxlevel = SkipList.maxlevel
+
+    _rnd = SkipList._rnd
+
+    # The head and tail nodes are always the first two slots.
+    _head = 0
+    _tail = 1
+
+    _typecodes = _typecodes
+
+    __slots__ = ('_level', '_size', '_keys', '_values', '_links', '_offsets',
+                 '_levels', '_skips', '_free', '_path', '_distance', '_finger',
+                 '_keytype', '_nokey')
+
+    def __init__(self, finger=False, keytype=None):
+        if keytype == 'int64' and keytype not in self._typecodes:
+            raise ValueError('keytype int64 requires Python 3.3 or later')
+        if keytype is not None and keytype not in self._typecodes:
+            raise ValueError('unknown keytype: {!r}'.format(keytype))
+        self._keytype = keytype
+        # The key stored in the head, the tail and in free slots.
+        self._nokey = None if keytype is None else 0
+        self._level = 1
+        self._size = 0
+        self._init_nodes()
+        self._path = [self._head] * self.maxlevel
+        self._distance = [0] * self.maxlevel
+        self._finger = finger
+
+    def _init_nodes(self):
+        # Create the node arrays with just the head and the tail.
+        maxlevel = self.maxlevel
+        if self._keytype is None:
+            self._keys = [None, None]
+        else:
+            self._keys = array(self._typecodes[self._keytype], [0, 0])
+        self._values = [None, None]
+        self._links = array('l', [self._tail]*maxlevel + [-1]*maxlevel)
+        self._offsets = array('l', [0, maxlevel])
+        self._levels = array('B', [maxlevel, maxlevel])
+        self._skips = array('l', [0, 0])
+        self._free = [[] for i in range(maxlevel+1)]
+
+    def _new_node(self, level, key, value):
+        # Node layout: keys[node], values[node], levels[node], skips[node]
+        # and links[offsets[node]:offsets[node]+level]. The "skip" element
+        # indicates how many nodes are skipped by the highest level incoming
+        # link. It is not used for nodes with level 1.
+        # The key is stored first. For a typed key this may raise, and it
+        # must then leave the list unchanged.
+        free = self._free[level]
+        if free:
+            node = free[-1]
+            self._keys[node] = key
+            self._values[node] = value
+            free.pop()
+            return node
+        node = len(self._keys)
+        self._keys.append(key)
+        self._values.append(value)
+        self._offsets.append(len(self._links))
+        self._links.extend([-1]*level)
+        self._levels.append(level)
+        self._skips.append(0)
+        return node
+
+    def _free_node(self, node):
+        # Release the slot of a removed node so that it can be reused.
+        self._keys[node] = self._nokey
+        self._values[node] = None
+        self._free[self._levels[node]].append(node)
+
+    def _random_level(self):
+        # Exponential distribution as per Pugh's paper.
+        l = 1
+        maxlevel = min(self.maxlevel, self.level+1)
+        while l < maxlevel and self._rnd.getrandbits(31) < self.p:
+            l += 1
+        return l
+
+    def _create_node(self, key, value):
+        # Create a new node, updating the list level if required.
+        level = self._random_level()
+        node = self._new_node(level, key, value)
+        if level > self.level:
+            self._skips[self._tail] = self._size
+            self._level = level
+            self._path[level-1] = self._head
+            self._distance[level-1] = 0
+        return node
+
+    def _climb(self, key, inclusive):
+        # Find the level from which a finger search for *key* can start. See
+        # SkipList._climb() for the details.
+        path, keys, links, offsets = self._path, self._keys, self._links, self._offsets
+        head, tail = self._head, self._tail
+        top = self.level - 1
+        for i in range(top):
+            node = path[i]
+            if node == head or (keys[node] <= key if inclusive else keys[node] < key):
+                nnode = links[offsets[path[i+1]]+i+1]
+                if nnode == tail or not (keys[nnode] <= key if inclusive
+                                                    else keys[nnode] < key):
+                    return i, node, self._distance[i]
+        node = path[top]
+        if node == head or (keys[node] <= key if inclusive else keys[node] < key):
+            return top, node, self._distance[top]
+        return top, head, 0
+
+    def _find_lt(self, key, finger=False):
+        # Find path to last node < key. If *finger* is true, search from the
+        # current path rather than from the head.
+        if finger:
+            level, node, distance = self._climb(key, False)
+        else:
+            level, node, distance = self.level-1, self._head, 0
+        keys, links, offsets, skips = self._keys, self._links, self._offsets, self._skips
+        tail = self._tail
+        for i in reversed(range(level+1)):
+            nnode = links[offsets[node]+i]
+            while nnode != tail and keys[nnode] < key:
+                node = nnode
+                nnode = links[offsets[node]+i]
+                distance += 1 if i == 0 else skips[node]
+            self._path[i] = node
+            self._distance[i] = distance
+
+    def _find_lte(self, key, finger=False):
+        # Find path to last node <= key. See _find_lt() for *finger*.
+        if finger:
+            level, node, distance = self._climb(key, True)
+        else:
+            level, node, distance = self.level-1, self._head, 0
+        keys, links, offsets, skips = self._keys, self._links, self._offsets, self._skips
+        tail = self._tail
+        for i in reversed(range(level+1)):
+            nnode = links[offsets[node]+i]
+            while nnode != tail and keys[nnode] <= key:
+                node = nnode
+                nnode = links[offsets[node]+i]
+                distance += 1 if i == 0 else skips[node]
+            self._path[i] = node
+            self._distance[i] = distance
+
+    def _climb_pos(self, pos):
+        # Like _climb() but for a position. See SkipList._climb_pos().
+        path, distance, links, offsets = self._path, self._distance, self._links, self._offsets
+        tail = self._tail
+        top = self.level - 1
+        for i in range(top):
+            if distance[i] <= pos:
+                nnode = links[offsets[path[i+1]]+i+1]
+                if nnode == tail:
+                    return i, path[i], distance[i]
+                j = self._levels[nnode] - 1
+                if distance[j if j < top else top] + self._skips[nnode] > pos:
+                    return i, path[i], distance[i]
+        if distance[top] <= pos:
+            return top, path[top], distance[top]
+        return top, self._head, 0
+
+    def _find_pos(self, pos, finger=False):
+        # Create path to node at pos. See _find_lt() for *finger*.
+        if finger:
+            level, node, distance = self._climb_pos(pos)
+        else:
+            level, node, distance = self.level-1, self._head, 0
+        links, offsets, skips = self._links, self._offsets, self._skips
+        tail = self._tail
+        for i in reversed(range(level+1)):
+            nnode = links[offsets[node]+i]
+            ndistance = distance + (1 if i == 0 else skips[nnode])
+            while nnode != tail and ndistance <= pos:
+                node, distance = nnode, ndistance
+                nnode = links[offsets[node]+i]
+                ndistance += 1 if i == 0 else skips[nnode]
+            self._path[i] = node
+            self._distance[i] = distance
+
+    def _insert(self, node):
+        # Insert a node in the list. The _path and _distance must be set.
+        path, distance = self._path, self._distance
+        links, offsets, levels, skips = self._links, self._offsets, self._levels, self._skips
+        # Update pointers
+        level = levels[node]
+        offset = offsets[node]
+        for i in range(level):
+            poffset = offsets[path[i]] + i
+            links[offset+i] = links[poffset]
+            links[poffset] = node
+        if level > 1:
+            skips[node] = 1 + distance[0] - distance[level-1]
+        # Update skip counts
+        node = links[offset]
+        i = 2; j = min(levels[node], self.level)
+        while i <= self.level:
+            while j < i:
+                node = links[offsets[node]+i-2]
+                j = min(levels[node], self.level)
+            skips[node] -= distance[0] - distance[j-1] if j <= level else -1
+            i = j+1
+        self._size += 1
+
+    def _advance_path(self, node):
+        # See SkipList._advance_path().
+        if self._links[self._offsets[node]] == self._tail:
+            path, distance = self._path, self._distance
+            pos = distance[0] + 1
+            for i in range(self._levels[node]):
+                path[i] = node
+                distance[i] = pos
+
+    def _remove(self, node):
+        # Remove a node. The _path and _distance must be set. The node's slot
+        # is released so the caller must fetch the key and value first.
+        path, distance = self._path, self._distance
+        links, offsets, levels, skips = self._links, self._offsets, self._levels, self._skips
+        level = levels[node]
+        offset = offsets[node]
+        for i in range(level):
+            links[offsets[path[i]]+i] = links[offset+i]
+        self._free_node(node)
+        # Update skip counts
+        node = links[offset]
+        i = 2; j = min(levels[node], self.level)
+        while i <= self.level:
+            while j < i:
+                node = links[offsets[node]+i-2]
+                j = min(levels[node], self.level)
+            skips[node] += distance[0] - distance[j-1] if j <= level else -1
+            i = j+1
+        self._size -= 1
+        self._reduce_level()
+
+    def _remove_run(self, path, distance):
+        # Remove all nodes after *path* up to and including the node at the
+        # current _path. See SkipList._remove_run(). The slots of the removed
+        # nodes are released, which takes O(k) time.
+        rpath, rdistance = self._path, self._distance
+        links, offsets, levels, skips = self._links, self._offsets, self._levels, self._skips
+        count = rdistance[0] - distance[0]
+        if count <= 0:
+            return 0
+        node = links[offsets[path[0]]]
+        for i in range(count):
+            nnode = links[offsets[node]]
+            self._free_node(node)
+            node = nnode
+        for i in range(self.level):
+            if rpath[i] != path[i]:
+                links[offsets[path[i]]+i] = links[offsets[rpath[i]]+i]
+        # Update skip counts of the first nodes after the run
+        i = 2; j = min(levels[node], self.level)
+        while i <= self.level:
+            while j < i:
+                node = links[offsets[node]+i-2]
+                j = min(levels[node], self.level)
+            skips[node] += rdistance[j-1] - distance[j-1] - count
+            i = j+1
+        self._size -= count
+        rpath[:] = path
+        rdistance[:] = distance
+        self._reduce_level()
+        return count
+
+    def _reduce_level(self):
+        # Reduce level if last node on current level was removed
+        links, offset, tail = self._links, self._offsets[self._head], self._tail
+        if self.level > 1 and links[offset+self.level-1] == tail:
+            while self.level > 1 and links[offset+self.level-1] == tail:
+                self._level -= 1
+            self._skips[tail] = self._size - self._last_distance()
+
+    def _last_distance(self):
+        # Return the position of the last node on the highest level.
+        idx = self.level - 1
+        if idx == 0:
+            return self._size
+        links, offsets, skips = self._links, self._offsets, self._skips
+        dist = 0
+        node = links[offsets[self._head]+idx]
+        while node != self._tail:
+            dist += skips[node]
+            node = links[offsets[node]+idx]
+        return dist
+
+    def _items(self, start, stop):
+        # Generator for items() in forward order.
+        keys, values, links, offsets = self._keys, self._values, self._links, self._offsets
+        tail = self._tail
+        if start is None:
+            node = links[offsets[self._head]]
+        else:
+            self._find_lt(start, self._finger)
+            node = links[offsets[self._path[0]]]
+        while node != tail and (stop is None or keys[node] < stop):
+            yield (keys[node], values[node])
+            node = links[offsets[node]]
+
+    def _items_reverse(self, start, stop):
+        # Generator for items() in reverse order.
+        if stop is None:
+            self._find_pos(self._size, self._finger)
+        else:
+            self._find_lt(stop, self._finger)
+        keys, values = self._keys, self._values
+        for node in self._reverse_nodes(self._path[:self.level]):
+            if start is not None and keys[node] < start:
+                break
+            yield (keys[node], values[node])
+
+    def _reverse_nodes(self, path):
+        # Yield all nodes up to and including path[0] in reverse order. See
+        # SkipList._reverse_nodes() for how this works.
+        links, offsets = self._links, self._offsets
+        stack = [(self._head, path[-1], len(path)-1)]
+        for i in reversed(range(len(path)-1)):
+            stack.append((path[i+1], path[i], i))
+        while stack:
+            node, last, i = stack.pop()
+            if node == last:
+                continue
+            if i == 0:
+                chain = []
+                while node != last:
+                    node = links[offsets[node]]
+                    chain.append(node)
+                for node in reversed(chain):
+                    yield node
+                continue
+            while node != last:
+                nnode = links[offsets[node]+i]
+                stack.append((node, nnode, i-1))
+                node = nnode
+
+    def _append_sorted(self, pairs, check=False):
+        # Append sorted pairs at the end of the list in a single linear pass.
+        # See SkipList._append_sorted().
+        self._find_pos(self._size)
+        path, distance = self._path, self._distance
+        links, offsets, skips = self._links, self._offsets, self._skips
+        head, tail = self._head, self._tail
+        rnd, p, maxlevel = self._rnd.getrandbits, self.p, self.maxlevel
+        level, size = self.level, self._size
+        last = self._keys[path[0]]
+        try:
+            for key, value in pairs:
+                if check and size and key < last:
+                    raise ValueError('pairs are not sorted on key')
+                last = key
+                nlevel = 1
+                while nlevel <= level and nlevel < maxlevel and rnd(31) < p:
+                    nlevel += 1
+                node = self._new_node(nlevel, key, value)
+                size += 1
+                if nlevel > level:
+                    path[level] = head
+                    distance[level] = 0
+                    level = nlevel
+                if nlevel > 1:
+                    skips[node] = size - distance[nlevel-1]
+                for i in range(nlevel):
+                    links[offsets[path[i]]+i] = node
+                    path[i] = node
+                    distance[i] = size
+        finally:
+            for i in range(level):
+                links[offsets[path[i]]+i] = tail
+            skips[tail] = size - distance[level-1] if level > 1 else 0
+            self._level, self._size = level, size
+
+    # PUBLIC API ...
+
+    @property
+    def level(self):
+        """The current level of the skip list."""
+        return self._level
+
+    @property
+    def finger(self):
+        """Whether finger search is enabled."""
+        return self._finger
+
+    @property
+    def keytype(self):
+        """The type of the keys, or ``None`` if they are Python objects."""
+        return self._keytype
+
+    @classmethod
+    def from_sorted(cls, pairs, values=None, check=False, **kwargs):
+        """Create a new list from pairs that are already sorted on key.
+
+        See :meth:`SkipList.from_sorted`.
+        """
+        if values is not None:
+            pairs = zip(pairs, values)
+        sl = cls(**kwargs)
+        sl._append_sorted(pairs, check)
+        return sl
+
+    @classmethod
+    def from_numpy(cls, keys, values, **kwargs):
+        """Create a new list from a NumPy array of keys and one of values.
+
+        See :meth:`SkipList.from_numpy`.
+        """
+        import numpy
+        keys, values = numpy.asarray(keys), numpy.asarray(values)
+        if keys.shape != values.shape or keys.ndim != 1:
+            raise ValueError('keys and values must be 1-D arrays of the same length')
+        if len(keys) > 1 and (keys[1:] < keys[:-1]).any():
+            order = keys.argsort(kind='mergesort')
+            keys, values = keys[order], values[order]
+        return cls.from_sorted(keys.tolist(), values.tolist(), **kwargs)
+
+    def to_numpy(self, start=None, stop=None):
+        """Return the pairs as a tuple of a NumPy array of keys and one of
+        values.
+
+        See :meth:`SkipList.to_numpy`. If the list has a *keytype*, the key
+        array has that data type.
+        """
+        import numpy
+        keys, values = [], []
+        for key, value in self.items(start, stop):
+            keys.append(key)
+            values.append(value)
+        return numpy.array(keys, dtype=self._keytype), numpy.array(values)
+
+    def _kwargs(self):
+        # Return the constructor arguments for a new list like this one.
+        kwargs = {}
+        if self._finger:
+            kwargs['finger'] = True
+        if self._keytype is not None:
+            kwargs['keytype'] = self._keytype
+        return kwargs
+
+    def __reduce__(self):
+        # See SkipList.__reduce__().
+        return (_unpickle, (type(self), list(self.items()), self._kwargs()))
+
+    def dump(self, fileobj, chunksize=10000):
+        """Write all pairs to the binary file object *fileobj*.
+
+        See :meth:`SkipList.dump`.
+        """
+        _dump_pairs(self.items(), fileobj, chunksize)
+
+    @classmethod
+    def load(cls, fileobj, **kwargs):
+        """Create a new list from pairs written by :meth:`dump`.
+
+        See :meth:`SkipList.load`.
+        """
+        return cls.from_sorted(_load_pairs(fileobj), **kwargs)
+
+    def insert(self, key, value):
+        """Insert a key-value pair in the list.
+
+        See :meth:`SkipList.insert`.
+        """
+        node = self._path[0]
+        if self._links[self._offsets[node]] != self._tail \
+                    or node != self._head and key < self._keys[node]:
+            self._find_lte(key, self._finger)
+        node = self._create_node(key, value)
+        self._insert(node)
+        self._advance_path(node)
+
+    def append(self, key, value):
+        """Append a key-value pair at the end of the list.
+
+        See :meth:`SkipList.append`.
+        """
+        node = self._path[0]
+        if self._links[self._offsets[node]] != self._tail:
+            self._find_pos(self._size)
+            node = self._path[0]
+        if node != self._head and key < self._keys[node]:
+            raise ValueError('key {!r} is smaller than last key'.format(key))
+        node = self._create_node(key, value)
+        self._insert(node)
+        self._advance_path(node)
+
+    def replace(self, key, value):
+        """Replace the value of the first key-value pair with key *key*.
+
+        If the key was not found, the pair is inserted.
+        """
+        self._find_lt(key, self._finger)
+        node = self._links[self._offsets[self._path[0]]]
+        if node == self._tail or key < self._keys[node]:
+            node = self._create_node(key, value)
+            self._insert(node)
+        else:
+            self._values[node] = value
+
+    def update(self, pairs):
+        """Insert all pairs from the iterable *pairs*.
+
+        See :meth:`SkipList.update`.
+        """
+        for key, value in sorted(pairs, key=itemgetter(0)):
+            self._find_lte(key, True)
+            node = self._create_node(key, value)
+            self._insert(node)
+
+    def clear(self):
+        """Remove all key-value pairs."""
+        self._init_nodes()
+        for i in range(self.maxlevel):
+            self._path[i] = self._head
+            self._distance[i] = 0
+        self._level = 1
+        self._size = 0
+
+    def __len__(self):
+        """Return the number of pairs in the list."""
+        return self._size
+
+    __bool__ = __nonzero__ = lambda self: self._size > 0
+
+    def __repr__(self):
+        return type(self).__name__ + '((' + repr(list(self.items()))[1:-1] + '))'
+
+    def items(self, start=None, stop=None, reverse=False):
+        """Return an iterator yielding pairs.
+
+        See :meth:`SkipList.items`.
+        """
+        if reverse:
+            return self._items_reverse(start, stop)
+        return self._items(start, stop)
+
+    __iter__ = items
+
+    def __reversed__(self):
+        """Return an iterator yielding all pairs in reverse order."""
+        return self._items_reverse(None, None)
+
+    def keys(self, start=None, stop=None, reverse=False):
+        """Like :meth:`items` but returns only the keys."""
+        return (item[0] for item in self.items(start, stop, reverse))
+
+    def values(self, start=None, stop=None, reverse=False):
+        """Like :meth:`items` but returns only the values."""
+        return (item[1] for item in self.items(start, stop, reverse))
+
+    def popitem(self):
+        """Removes the first key-value pair and return it.
+
+        This method raises a ``KeyError`` if the list is empty.
+        """
+        node = self._links[self._offsets[self._head]]
+        if node == self._tail:
+            raise KeyError('list is empty')
+        pair = (self._keys[node], self._values[node])
+        self._find_lt(pair[0])
+        self._remove(node)
+        return pair
+
+    # SET OPERATIONS ...
+
+    def union(self, other):
+        """Return a new list with the pairs in this list, and the pairs in
+        *other* with a key that is not in this list.
+
+        See :meth:`SkipList.union`.
+        """
+        pairs = _union(self.items(), other.items())
+        return type(self).from_sorted(pairs, **self._kwargs())
+
+    def intersection(self, other):
+        """Return a new list with the pairs in this list with a key that is
+        in *other*.
+
+        See :meth:`SkipList.union`.
+        """
+        pairs = _intersection(self.items(), other.items())
+        return type(self).from_sorted(pairs, **self._kwargs())
+
+    def difference(self, other):
+        """Return a new list with the pairs in this list with a key that is
+        not in *other*.
+
+        See :meth:`SkipList.union`.
+        """
+        pairs = _difference(self.items(), other.items())
+        return type(self).from_sorted(pairs, **self._kwargs())
+
+    # BY KEY API ...
+
+    def _find_node(self, key):
+        # Return the first node with key *key*, or -1 if there is none.
+        self._find_lt(key, self._finger)
+        node = self._links[self._offsets[self._path[0]]]
+        if node == self._tail or key < self._keys[node]:
+            return -1
+        return node
+
+    def search(self, key, default=None):
+        """Find the first key-value pair with key *key* and return its value.
+
+        See :meth:`SkipList.search`.
+        """
+        node = self._find_node(key)
+        return default if node == -1 else self._values[node]
+
+    def search_many(self, keys, default=None):
+        """Find the value of the first pair for each key in *keys*.
+
+        See :meth:`SkipList.search_many`.
+        """
+        keys = list(keys)
+        result = [default] * len(keys)
+        links, offsets = self._links, self._offsets
+        for ix in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[ix]
+            self._find_lt(key, True)
+            node = links[offsets[self._path[0]]]
+            if node != self._tail and not key < self._keys[node]:
+                result[ix] = self._values[node]
+        return result
+
+    def remove(self, key):
+        """Remove the first key-value pair with key *key*.
+
+        If the key was not found, a ``KeyError`` is raised.
+        """
+        node = self._find_node(key)
+        if node == -1:
+            raise KeyError('{!r} is not in list'.format(key))
+        self._remove(node)
+
+    def remove_many(self, keys):
+        """Remove the first key-value pair for each key in *keys*.
+
+        See :meth:`SkipList.remove_many`.
+        """
+        count = 0
+        links, offsets = self._links, self._offsets
+        for key in sorted(keys):
+            self._find_lt(key, True)
+            node = links[offsets[self._path[0]]]
+            if node == self._tail or key < self._keys[node]:
+                continue
+            self._remove(node)
+            count += 1
+        return count
+
+    def delete_range(self, start=None, stop=None):
+        """Remove all pairs with a key in the range [*start*, *stop*).
+
+        See :meth:`SkipList.delete_range`.
+        """
+        if start is None:
+            path, distance = [self._head]*self.maxlevel, [0]*self.maxlevel
+        else:
+            self._find_lt(start, self._finger)
+            path, distance = self._path[:], self._distance[:]
+        if stop is None:
+            self._find_pos(self._size, True)
+        else:
+            self._find_lt(stop, True)
+        return self._remove_run(path, distance)
+
+    def pop(self, key, default=UNSET):
+        """Remove the first key-value pair with key *key*.
+
+        If a pair was removed, return its value. Otherwise if *default* was
+        provided, return *default*. Otherwise a ``KeyError`` is raised.
+        """
+        node = self._find_node(key)
+        if node == -1:
+            if default is self.UNSET:
+                raise KeyError('key {!r} not in list'.format(key))
+            return default
+        value = self._values[node]
+        self._remove(node)
+        return value
+
+    def __contains__(self, key):
+        """Return whether *key* is contained in the list."""
+        return self._find_node(key) != -1
+
+    def index(self, key, default=UNSET):
+        """Find the first key-value pair with key *key* and return its position.
+
+        If the key is not found, return *default*. If default was not provided,
+        raise a ``KeyError``
+        """
+        if self._find_node(key) == -1:
+            if default is self.UNSET:
+                raise KeyError('key {!r} not in list'.format(key))
+            return default
+        return self._distance[0]
+
+    def bisect_left(self, key):
+        """Return the position of the first pair with a key >= *key*.
+
+        See :meth:`SkipList.bisect_left`.
+        """
+        self._find_lt(key, self._finger)
+        return self._distance[0]
+
+    def bisect_right(self, key):
+        """Return the position of the first pair with a key > *key*.
+
+        See :meth:`SkipList.bisect_right`.
+        """
+        self._find_lte(key, self._finger)
+        return self._distance[0]
+
+    def count(self, key):
+        """Return the number of pairs with key *key*."""
+        self._find_lt(key, self._finger)
+        pos = self._distance[0]
+        self._find_lte(key, True)
+        return self._distance[0] - pos
+
+    def count_range(self, start=None, stop=None):
+        """Return the number of pairs with a key in the range [*start*, *stop*).
+
+        See :meth:`SkipList.count_range`.
+        """
+        if start is None:
+            pos = 0
+        else:
+            self._find_lt(start, self._finger)
+            pos = self._distance[0]
+        if stop is None:
+            return self._size - pos
+        self._find_lt(stop, True)
+        return max(0, self._distance[0] - pos)
+
+    # BY POSITION API ...
+
+    def _find_node_pos(self, pos):
+        # Return the node at position *pos*, which may be negative.
+        size = self._size
+        if pos < 0:
+            pos += size
+        if not 0 <= pos < size:
+            raise IndexError('list index out of range')
+        self._find_pos(pos, self._finger)
+        return self._links[self._offsets[self._path[0]]]
+
+    def __getitem__(self, pos):
+        """Return a pair by its position.
+
+        See :meth:`SkipList.__getitem__`.
+        """
+        keys, values, links, offsets = self._keys, self._values, self._links, self._offsets
+        if isinstance(pos, int):
+            node = self._find_node_pos(pos)
+            return (keys[node], values[node])
+        elif isinstance(pos, slice):
+            start, stop, step = pos.indices(self._size)
+            if step > 0:
+                count = max(0, (stop - start + step - 1) // step)
+            else:
+                count = max(0, (start - stop - step - 1) // -step)
+            if count == 0:
+                return iter(())
+            walk = abs(step) <= 4*self.level
+            if step > 0 and walk:
+                self._find_pos(start, self._finger)
+                first = links[offsets[self._path[0]]]
+                def genpairs():
+                    node = first
+                    yield (keys[node], values[node])
+                    for i in range(count-1):
+                        for j in range(step):
+                            node = links[offsets[node]]
+                        yield (keys[node], values[node])
+            elif step < 0 and walk:
+                self._find_pos(start+1, self._finger)
+                nodes = self._reverse_nodes(self._path[:self.level])
+                def genpairs():
+                    for node in islice(nodes, 0, count*-step, -step):
+                        yield (keys[node], values[node])
+            else:
+                def genpairs():
+                    for pos in range(start, stop, step):
+                        self._find_pos(pos, True)
+                        node = links[offsets[self._path[0]]]
+                        yield (keys[node], values[node])
+            return genpairs()
+        else:
+            raise TypeError('expecting int or slice, got {0.__name__!r}'.format(type(pos)))
+
+    def take(self, positions):
+        """Return a list with the pairs at each position in *positions*.
+
+        See :meth:`SkipList.take`.
+        """
+        size = self._size
+        positions = list(positions)
+        for ix, pos in enumerate(positions):
+            if pos < 0:
+                pos += size
+                positions[ix] = pos
+            if not 0 <= pos < size:
+                raise IndexError('list index out of range')
+        result = [None] * len(positions)
+        links, offsets = self._links, self._offsets
+        for ix in sorted(range(len(positions)), key=positions.__getitem__):
+            self._find_pos(positions[ix], True)
+            node = links[offsets[self._path[0]]]
+            result[ix] = (self._keys[node], self._values[node])
+        return result
+
+    def __delitem__(self, pos):
+        """Delete a pair by its position.
+
+        See :meth:`SkipList.__delitem__`.
+        """
+        if isinstance(pos, slice):
+            start, stop, step = pos.indices(self._size)
+            if step == 1:
+                self._find_pos(start, self._finger)
+                path, distance = self._path[:], self._distance[:]
+                self._find_pos(stop, True)
+                self._remove_run(path, distance)
+                return
+            positions = range(start, stop, step)
+            if step > 0:
+                positions = reversed(positions)
+            for pos in positions:
+                self._find_pos(pos, True)
+                self._remove(self._links[self._offsets[self._path[0]]])
+            return
+        if not isinstance(pos, int):
+            raise TypeError('expecting int or slice, got {0.__name__!r}'.format(type(pos)))
+        self._remove(self._find_node_pos(pos))
+
+    def __setitem__(self, pos, value):
+        """Set a value by its position."""
+        if not isinstance(pos, int):
+            raise TypeError('expecting int, got {0.__name__!r}'.format(type(pos)))
+        self._values[self._find_node_pos(pos)] = value
@@ -0,0 +1,302 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import functools
+import threading
+
+from .skiplist import SkipList
+from .merge import _union, _intersection, _difference
+
+__all__ = ['RWLock', 'ConcurrentSkipList']
+
+
+class RWLock(object):
+    """A readers-writer lock.
+
+    Any number of readers can hold the lock at the same time, while a writer
+    holds it exclusively. Writers are preferred: once a writer is waiting, new
+    readers wait until it is done, so that writers do not starve under a
+    steady stream of readers. The lock is not reentrant.
+    """
+
+    __slots__ = ('_cond', '_readers', '_writer', '_waiting')
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting = 0
+
+    def acquire_read(self):
+        """Acquire the lock for reading."""
+        with self._cond:
+            while self._writer or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        """Release the lock after reading."""
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """Acquire the lock for writing."""
+        with self._cond:
+            self._waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        """Release the lock after writing."""
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+def _locked(func, write=False):
+    # Create a method that calls *func* on the wrapped list under the lock.
+    @functools.wraps(func)
+    def method(self, *args, **kwargs):
+        return self._call(func, write, *args, **kwargs)
+    return method
+
+
+def _reader(name):
+    # Create a method that calls SkipList method *name* under the read lock.
+    return _locked(SkipList.__dict__[name])
+
+
+def _writer(name):
+    # Create a method that calls SkipList method *name* under the write lock.
+    return _locked(SkipList.__dict__[name], True)
+
+
+def _list_items(sl, *args):
+    # Return the pairs from SkipList.items() as a list.
+    return list(sl.items(*args))
+
+
+def _list_slice(sl, pos):
+    # Return the pairs in a slice as a list.
+    return list(sl[pos])
+
+
+class ConcurrentSkipList(object):
+    """A :class:`SkipList` that can be used by multiple threads.
+
+    This wraps a :class:`SkipList` and protects it with a :class:`RWLock`. The
+    read-only operations such as :meth:`search` and :meth:`index` do not
+    change the list, and run in parallel. The operations that change the
+    list run exclusively.
+
+    The iterators returned by :meth:`items`, :meth:`keys`, :meth:`values` and
+    slices iterate over a copy of the pairs that is made under the lock. This
+    takes O(k) time and memory for k pairs.
+
+    With finger search, a search updates the finger, so with *finger* all
+    operations run exclusively.
+
+    The constructor arguments are passed to :class:`SkipList`.
+    """
+
+    __slots__ = ('_list', '_lock')
+
+    def __init__(self, *args, **kwargs):
+        self._list = SkipList(*args, **kwargs)
+        self._lock = RWLock()
+
+    @classmethod
+    def _wrap(cls, sl):
+        # Return a new instance that wraps the SkipList *sl*.
+        self = cls.__new__(cls)
+        self._list = sl
+        self._lock = RWLock()
+        return self
+
+    @classmethod
+    def from_sorted(cls, pairs, values=None, check=False, **kwargs):
+        """Create a new list from pairs that are already sorted on key.
+
+        See :meth:`SkipList.from_sorted`.
+        """
+        return cls._wrap(SkipList.from_sorted(pairs, values, check, **kwargs))
+
+    @classmethod
+    def from_numpy(cls, keys, values, **kwargs):
+        """Create a new list from a NumPy array of keys and one of values.
+
+        See :meth:`SkipList.from_numpy`.
+        """
+        return cls._wrap(SkipList.from_numpy(keys, values, **kwargs))
+
+    @classmethod
+    def load(cls, fileobj, **kwargs):
+        """Create a new list from pairs written by :meth:`dump`.
+
+        See :meth:`SkipList.load`.
+        """
+        return cls._wrap(SkipList.load(fileobj, **kwargs))
+
+    def __reduce__(self):
+        # See SkipList.__reduce__(). The lock is not pickled.
+        func, (cls, pairs, kwargs) = self._call(SkipList.__reduce__, False)
+        return (func, (type(self), pairs, kwargs))
+
+    def _setop(self, op, other):
+        # Apply a set operation to copies of the pairs of both lists, so that
+        # we never hold both locks.
+        pairs = op(self.items(), other.items(), self._list._key)
+        return type(self).from_sorted(pairs, **self._list._kwargs())
+
+    def union(self, other):
+        """Return a new list with the pairs in this list, and the pairs in
+        *other* with a key that is not in this list.
+
+        See :meth:`SkipList.union`. The pairs of both lists are copied first.
+        """
+        return self._setop(_union, other)
+
+    def intersection(self, other):
+        """Return a new list with the pairs in this list with a key that is
+        in *other*.
+
+        See :meth:`union`.
+        """
+        return self._setop(_intersection, other)
+
+    def difference(self, other):
+        """Return a new list with the pairs in this list with a key that is
+        not in *other*.
+
+        See :meth:`union`.
+        """
+        return self._setop(_difference, other)
+
+    @property
+    def level(self):
+        """The current level of the skip list."""
+        return self._list.level
+
+    @property
+    def finger(self):
+        """Whether finger search is enabled."""
+        return self._list.finger
+
+    @property
+    def key(self):
+        """The key function, or ``None``."""
+        return self._list.key
+
+    @property
+    def probability(self):
+        """The probability that a node has the next level."""
+        return self._list.probability
+
+    @property
+    def current_maxlevel(self):
+        """The current maximum level of a node."""
+        return self._list.current_maxlevel
+
+    @property
+    def levels(self):
+        """The level generator."""
+        return self._list.levels
+
+    @property
+    def hash_index(self):
+        """Whether the list keeps a hash index."""
+        return self._list.hash_index
+
+    def _call(self, func, write, *args, **kwargs):
+        # Call *func* on the list, under the read lock unless *write* is true.
+        # With finger search, every operation updates the list.
+        lock = self._lock
+        if write or self._list._finger:
+            lock.acquire_write()
+            try:
+                return func(self._list, *args, **kwargs)
+            finally:
+                lock.release_write()
+        lock.acquire_read()
+        try:
+            return func(self._list, *args, **kwargs)
+        finally:
+            lock.release_read()
+
+    def __len__(self):
+        """Return the number of pairs in the list."""
+        return self._list._size
+
+    __bool__ = __nonzero__ = lambda self: self._list._size > 0
+
+    def __repr__(self):
+        return type(self).__name__ + '((' + repr(list(self.items()))[1:-1] + '))'
+
+    def items(self, start=None, stop=None, reverse=False):
+        """Return an iterator yielding pairs.
+
+        See :meth:`SkipList.items`. The pairs are copied first.
+        """
+        return iter(self._call(_list_items, False, start, stop, reverse))
+
+    __iter__ = items
+
+    def __reversed__(self):
+        """Return an iterator yielding all pairs in reverse order."""
+        return self.items(reverse=True)
+
+    def keys(self, start=None, stop=None, reverse=False):
+        """Like :meth:`items` but returns only the keys."""
+        return (item[0] for item in self.items(start, stop, reverse))
+
+    def values(self, start=None, stop=None, reverse=False):
+        """Like :meth:`items` but returns only the values."""
+        return (item[1] for item in self.items(start, stop, reverse))
+
+    insert = _writer('insert')
+    append = _writer('append')
+    replace = _writer('replace')
+    update = _writer('update')
+    clear = _writer('clear')
+    popitem = _writer('popitem')
+
+    search = _reader('search')
+    search_many = _reader('search_many')
+    remove = _writer('remove')
+    remove_many = _writer('remove_many')
+    delete_range = _writer('delete_range')
+    pop = _writer('pop')
+    __contains__ = _reader('__contains__')
+    index = _reader('index')
+    bisect_left = _reader('bisect_left')
+    bisect_right = _reader('bisect_right')
+    count = _reader('count')
+    count_range = _reader('count_range')
+    aggregate = _reader('aggregate')
+    aggregate_pos = _reader('aggregate_pos')
+    to_numpy = _reader('to_numpy')
+    dump = _reader('dump')
+
+    def __getitem__(self, pos):
+        """Return a pair by its position.
+
+        See :meth:`SkipList.__getitem__`. For a slice, the pairs are copied.
+        """
+        if isinstance(pos, slice):
+            return iter(self._call(_list_slice, False, pos))
+        return self._getitem(pos)
+
+    _getitem = _reader('__getitem__')
+    take = _reader('take')
+    __delitem__ = _writer('__delitem__')
+    __setitem__ = _writer('__setitem__')
@@ -0,0 +1,505 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import mmap
+import pickle
+import struct
+import tempfile
+from itertools import islice
+
+from .compact import CompactSkipList, fmtnode
+
+__all__ = ['MappedSkipList']
+
+# The node arrays are typed views on the mapping, which use memoryview.cast().
+# This requires Python 3.3 or later.
+_have_cast = hasattr(memoryview, 'cast')
+
+
+# File format. The file starts with a header of _HEADER bytes. Viewed as an
+# array of int64s, it holds the magic at index 0 and the fields below. The
+# header is followed by the node arrays, which are sized for the node and link
+# capacity, and then by the value heap. All integers are in native byte order.
+
+_MAGIC = b'PYSKIPLM'
+_VERSION = 1
+_HEADER = 512
+
+_H_VERSION, _H_KEYTYPE, _H_MAXLEVEL, _H_LEVEL, _H_SIZE, _H_NSLOTS, _H_NLINKS, \
+    _H_CAPACITY, _H_LINKCAPACITY, _H_HEAPSIZE, _H_HEAPCAPACITY = range(1, 12)
+# The head of the free list for each level.
+_H_FREE = 16
+
+_KEYTYPES = ('int64', 'float64')
+
+# Each value in the heap is a length followed by the pickled value.
+_length = struct.Struct('q')
+
+
+def _layout(capacity, linkcapacity, heapcapacity):
+    # Return the offsets of the keys, value references, skips, offsets, links,
+    # levels and the heap in the file, followed by the size of the file.
+    sizes = [8*capacity] * 4 + [8*linkcapacity, (capacity+7)//8*8, heapcapacity]
+    layout = [_HEADER]
+    for size in sizes:
+        layout.append(layout[-1] + size)
+    return layout
+
+
+# The following functions are debugging functions. They are available only when
+# Python is not started with -O.
+
+if __debug__:
+
+    def _free_nodes(sl, level):
+        # Return the free slots for *level*.
+        nodes = []
+        node = sl._header[_H_FREE+level]
+        while node != -1:
+            nodes.append(node)
+            node = sl._skips[node]
+        return nodes
+
+    def dump(sl, file=sys.stdout):
+        """Dump a skiplist to standard output."""
+        header = sl._header
+        print('== Dumping skiplist {0!r}'.format(sl), file=file)
+        print('File: {} ({} bytes)'.format(sl.filename, len(sl._mm)), file=file)
+        print('Level: {}/{}'.format(sl.level, sl.maxlevel), file=file)
+        print('Size: {}'.format(len(sl)), file=file)
+        print('Slots: {}/{} ({} free)'.format(header[_H_NSLOTS], header[_H_CAPACITY],
+                    sum(len(_free_nodes(sl, level)) for level in range(sl.maxlevel+1))),
+                    file=file)
+        print('Links: {}/{}'.format(header[_H_NLINKS], header[_H_LINKCAPACITY]), file=file)
+        print('Heap: {}/{}'.format(header[_H_HEAPSIZE], header[_H_HEAPCAPACITY]), file=file)
+        node = sl._head
+        print('{0} (head)'.format(fmtnode(sl, node)), file=file)
+        node = sl._links[sl._offsets[node]]
+        while node != sl._tail:
+            print('{0}'.format(fmtnode(sl, node)), file=file)
+            node = sl._links[sl._offsets[node]]
+        print('{0} (tail)'.format(fmtnode(sl, node)), file=file)
+        print(file=file)
+
+    def check(sl):
+        """Check the internal structure of a skiplist."""
+        header, keys, vrefs, links, offsets, levels, skips = sl._header, sl._keys, \
+                sl._vrefs, sl._links, sl._offsets, sl._levels, sl._skips
+        head, tail = sl._head, sl._tail
+        assert sl._mm[:8] == _MAGIC
+        assert header[_H_VERSION] == _VERSION
+        assert _KEYTYPES[header[_H_KEYTYPE]] == sl.keytype
+        assert header[_H_MAXLEVEL] == sl.maxlevel
+        nslots, nlinks = header[_H_NSLOTS], header[_H_NLINKS]
+        assert 2 <= nslots <= header[_H_CAPACITY] == len(keys)
+        assert nlinks <= header[_H_LINKCAPACITY] == len(links)
+        assert header[_H_HEAPSIZE] <= header[_H_HEAPCAPACITY]
+        assert len(sl._mm) >= _layout(len(keys), len(links), header[_H_HEAPCAPACITY])[-1]
+        for node in range(nslots):
+            assert 0 <= offsets[node] and offsets[node] + levels[node] <= nlinks
+            assert vrefs[node] == -1 or 0 <= vrefs[node] < header[_H_HEAPSIZE]
+        level = sl.maxlevel
+        assert level > 0
+        while links[offsets[head]+level-1] == tail and level > 1:
+            level -= 1
+        assert level == sl.level
+        assert keys[head] == 0 and vrefs[head] == -1
+        assert levels[head] == levels[tail] == sl.maxlevel
+        assert skips[head] == 0
+        pos = 0
+        node = head
+        inbound = {head: 0, tail: len(sl)}
+        seen = set()
+        while node != tail:
+            assert 0 <= node < nslots
+            assert node not in seen
+            seen.add(node)
+            level = min(sl.level, levels[node])
+            assert 1 <= level <= sl.maxlevel
+            for i in range(1, level):
+                fnode = links[offsets[node]+i]
+                flevel = min(sl.level, levels[fnode])
+                if i == flevel-1:
+                    inbound[fnode] = pos
+            if level > 1:
+                assert node in inbound
+                assert pos == inbound[node] + skips[node]
+            for i in range(level):
+                fnode = links[offsets[node]+i]
+                assert 0 <= fnode < nslots
+                assert levels[fnode] >= i+1
+            node = links[offsets[node]]
+            pos += 1
+        assert keys[tail] == 0 and vrefs[tail] == -1
+        assert pos == len(sl) + 1
+        assert len(sl) == inbound[tail] + skips[node]
+        # Every slot is either in use, or on the free list for its level.
+        free = set()
+        for level in range(sl.maxlevel+1):
+            for node in _free_nodes(sl, level):
+                assert node not in seen and node not in free
+                assert tail < node < nslots and levels[node] == level
+                assert keys[node] == 0 and vrefs[node] == -1
+                free.add(node)
+        assert len(seen) + len(free) + 1 == nslots
+        # The cached path must be the search path to the node at the position
+        # in _distance[0], so that it can be used as a finger.
+        fpos = sl._distance[0]
+        lastnodes = [(head, 0)] * sl.level
+        node = links[offsets[head]]
+        pos = 1
+        while node != tail and pos <= fpos:
+            for i in range(min(sl.level, levels[node])):
+                lastnodes[i] = (node, pos)
+            node = links[offsets[node]]
+            pos += 1
+        for i in range(sl.level):
+            assert sl._path[i] == lastnodes[i][0]
+            assert sl._distance[i] == lastnodes[i][1]
+
+
+class _Values(object):
+    # The values of a MappedSkipList. Each node refers to its value in the
+    # heap, or has a reference of -1 for None.
+
+    __slots__ = ('_list',)
+
+    def __init__(self, sl):
+        self._list = sl
+
+    def __getitem__(self, node):
+        sl = self._list
+        ref = sl._vrefs[node]
+        if ref == -1:
+            return None
+        pos = sl._heap + ref
+        size, = _length.unpack_from(sl._mm, pos)
+        return pickle.loads(sl._mm[pos+8:pos+8+size])
+
+    def __setitem__(self, node, value):
+        sl = self._list
+        sl._vrefs[node] = -1 if value is None else sl._store(value)
+
+
+class MappedSkipList(CompactSkipList):
+    """An indexable skip list that is stored in a memory-mapped file.
+
+    This class has the same API as :class:`CompactSkipList`, but the node
+    arrays are stored in the file *path* and accessed through ``mmap``. Only
+    the pages that an operation touches are read, so the list can be larger
+    than the available memory. If the file exists, the list in it is opened,
+    which takes O(1) time. Otherwise a new list is created. If *path* is
+    ``None``, the list is stored in an anonymous temporary file.
+
+    The keys have a fixed width. The *keytype* is ``'int64'`` or
+    ``'float64'``, see :class:`CompactSkipList`. It must match the *keytype*
+    of an existing file. The values are pickled and stored in a heap at the
+    end of the file. They can be any object that can be pickled, and they
+    are unpickled on access. The heap space of removed and replaced values is
+    not reused. Use :meth:`from_sorted` to write a compacted copy.
+
+    Every change is written to the file immediately, but it is up to the
+    operating system when it reaches the disk. Use :meth:`flush` to force
+    that, and :meth:`close` to close the file. The file uses the native
+    byte order, so it is not portable between architectures. The lists that
+    are returned by the set operations such as :meth:`union` are stored in a
+    temporary file.
+
+    A file may be open in only one list at a time. Each list caches its
+    search path, so a second list on the same file would corrupt it. For
+    the same reason, a list is pickled and copied with its pairs, like a
+    :class:`CompactSkipList`, and the copy is stored in a temporary file.
+
+    See :class:`SkipList` for *finger*. This class requires Python 3.3 or
+    later. On older versions, creating a list raises a ``RuntimeError``.
+    """
+
+    # Initial capacities for a new file.
+    _capacity = 64
+    _linkcapacity = 256
+    _heapcapacity = 4096
+
+    # The number of pairs _append_sorted() reserves room for at once.
+    _chunksize = 1024
+
+    __slots__ = ('_file', '_filename', '_mm', '_header', '_vrefs', '_heap')
+
+    def __init__(self, path=None, keytype='int64', finger=False):
+        if not _have_cast:
+            raise RuntimeError('MappedSkipList requires Python 3.3 or later')
+        if keytype not in _KEYTYPES:
+            raise ValueError('unknown keytype: {!r}'.format(keytype))
+        self._keytype = keytype
+        self._nokey = 0
+        self._filename = path
+        if path is None:
+            self._file = tempfile.TemporaryFile()
+        else:
+            self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        self._values = _Values(self)
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size == 0:
+                self._create()
+            else:
+                self._open(size)
+        except Exception:
+            self._file.close()
+            raise
+        self._path = [self._head] * self.maxlevel
+        self._distance = [0] * self.maxlevel
+        self._finger = finger
+
+    def _create(self):
+        # Initialize a new, empty file.
+        layout = _layout(self._capacity, self._linkcapacity, self._heapcapacity)
+        self._file.truncate(layout[-1])
+        mm = mmap.mmap(self._file.fileno(), layout[-1])
+        mm[:8] = _MAGIC
+        header = memoryview(mm)[:_HEADER].cast('q')
+        header[_H_VERSION] = _VERSION
+        header[_H_KEYTYPE] = _KEYTYPES.index(self._keytype)
+        header[_H_MAXLEVEL] = self.maxlevel
+        header[_H_CAPACITY] = self._capacity
+        header[_H_LINKCAPACITY] = self._linkcapacity
+        header[_H_HEAPCAPACITY] = self._heapcapacity
+        header.release()
+        self._map(mm)
+        self._init_nodes()
+        self._level = 1
+        self._size = 0
+
+    def _open(self, size):
+        # Open an existing file. Only the header is read.
+        mm = mmap.mmap(self._file.fileno(), size)
+        if size < _HEADER or mm[:8] != _MAGIC:
+            mm.close()
+            raise ValueError('not a skiplist file: {!r}'.format(self._filename))
+        header = memoryview(mm)[:_HEADER].cast('q')
+        version, keytype, maxlevel = header[_H_VERSION], header[_H_KEYTYPE], header[_H_MAXLEVEL]
+        layout = _layout(header[_H_CAPACITY], header[_H_LINKCAPACITY], header[_H_HEAPCAPACITY])
+        header.release()
+        if version != _VERSION:
+            error = 'unsupported file version: {}'.format(version)
+        elif _KEYTYPES[keytype] != self._keytype:
+            error = 'file has keytype {!r}'.format(_KEYTYPES[keytype])
+        elif maxlevel != self.maxlevel:
+            error = 'file has maxlevel {}'.format(maxlevel)
+        elif size < layout[-1]:
+            error = 'file is truncated'
+        else:
+            self._map(mm)
+            return
+        mm.close()
+        raise ValueError(error)
+
+    def _map(self, mm):
+        # Create the views of the header, node arrays and heap in *mm*.
+        view = memoryview(mm)
+        header = view[:_HEADER].cast('q')
+        layout = _layout(header[_H_CAPACITY], header[_H_LINKCAPACITY], header[_H_HEAPCAPACITY])
+        self._mm = mm
+        self._header = header
+        self._keys = view[layout[0]:layout[1]].cast(self._typecodes[self._keytype])
+        self._vrefs = view[layout[1]:layout[2]].cast('q')
+        self._skips = view[layout[2]:layout[3]].cast('q')
+        self._offsets = view[layout[3]:layout[4]].cast('q')
+        self._links = view[layout[4]:layout[5]].cast('q')
+        self._levels = view[layout[5]:layout[6]].cast('B')
+        self._heap = layout[6]
+
+    def _reserve(self, nslots, nlinks, heapsize=0):
+        # Make sure the file has room for *nslots* nodes, *nlinks* links and
+        # *heapsize* bytes of values. A full array doubles in size.
+        header = self._header
+        capacity, linkcapacity, heapcapacity = header[_H_CAPACITY], \
+                header[_H_LINKCAPACITY], header[_H_HEAPCAPACITY]
+        if nslots <= capacity and nlinks <= linkcapacity and heapsize <= heapcapacity:
+            return
+        old = _layout(capacity, linkcapacity, heapcapacity)
+        if nslots > capacity:
+            capacity = max(nslots, 2*capacity)
+        if nlinks > linkcapacity:
+            linkcapacity = max(nlinks, 2*linkcapacity)
+        if heapsize > heapcapacity:
+            heapcapacity = max(heapsize, 2*heapcapacity)
+        new = _layout(capacity, linkcapacity, heapcapacity)
+        # Map the file again rather than resizing the current mapping. Views
+        # of the current mapping may still be held by the caller. If only the
+        # heap grows, nothing moves and these views remain valid.
+        self._file.truncate(new[-1])
+        mm = mmap.mmap(self._file.fileno(), new[-1])
+        # Move the arrays to their new offset, starting with the last one. An
+        # array only moves forward so it does not overwrite the next one.
+        for i in reversed(range(len(old)-1)):
+            if new[i] != old[i]:
+                mm.move(new[i], old[i], old[i+1] - old[i])
+        header = memoryview(mm)[:_HEADER].cast('q')
+        header[_H_CAPACITY] = capacity
+        header[_H_LINKCAPACITY] = linkcapacity
+        header[_H_HEAPCAPACITY] = heapcapacity
+        header.release()
+        self._map(mm)
+
+    def _store(self, value):
+        # Append a pickled value to the heap and return its reference.
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        header = self._header
+        ref = header[_H_HEAPSIZE]
+        size = ref + 8 + len(data)
+        self._reserve(0, 0, size)
+        pos = self._heap + ref
+        _length.pack_into(self._mm, pos, len(data))
+        self._mm[pos+8:pos+8+len(data)] = data
+        self._header[_H_HEAPSIZE] = size
+        return ref
+
+    def _setkey(self, node, key):
+        # Store a typed key. Like an array, raise an OverflowError if it does
+        # not fit.
+        try:
+            self._keys[node] = key
+        except ValueError:
+            raise OverflowError('key {!r} does not fit in {}'.format(key, self._keytype))
+
+    def _init_nodes(self):
+        # Reset the file to just the head and the tail. The file keeps its
+        # size, so that views of it that are still held remain valid.
+        header, maxlevel = self._header, self.maxlevel
+        header[_H_NSLOTS] = 2
+        header[_H_NLINKS] = 2*maxlevel
+        header[_H_HEAPSIZE] = 0
+        for level in range(maxlevel+1):
+            header[_H_FREE+level] = -1
+        for node in (self._head, self._tail):
+            self._keys[node] = 0
+            self._vrefs[node] = -1
+            self._offsets[node] = node*maxlevel
+            self._levels[node] = maxlevel
+            self._skips[node] = 0
+        for i in range(maxlevel):
+            self._links[i] = self._tail
+            self._links[maxlevel+i] = -1
+
+    def _new_node(self, level, key, value):
+        # See CompactSkipList._new_node(). The free slots for each level form
+        # a list that is linked through their skip count. The key and value
+        # are stored before the slot is taken, so that an invalid key or a
+        # value that cannot be pickled leaves the list unchanged.
+        header = self._header
+        node = header[_H_FREE+level]
+        if node != -1:
+            self._setkey(node, key)
+            self._values[node] = value
+            header[_H_FREE+level] = self._skips[node]
+            return node
+        node, nlinks = header[_H_NSLOTS], header[_H_NLINKS]
+        self._reserve(node+1, nlinks+level)
+        self._setkey(node, key)
+        self._values[node] = value
+        self._offsets[node] = nlinks
+        for i in range(level):
+            self._links[nlinks+i] = -1
+        self._levels[node] = level
+        self._skips[node] = 0
+        header = self._header
+        header[_H_NSLOTS] = node+1
+        header[_H_NLINKS] = nlinks+level
+        return node
+
+    def _free_node(self, node):
+        # Release the slot of a removed node. Its forward links are still
+        # used by _remove(), so the free list is linked through its skip.
+        header = self._header
+        level = self._levels[node]
+        self._keys[node] = 0
+        self._vrefs[node] = -1
+        self._skips[node] = header[_H_FREE+level]
+        header[_H_FREE+level] = node
+
+    def _append_sorted(self, pairs, check=False):
+        # Reserve room for a chunk of pairs up front, so that the node arrays
+        # do not move while CompactSkipList._append_sorted() holds them.
+        pairs = iter(pairs)
+        while True:
+            chunk = list(islice(pairs, self._chunksize))
+            if not chunk:
+                break
+            header = self._header
+            self._reserve(header[_H_NSLOTS] + len(chunk),
+                          header[_H_NLINKS] + len(chunk)*self.maxlevel)
+            super(MappedSkipList, self)._append_sorted(chunk, check)
+
+    # The level and size are stored in the file.
+
+    @property
+    def _level(self):
+        return self._header[_H_LEVEL]
+
+    @_level.setter
+    def _level(self, level):
+        self._header[_H_LEVEL] = level
+
+    @property
+    def _size(self):
+        return self._header[_H_SIZE]
+
+    @_size.setter
+    def _size(self, size):
+        self._header[_H_SIZE] = size
+
+    # PUBLIC API ...
+
+    @property
+    def filename(self):
+        """The path of the file, or ``None`` for a temporary file."""
+        return self._filename
+
+    @classmethod
+    def from_sorted(cls, pairs, values=None, check=False, **kwargs):
+        """Create a new list from pairs that are already sorted on key.
+
+        See :meth:`SkipList.from_sorted`. If the file at *path* exists, it is
+        overwritten.
+        """
+        if values is not None:
+            pairs = zip(pairs, values)
+        path = kwargs.get('path')
+        if path is not None:
+            open(path, 'wb').close()
+        sl = cls(**kwargs)
+        sl._append_sorted(pairs, check)
+        return sl
+
+    def flush(self):
+        """Write all changes to disk."""
+        self._mm.flush()
+
+    def close(self):
+        """Close the file. The list cannot be used after it is closed."""
+        if self._mm is None:
+            return
+        mm = self._mm
+        self._mm = self._header = self._keys = self._vrefs = self._skips = \
+                self._offsets = self._links = self._levels = None
+        try:
+            mm.close()
+        except BufferError:
+            # An iterator still holds a view. The mapping is closed when it
+            # is garbage collected.
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
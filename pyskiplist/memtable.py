@@ -0,0 +1,277 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import pickle
+import struct
+import bisect
+from itertools import islice
+
+from .skiplist import SkipList
+
+__all__ = ['Memtable', 'Segment']
+
+
+# The approximate size of a node without its key and value. A node is a list
+# with the key, the value, on average two links, and a skip count.
+_nodesize = sys.getsizeof([None] * 5)
+
+
+def _pairsize(key, value):
+    # Return the approximate number of bytes used by a pair in a memtable.
+    return _nodesize + sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class Memtable(object):
+    """A write buffer of unique keys, for use in a log-structured store.
+
+    The pairs are stored in a :class:`SkipList`. A memtable keeps track of the
+    approximate number of bytes it uses in :attr:`nbytes`, so that it can be
+    flushed when it becomes too large. After :meth:`freeze`, the memtable
+    can no longer be changed. :meth:`flush` writes the pairs to an immutable
+    :class:`Segment` file.
+
+    The size of a pair is estimated with ``sys.getsizeof()`` of the key and
+    the value, plus the average size of a node. Objects that are referenced
+    by the key or the value are not counted.
+    """
+
+    __slots__ = ('_list', '_nbytes', '_frozen')
+
+    def __init__(self):
+        self._list = SkipList()
+        self._nbytes = sys.getsizeof(self._list)
+        self._frozen = False
+
+    @property
+    def nbytes(self):
+        """The approximate number of bytes used by the memtable."""
+        return self._nbytes
+
+    @property
+    def frozen(self):
+        """Whether the memtable is frozen."""
+        return self._frozen
+
+    def freeze(self):
+        """Freeze the memtable. After this, it cannot be changed."""
+        self._frozen = True
+
+    def replace(self, key, value):
+        """Set the value for *key*, inserting the pair if it does not exist.
+
+        This raises a ``ValueError`` if the memtable is frozen.
+        """
+        if self._frozen:
+            raise ValueError('memtable is frozen')
+        # Like SkipList.replace(), but we need the old value for the size.
+        sl = self._list
+        sl._find_lt(key)
+        node = sl._path[0][2]
+        if node is sl._tail or key < node[0]:
+            node = sl._create_node(key, value)
+            sl._insert(node)
+            self._nbytes += _pairsize(key, value)
+        else:
+            self._nbytes += sys.getsizeof(value) - sys.getsizeof(node[1])
+            sl._setvalue(node, value)
+
+    def search(self, key, default=None):
+        """Return the value for *key*, or *default* if it does not exist."""
+        return self._list.search(key, default)
+
+    def __contains__(self, key):
+        """Return whether *key* is contained in the memtable."""
+        return key in self._list
+
+    def __len__(self):
+        """Return the number of pairs in the memtable."""
+        return len(self._list)
+
+    __bool__ = __nonzero__ = lambda self: len(self._list) > 0
+
+    def __repr__(self):
+        return type(self).__name__ + '((' + repr(list(self.items()))[1:-1] + '))'
+
+    def items(self, start=None, stop=None, reverse=False):
+        """Return an iterator yielding pairs.
+
+        See :meth:`SkipList.items`.
+        """
+        return self._list.items(start, stop, reverse)
+
+    __iter__ = items
+
+    def keys(self, start=None, stop=None, reverse=False):
+        """Like :meth:`items` but returns only the keys."""
+        return self._list.keys(start, stop, reverse)
+
+    def values(self, start=None, stop=None, reverse=False):
+        """Like :meth:`items` but returns only the values."""
+        return self._list.values(start, stop, reverse)
+
+    def flush(self, path, blocksize=64):
+        """Freeze the memtable and write it to a segment file at *path*.
+
+        The pairs are written sequentially in a single pass. Return the
+        :class:`Segment`. See :meth:`Segment.write` for *blocksize*.
+        """
+        self.freeze()
+        return Segment.write(path, self._list.items(), blocksize)
+
+
+# Segment file format. The file starts with the magic. It is followed by the
+# blocks, each a pickled tuple with a list of keys and a list of values, and
+# the index, a pickled tuple with the number of pairs, the first key of each
+# block, and the offsets of the blocks and the index. The file ends with the
+# offset of the index and the magic.
+
+_MAGIC = b'PYSKIPSG'
+_trailer = struct.Struct('<q8s')
+
+
+class Segment(object):
+    """An immutable file with sorted pairs, written by :meth:`Memtable.flush`.
+
+    Opening a segment reads only its sparse index, which has the first key of
+    each block of pairs. A lookup reads and unpickles a single block, and a
+    range scan reads the blocks in the range. The keys must be unique, and
+    they and the values must be picklable.
+
+    A segment is not safe to use from multiple threads.
+    """
+
+    __slots__ = ('_file', '_size', '_firstkeys', '_offsets')
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._read_index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _read_index(self):
+        # Read the index from the end of the file.
+        fin = self._file
+        fin.seek(0, os.SEEK_END)
+        size = fin.tell()
+        fin.seek(0)
+        if size < len(_MAGIC) + _trailer.size or fin.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError('not a segment file: {!r}'.format(fin.name))
+        fin.seek(size - _trailer.size)
+        offset, magic = _trailer.unpack(fin.read(_trailer.size))
+        if magic != _MAGIC:
+            raise ValueError('segment file is truncated: {!r}'.format(fin.name))
+        fin.seek(offset)
+        self._size, self._firstkeys, self._offsets = pickle.load(fin)
+
+    @classmethod
+    def write(cls, path, pairs, blocksize=64):
+        """Write the pairs from the iterable *pairs* to a segment file.
+
+        The pairs must be sorted on key and the keys must be unique. They are
+        written in blocks of *blocksize* pairs. A larger block size makes the
+        index smaller, and lookups read more data. Return the new segment.
+        """
+        firstkeys, offsets = [], []
+        size = 0
+        pairs = iter(pairs)
+        with open(path, 'wb') as fout:
+            fout.write(_MAGIC)
+            while True:
+                block = list(islice(pairs, blocksize))
+                if not block:
+                    break
+                keys = [pair[0] for pair in block]
+                firstkeys.append(keys[0])
+                offsets.append(fout.tell())
+                pickle.dump((keys, [pair[1] for pair in block]), fout,
+                            pickle.HIGHEST_PROTOCOL)
+                size += len(block)
+            offsets.append(fout.tell())
+            pickle.dump((size, firstkeys, offsets), fout, pickle.HIGHEST_PROTOCOL)
+            fout.write(_trailer.pack(offsets[-1], _MAGIC))
+            fout.flush()
+            os.fsync(fout.fileno())
+        return cls(path)
+
+    def close(self):
+        """Close the segment file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Return the number of pairs in the segment."""
+        return self._size
+
+    __bool__ = __nonzero__ = lambda self: self._size > 0
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._file.name)
+
+    def _read_block(self, block):
+        # Read block number *block*. Return a list of keys and one of values.
+        fin, offsets = self._file, self._offsets
+        fin.seek(offsets[block])
+        return pickle.loads(fin.read(offsets[block+1] - offsets[block]))
+
+    def _find_block(self, key):
+        # Return the number of the block that may contain *key*.
+        return max(0, bisect.bisect_right(self._firstkeys, key) - 1)
+
+    def search(self, key, default=None):
+        """Return the value for *key*, or *default* if it does not exist.
+
+        This reads a single block.
+        """
+        if not self._size:
+            return default
+        keys, values = self._read_block(self._find_block(key))
+        ix = bisect.bisect_left(keys, key)
+        if ix == len(keys) or key < keys[ix]:
+            return default
+        return values[ix]
+
+    def __contains__(self, key):
+        """Return whether *key* is contained in the segment."""
+        return self.search(key, self) is not self
+
+    def items(self, start=None, stop=None):
+        """Return an iterator yielding pairs.
+
+        The *start* and *stop* arguments select a range of keys, like in
+        :meth:`SkipList.items`. Only the blocks in the range are read.
+        """
+        if not self._size:
+            return
+        block = 0 if start is None else self._find_block(start)
+        for block in range(block, len(self._firstkeys)):
+            keys, values = self._read_block(block)
+            ix = 0 if start is None else bisect.bisect_left(keys, start)
+            for ix in range(ix, len(keys)):
+                if stop is not None and not keys[ix] < stop:
+                    return
+                yield (keys[ix], values[ix])
+
+    __iter__ = items
+
+    def keys(self, start=None, stop=None):
+        """Like :meth:`items` but returns only the keys."""
+        return (item[0] for item in self.items(start, stop))
+
+    def values(self, start=None, stop=None):
+        """Like :meth:`items` but returns only the values."""
+        return (item[1] for item in self.items(start, stop))
@@ -0,0 +1,113 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import heapq
+
+__all__ = ['merge']
+
+
+def merge(*lists, **kwargs):
+    """merge(*lists, start=None, stop=None)
+
+    Return an iterator yielding the pairs of all *lists* in key order.
+
+    The lists are merged with a heap, which takes O(log k) time per pair for
+    k lists. Pairs with the same key are yielded in the order of the lists.
+    The *start* and *stop* arguments select a range of keys, like in
+    :meth:`SkipList.items`.
+
+    The lists can be any sorted lists from this package. If a list has a key
+    function, its pairs are ordered on their sort key. All lists must then
+    use the same key function, which is called once for every pair.
+    """
+    start = kwargs.pop('start', None)
+    stop = kwargs.pop('stop', None)
+    if kwargs:
+        raise TypeError('unexpected keyword argument {!r}'.format(next(iter(kwargs))))
+    # Each heap entry is [sort key, list number, pair, key function, pairs].
+    # The list number is unique, so the pairs themselves are never compared.
+    heap = []
+    for ix, sl in enumerate(lists):
+        key = getattr(sl, 'key', None)
+        pairs = iter(sl.items(start, stop))
+        for pair in pairs:
+            heap.append([pair[0] if key is None else key(pair[0]), ix, pair, key, pairs])
+            break
+    heapq.heapify(heap)
+    while len(heap) > 1:
+        entry = heap[0]
+        yield entry[2]
+        for pair in entry[4]:
+            entry[0] = pair[0] if entry[3] is None else entry[3](pair[0])
+            entry[2] = pair
+            heapq.heapreplace(heap, entry)
+            break
+        else:
+            heapq.heappop(heap)
+    # The last list does not need the heap.
+    if heap:
+        yield heap[0][2]
+        for pair in heap[0][4]:
+            yield pair
+
+
+def _keyed(pairs, key):
+    # Return an iterator yielding (sort key, pair) for each pair.
+    if key is None:
+        return ((pair[0], pair) for pair in pairs)
+    return ((key(pair[0]), pair) for pair in pairs)
+
+
+def _union(pairs, other, key=None):
+    # Yield all pairs from *pairs*, and the pairs from *other* with a key that
+    # is not in *pairs*. Both must be sorted on key. If *key* is given, it is
+    # used to get the sort key.
+    pairs, other = _keyed(pairs, key), _keyed(other, key)
+    a, b = next(pairs, None), next(other, None)
+    while a is not None and b is not None:
+        if b[0] < a[0]:
+            yield b[1]
+            b = next(other, None)
+        elif a[0] < b[0]:
+            yield a[1]
+            a = next(pairs, None)
+        else:
+            while b is not None and not a[0] < b[0]:
+                b = next(other, None)
+    while a is not None:
+        yield a[1]
+        a = next(pairs, None)
+    while b is not None:
+        yield b[1]
+        b = next(other, None)
+
+
+def _intersection(pairs, other, key=None):
+    # Yield the pairs from *pairs* with a key that is in *other*. See _union().
+    other = _keyed(other, key)
+    b = next(other, None)
+    for a in _keyed(pairs, key):
+        while b is not None and b[0] < a[0]:
+            b = next(other, None)
+        if b is None:
+            break
+        if not a[0] < b[0]:
+            yield a[1]
+
+
+def _difference(pairs, other, key=None):
+    # Yield the pairs from *pairs* with a key that is not in *other*. See
+    # _union().
+    other = _keyed(other, key)
+    b = next(other, None)
+    for a in _keyed(pairs, key):
+        while b is not None and b[0] < a[0]:
+            b = next(other, None)
+        if b is None or a[0] < b[0]:
+            yield a[1]
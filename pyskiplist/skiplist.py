@@ -12,8 +12,16 @@ import os
 import sys
 import math
 import random
+import pickle
+import functools
+from bisect import bisect_right
+from operator import itemgetter
+from itertools import islice
 
-__all__ = ['SkipList']
+from .snapshot import Snapshot, SnapshotLog
+from .merge import _union, _intersection, _difference
+
+__all__ = ['SkipList', 'SortKey']
 
 
 # The following functions are debugging functions. They are available only when
@@ -31,7 +39,7 @@ if __debug__:
     def dump(sl, file=sys.stdout):
         """Dump a skiplist to standard output."""
         print('== Dumping skiplist {0!r}'.format(sl), file=file)
-        print('Level: {}/{}'.format(sl.level, sl.maxlevel), file=file)
+        print('Level: {}/{}'.format(sl.level, sl.current_maxlevel), file=file)
         print('Size: {}'.format(len(sl)), file=file)
         node = sl._head
         print('{0} (head)'.format(fmtnode(node)), file=file)
@@ -51,7 +59,7 @@ if __debug__:
 
     def check(sl):
         """Check the internal structure of a skiplist."""
-        level = sl.maxlevel
+        level = sl.current_maxlevel
         assert level > 0
         while sl._head[1+level] is sl._tail and level > 1:
             level -= 1
@@ -64,7 +72,7 @@ if __debug__:
         while node is not sl._tail:
             assert isinstance(node, list)
             level = min(sl.level, max(1, len(node)-3))
-            assert 1 <= level <= sl.maxlevel
+            assert 1 <= level <= sl.current_maxlevel
             for i in range(1, level):
                 fnode = node[2+i]
                 flevel = min(sl.level, max(1, len(fnode)-3))
@@ -82,9 +90,63 @@ if __debug__:
             pos += 1
         assert sl._tail[0] is None
         assert sl._tail[1] is None
-        for i in range(sl.maxlevel):
+        for i in range(sl.current_maxlevel):
             assert sl._tail[2+i] is None
+        assert pos == len(sl) + 1
         assert len(sl) == inbound[id(sl._tail)] + node[-1]
+        # The cached path must be the search path to the node at the position
+        # in _distance[0], so that it can be used as a finger.
+        fpos = sl._distance[0]
+        lastnodes = [(sl._head, 0)] * sl.level
+        node = sl._head[2]
+        pos = 1
+        while node is not sl._tail and pos <= fpos:
+            for i in range(min(sl.level, max(1, len(node)-3))):
+                lastnodes[i] = (node, pos)
+            node = node[2]
+            pos += 1
+        for i in range(sl.level):
+            assert sl._path[i] is lastnodes[i][0]
+            assert sl._distance[i] == lastnodes[i][1]
+        # In a deterministic list, each gap has one to three nodes, or up to
+        # three if it ends at the tail. The top level is not bounded if it
+        # is the maximum level.
+        if sl.levels == 'deterministic':
+            for i in range(min(sl.level, sl.current_maxlevel-1)):
+                node = sl._head
+                while node is not sl._tail:
+                    gap = sl._gap(node, i)
+                    assert len(gap) <= 3
+                    assert gap or node[3+i] is sl._tail
+                    node = node[3+i]
+        # The hash index maps each key to its first node.
+        if sl._index is not None:
+            index = {}
+            node = sl._head[2]
+            while node is not sl._tail:
+                index.setdefault(node[0], node)
+                node = node[2]
+            assert len(index) == len(sl._index)
+            for key in index:
+                assert sl._index[key] is index[key]
+        # Each link on level i > 0 to a node other than the tail has the
+        # combination of the values it spans.
+        if sl._aggs is not None:
+            nodes = 0
+            for i in range(1, sl.level):
+                node = sl._head
+                while node is not sl._tail:
+                    nnode = node[2+i]
+                    if nnode is not sl._tail:
+                        values = []
+                        while node is not nnode:
+                            node = node[2]
+                            values.append(node[1] if sl._key is None else node[1][1])
+                        assert sl._aggs[id(nnode)][i-1] == functools.reduce(sl._aggregate, values)
+                        if i == len(nnode)-4:
+                            nodes += 1
+                    node = nnode
+            assert len(sl._aggs) == nodes
 
     def nodesize(node):
         """Return the size of a skiplist node."""
@@ -100,6 +162,7 @@ if __debug__:
         """Return total size of a skiplist."""
         size = sys.getsizeof(sl)
         size += sys.getsizeof(sl._level)
+        size += sys.getsizeof(sl._size)
         node = sl._head
         while node is not sl._tail:
             size += nodesize(node)
@@ -109,9 +172,67 @@ if __debug__:
         size += sys.getsizeof(sl._distance)
         for el in sl._distance:
             size += sys.getsizeof(el)
+        if sl._index is not None:
+            size += sys.getsizeof(sl._index)  # references to keys and nodes
+        if sl._aggs is not None:
+            size += sys.getsizeof(sl._aggs)
+            for aggs in sl._aggs.values():
+                size += sys.getsizeof(aggs)
+                for agg in aggs:
+                    size += sys.getsizeof(agg)
         return size
 
 
+class SortKey(object):
+    """A raw sort key.
+
+    This can be passed instead of a key to the by-key methods of a
+    :class:`SkipList` that was created with a *key* function. The key function
+    is then not called, and the pairs are searched for *key* directly.
+    """
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __repr__(self):
+        return 'SortKey({!r})'.format(self.key)
+
+
+def _unpickle(cls, pairs, kwargs):
+    # Recreate a list from its pickled pairs. See SkipList.__reduce__().
+    return cls.from_sorted(pairs, **kwargs)
+
+
+def _dump_pairs(pairs, fileobj, chunksize):
+    # Write the iterable *pairs* to *fileobj* in chunks. See SkipList.dump().
+    pickler = pickle.Pickler(fileobj, pickle.HIGHEST_PROTOCOL)
+    pickler.dump(('pyskiplist', 1))
+    pairs = iter(pairs)
+    while True:
+        chunk = list(islice(pairs, chunksize))
+        pickler.dump(chunk)
+        # Forget the pickled objects, otherwise the memo grows unbounded.
+        pickler.clear_memo()
+        if not chunk:
+            break
+
+
+def _load_pairs(fileobj):
+    # Read pairs that were written by _dump_pairs() from *fileobj*.
+    unpickler = pickle.Unpickler(fileobj)
+    header = unpickler.load()
+    if header != ('pyskiplist', 1):
+        raise ValueError('not a skiplist dump: {!r}'.format(header))
+    while True:
+        chunk = unpickler.load()
+        if not chunk:
+            break
+        for pair in chunk:
+            yield pair
+
+
 class SkipList(object):
     """An indexable skip list.
 
@@ -122,13 +243,89 @@ class SkipList(object):
 
     The keys of all pairs you add to the skiplist must be be comparable against
     each other, and define the ``<`` and ``<=`` operators.
+
+    If *finger* is true, then searches start from the location of the previous
+    operation rather than from the start of the list. A search then takes
+    O(log d) time where d is the distance to the previous location. This is
+    faster if successive operations tend to be close to each other, for
+    example with time ordered keys or paginated scans. It is a little slower
+    for random access.
+
+    If *key* is provided, it must be a function of one argument that returns
+    the sort key for a key, like the *key* argument of :func:`sorted`. The sort
+    key is computed once when a pair is inserted and is stored on the node, so
+    that searches only compare sort keys. The methods that take a key, such as
+    :meth:`search` and :meth:`items`, accept either a key, for which the sort
+    key is computed, or a :class:`SortKey` wrapping a sort key.
+
+    The *p* argument is the probability that a node with a given level also
+    has the next level, and *maxlevel* is the maximum level of a node. A
+    smaller *p* makes the nodes smaller, and searches compare more keys. The
+    defaults are 1/e and 20, which suit lists of up to about e^20 pairs. If
+    *maxlevel* is ``'auto'``, the maximum level starts small and is raised
+    as the list grows, so that it stays near the logarithm of the size to
+    base 1/p. A small list then has a smaller head, and searches in a very
+    large list remain O(log N). The defaults are the class attributes ``p``,
+    which holds the probability scaled to a 31-bit integer, and ``maxlevel``,
+    and a subclass can override them. The values for a list are available
+    as :attr:`probability` and :attr:`current_maxlevel`.
+
+    The *levels* argument selects how the level of a new node is chosen. The
+    default, ``'random'``, draws a random number for every level, as in
+    Pugh's paper. ``'geometric'`` draws a single random number per node and
+    looks up the level in a table of thresholds. It gives the same
+    distribution with fewer draws, and is faster for a large *p*. Both use a
+    generator that is shared by all lists, unless *seed* is provided, in
+    which case the list gets its own generator seeded with *seed*, and
+    builds the same structure every time. This makes benchmarks
+    reproducible. *levels* may also be a function of no arguments that
+    returns a level. It is limited to the range 1 to *maxlevel*.
+
+    If *levels* is ``'deterministic'``, the list is a deterministic 1-2-3
+    skip list. Every node is inserted at level 1, and nodes are promoted and
+    demoted so that between two consecutive nodes on a level there are one
+    to three nodes on the level below, except at the end of the list where
+    there may be none. Searches, insertions and removals then take O(log N)
+    time in the worst case rather than in expectation. Removing a range
+    takes O(k log N) time for k pairs in this mode. The number of levels can
+    be up to log2(N), so use ``maxlevel='auto'`` for lists of more than
+    about 2^20 pairs.
+
+    If *hash_index* is true, the list also keeps a dictionary that maps each
+    key to its first node. :meth:`search`, :meth:`search_many` and ``in``
+    then take O(1) time, as does :meth:`replace` for a key that exists.
+    :meth:`remove` and :meth:`pop` still need the search path to unlink a
+    node, but they skip the search if the key is not in the list. The keys
+    must be hashable, and keys that compare equal must also have the same
+    hash, like for a ``dict``. With a *key* function, this applies to the
+    sort keys. The index takes about 30 to 50 bytes per key, and removing a
+    range takes O(k) time for k pairs to keep it up to date.
+
+    If *aggregate* is provided, it must be an associative function of two
+    values that returns their combination, such as :func:`operator.add`,
+    :func:`min` or :func:`max`. The list then stores the combination of the
+    values spanned by each link on level 2 and up, in the same way as the
+    skip counts, and :meth:`aggregate` and :meth:`aggregate_pos` combine the
+    values in a range of keys or positions in O(log N) time. The function
+    does not need to be commutative, and the values are combined in list
+    order. Insertions, removals and changing a value then combine about
+    log(N)/p aggregates to update the links on the search path, which makes
+    them three to seven times slower. The aggregates are computed before the
+    list is changed, so if the function raises an exception, the list is
+    left unchanged. The aggregates take about 55 bytes per pair for integer
+    sums, and removing a range takes O(k) time for k pairs.
     """
 
     UNSET = object()
 
+    # The defaults for *p*, as a threshold for a 31-bit random number, and
+    # for *maxlevel*.
     p = int((1<<31) / math.e)
     maxlevel = 20
 
+    # The initial maximum level if *maxlevel* is 'auto'.
+    _auto_maxlevel = 4
+
     # Kudos to http://pythonsweetness.tumblr.com/post/45227295342 for some
     # useful tricks, including using a list for the nodes to save memory.
 
@@ -141,61 +338,186 @@ class SkipList(object):
     _rnd = random.Random()
     _rnd.seed(os.urandom(16))
 
-    __slots__ = ('_level', '_head', '_tail', '_path', '_distance')
-
-    def __init__(self):
+    _level_generators = ('random', 'geometric', 'deterministic')
+
+    __slots__ = ('_level', '_size', '_head', '_tail', '_path', '_distance',
+                 '_finger', '_key', '_pair', '_log', '_p', '_maxlevel', '_grow_at',
+                 '_levels', '_seed', '_random', '_thresholds', '_index',
+                 '_aggregate', '_aggs')
+
+    def __init__(self, finger=False, key=None, p=None, maxlevel=None,
+                 levels='random', seed=None, hash_index=False, aggregate=None):
+        if p is None:
+            p = self.p / float(1<<31)
+        if not 0 < p < 1:
+            raise ValueError('p must be between 0 and 1, got {!r}'.format(p))
+        # The probability is stored as a threshold for a 31-bit random number.
+        self._p = int(p * (1<<31))
+        if maxlevel is None:
+            maxlevel = self.maxlevel
+        if maxlevel == 'auto':
+            self._maxlevel = self._auto_maxlevel
+            self._grow_at = int(self.probability ** -self._maxlevel)
+        elif isinstance(maxlevel, int) and 1 < maxlevel < 256:
+            self._maxlevel = maxlevel
+            self._grow_at = None
+        else:
+            raise ValueError('invalid maxlevel: {!r}'.format(maxlevel))
+        if levels not in self._level_generators and not callable(levels):
+            raise ValueError('unknown level generator: {!r}'.format(levels))
+        self._levels = levels
+        self._seed = seed
+        self._random = self._rnd if seed is None else random.Random(seed)
+        self._thresholds = None
+        if levels == 'geometric':
+            # The thresholds are p**j scaled to 53 bits for j = ..., 2, 1, in
+            # ascending order. Thresholds below 1 can never be reached.
+            thresholds, j = [], 1
+            while int(p**j * (1<<53)) > 0:
+                thresholds.append(int(p**j * (1<<53)))
+                j += 1
+            self._thresholds = thresholds[::-1]
         self._level = 1
-        self._head = self._new_node(self.maxlevel, None, None)
-        self._tail = self._new_node(self.maxlevel, None, None)
-        for i in range(self.maxlevel):
+        self._size = 0
+        self._head = self._new_node(self._maxlevel, None, None)
+        self._tail = self._new_node(self._maxlevel, None, None)
+        for i in range(self._maxlevel):
             self._head[2+i] = self._tail
-        self._path = [None] * self.maxlevel
-        self._distance = [None] * self.maxlevel
+        self._path = [self._head] * self._maxlevel
+        self._distance = [0] * self._maxlevel
+        self._finger = finger
+        self._key = key
+        self._pair = itemgetter(0, 1) if key is None else itemgetter(1)
+        self._log = None
+        self._index = {} if hash_index else None
+        # The aggregates of the links on level i > 0 into a node are stored
+        # in a list by the id of the node, at index i-1.
+        self._aggregate = aggregate
+        self._aggs = None if aggregate is None else {}
 
     def _new_node(self, level, key, value):
         # Node layout: [key, value, next*LEVEL, skip?]
         # The "skip" element indicates how many nodes are skipped by the
-        # highest level incoming link.
+        # highest level incoming link. With a key function, "key" is the sort
+        # key and "value" is the (key, value) pair. _pair() returns the pair.
         if level == 1:
             return [key, value, None]
         else:
             return [key, value] + [None]*level + [0]
 
     def _random_level(self):
-        # Exponential distribution as per Pugh's paper.
-        l = 1
-        maxlevel = min(self.maxlevel, self.level+1)
-        while l < maxlevel and self._rnd.getrandbits(31) < self.p:
-            l += 1
-        return l
+        # Return the level for a new node. It is at most one higher than the
+        # current level.
+        return self._draw_level(min(self._maxlevel, self.level+1))
+
+    def _draw_level(self, maxlevel):
+        # Draw a level between 1 and *maxlevel* with the level generator.
+        levels = self._levels
+        if levels == 'random':
+            # Exponential distribution as per Pugh's paper.
+            l = 1
+            rnd = self._random.getrandbits
+            while l < maxlevel and rnd(31) < self._p:
+                l += 1
+            return l
+        elif levels == 'geometric':
+            # A single draw. The level is one more than the number of
+            # thresholds above the random number, i.e. level j+1 is reached
+            # with probability p**j.
+            thresholds = self._thresholds
+            l = len(thresholds) + 1 - bisect_right(thresholds, self._random.getrandbits(53))
+        elif levels == 'deterministic':
+            # Nodes are promoted later by _split_gaps().
+            return 1
+        else:
+            l = levels()
+        return max(1, min(l, maxlevel))
+
+    def _raise_maxlevel(self):
+        # Add a level to the head and the tail, for maxlevel='auto'. The new
+        # level is empty, so the level of the list is unchanged.
+        level = self._maxlevel
+        self._head.insert(2+level, self._tail)
+        self._tail.insert(2+level, None)
+        self._path.append(self._head)
+        self._distance.append(0)
+        self._maxlevel = level + 1
+        self._grow_at = int(self.probability ** -self._maxlevel)
 
     def _create_node(self, key, value):
         # Create a new node, updating the list level if required.
+        if self._grow_at is not None and self._size >= self._grow_at:
+            self._raise_maxlevel()
         level = self._random_level()
         if level > self.level:
-            self._tail[-1] = len(self)
+            self._tail[-1] = self._size
             self._level = level
             self._path[level-1] = self._head
             self._distance[level-1] = 0
         return self._new_node(level, key, value)
 
-    def _find_lt(self, key):
-        # Find path to last node < key
-        node = self._head
-        distance = 0
-        for i in reversed(range(self.level)):
+    def _sortkey(self, key):
+        # Return the sort key for *key*. Only call this with a key function.
+        return key.key if type(key) is SortKey else self._key(key)
+
+    def _setvalue(self, node, value):
+        # Set the value of *node*, keeping its key.
+        if self._aggs is not None:
+            if self._path[0][2] is not node:
+                # The node was found with the hash index, without a search.
+                self._find_lt(node[0], self._finger)
+            updates = self._aggregate_updates(self._path, self._path, node, node, value)
+        if self._log is not None:
+            self._log.setvalue(node, node[1])
+        node[1] = value if self._key is None else (node[1][0], value)
+        if self._aggs is not None:
+            self._apply_aggregates(updates)
+
+    def _climb(self, key, inclusive, path, distances):
+        # Find the level from which a finger search for *key* can start. The
+        # *path* and *distances* are used as the finger. We climb up until the
+        # node on the path is before *key* and its successor on the next level
+        # is not, so that the path above the returned level stays valid. This
+        # takes O(log d) steps where d is the distance between the finger and
+        # *key*.
+        head, tail = self._head, self._tail
+        top = self.level - 1
+        for i in range(top):
+            node = path[i]
+            if node is head or (node[0] <= key if inclusive else node[0] < key):
+                nnode = path[i+1][3+i]
+                if nnode is tail or not (nnode[0] <= key if inclusive else nnode[0] < key):
+                    return i, node, distances[i]
+        node = path[top]
+        if node is head or (node[0] <= key if inclusive else node[0] < key):
+            return top, node, distances[top]
+        return top, head, 0
+
+    def _find_lt(self, key, finger=False, path=None, distances=None):
+        # Find path to last node < key. If *finger* is true, search from the
+        # current path rather than from the head. The path is stored in
+        # _path and _distance, or in *path* and *distances* if provided.
+        if path is None:
+            path, distances = self._path, self._distance
+        if finger:
+            level, node, distance = self._climb(key, False, path, distances)
+        else:
+            level, node, distance = self.level-1, self._head, 0
+        for i in reversed(range(level+1)):
             nnode = node[2+i]
             while nnode is not self._tail and nnode[0] < key:
                 nnode, node = nnode[2+i], nnode
                 distance += 1 if i == 0 else node[-1]
-            self._path[i] = node
-            self._distance[i] = distance
+            path[i] = node
+            distances[i] = distance
 
-    def _find_lte(self, key):
-        # Find path to last node <= key
-        node = self._head
-        distance = 0
-        for i in reversed(range(self.level)):
+    def _find_lte(self, key, finger=False):
+        # Find path to last node <= key. See _find_lt() for *finger*.
+        if finger:
+            level, node, distance = self._climb(key, True, self._path, self._distance)
+        else:
+            level, node, distance = self.level-1, self._head, 0
+        for i in reversed(range(level+1)):
             nnode = node[2+i]
             while nnode is not self._tail and nnode[0] <= key:
                 nnode, node = nnode[2+i], nnode
@@ -203,22 +525,114 @@ class SkipList(object):
             self._path[i] = node
             self._distance[i] = distance
 
-    def _find_pos(self, pos):
-        # Create path to node at pos.
-        node = self._head
-        distance = 0
-        for i in reversed(range(self.level)):
+    def _climb_pos(self, pos, path, distance):
+        # Like _climb() but for a position. The position of the successor of
+        # the finger on level i+1 follows from the skip count of its highest
+        # incoming link, which starts at the node on the path at that level.
+        tail = self._tail
+        top = self.level - 1
+        for i in range(top):
+            if distance[i] <= pos:
+                nnode = path[i+1][3+i]
+                if nnode is tail:
+                    return i, path[i], distance[i]
+                j = len(nnode) - 4
+                if distance[j if j < top else top] + nnode[-1] > pos:
+                    return i, path[i], distance[i]
+        if distance[top] <= pos:
+            return top, path[top], distance[top]
+        return top, self._head, 0
+
+    def _find_pos(self, pos, finger=False, path=None, distances=None):
+        # Create path to node at pos. See _find_lt() for the arguments.
+        if path is None:
+            path, distances = self._path, self._distance
+        if finger:
+            level, node, distance = self._climb_pos(pos, path, distances)
+        else:
+            level, node, distance = self.level-1, self._head, 0
+        for i in reversed(range(level+1)):
             nnode = node[2+i]
             ndistance = distance + (1 if i == 0 else nnode[-1])
             while nnode is not self._tail and ndistance <= pos:
                 nnode, node, distance = nnode[2+i], nnode, ndistance
                 ndistance += 1 if i == 0 else nnode[-1]
-            self._path[i] = node
-            self._distance[i] = distance
+            path[i] = node
+            distances[i] = distance
+
+    # The _locate_*() functions are used by the read-only operations. Unlike
+    # the _find_*() functions they keep the search path in local variables,
+    # so that multiple threads can read from a list at the same time. They
+    # return the last node of the search and its position. If *path* is a
+    # list, the search path is stored in it. With finger search, the search
+    # does use and update the cached path, as that is what makes it fast.
+
+    def _locate_lt(self, key, path=None):
+        # Locate the last node < key.
+        if self._finger:
+            self._find_lt(key, True)
+            if path is not None:
+                path[:] = self._path[:self.level]
+            return self._path[0], self._distance[0]
+        node, distance, tail = self._head, 0, self._tail
+        for i in reversed(range(self.level)):
+            nnode = node[2+i]
+            while nnode is not tail and nnode[0] < key:
+                nnode, node = nnode[2+i], nnode
+                distance += 1 if i == 0 else node[-1]
+            if path is not None:
+                path[i] = node
+        return node, distance
+
+    def _locate_lte(self, key):
+        # Locate the last node <= key.
+        if self._finger:
+            self._find_lte(key, True)
+            return self._path[0], self._distance[0]
+        node, distance, tail = self._head, 0, self._tail
+        for i in reversed(range(self.level)):
+            nnode = node[2+i]
+            while nnode is not tail and nnode[0] <= key:
+                nnode, node = nnode[2+i], nnode
+                distance += 1 if i == 0 else node[-1]
+        return node, distance
+
+    def _locate_pos(self, pos, path=None):
+        # Locate the node at position pos.
+        if self._finger:
+            self._find_pos(pos, True)
+            if path is not None:
+                path[:] = self._path[:self.level]
+            return self._path[0], self._distance[0]
+        node, distance, tail = self._head, 0, self._tail
+        for i in reversed(range(self.level)):
+            nnode = node[2+i]
+            ndistance = distance + (1 if i == 0 else nnode[-1])
+            while nnode is not tail and ndistance <= pos:
+                nnode, node, distance = nnode[2+i], nnode, ndistance
+                ndistance += 1 if i == 0 else nnode[-1]
+            if path is not None:
+                path[i] = node
+        return node, distance
 
     def _insert(self, node):
         # Insert a node in the list. The _path and _distance must be set.
         path, distance = self._path, self._distance
+        if self._aggs is not None:
+            try:
+                updates = self._aggregate_updates(path, path, path[0], node,
+                                                  node[1] if self._key is None else node[1][1])
+            except Exception:
+                # Undo a level increase by _create_node().
+                self._reduce_level()
+                raise
+        if self._log is not None:
+            self._log.insert(node)
+        if self._index is not None:
+            # The node is the first with its key unless its predecessor has
+            # the same key.
+            if path[0] is self._head or path[0][0] < node[0]:
+                self._index[node[0]] = node
         # Update pointers
         level = max(1, len(node) - 3)
         for i in range(level):
@@ -226,6 +640,10 @@ class SkipList(object):
             path[i][2+i] = node
         if level > 1:
             node[-1] = 1 + distance[0] - distance[level-1]
+        if self._aggs is not None:
+            if level > 1:
+                self._aggs[id(node)] = [None] * (level-1)
+            self._apply_aggregates(updates)
         # Update skip counts
         node = node[2]
         i = 2; j = min(len(node) - 3, self.level)
@@ -235,13 +653,37 @@ class SkipList(object):
                 j = min(len(node) - 3, self.level)
             node[-1] -= distance[0] - distance[j-1] if j <= level else -1
             i = j+1
+        self._size += 1
+        if self._levels == 'deterministic':
+            self._split_gaps()
+
+    def _advance_path(self, node):
+        # If *node* was inserted before the tail, move the _path to it, so
+        # that the next append does not need a search. A deterministic list
+        # may have promoted nodes after the _path, so it is left as is.
+        if node[2] is self._tail and self._levels != 'deterministic':
+            path, distance = self._path, self._distance
+            pos = distance[0] + 1
+            for i in range(max(1, len(node) - 3)):
+                path[i] = node
+                distance[i] = pos
 
     def _remove(self, node):
         # Remove a node. The _path and _distance must be set.
         path, distance = self._path, self._distance
+        if self._aggs is not None:
+            updates = self._aggregate_updates(path, path, node)
+        if self._log is not None:
+            self._log.remove(path[0], node, node)
+        if self._index is not None:
+            self._unindex(node, node[2])
         level = max(1, len(node) - 3)
         for i in range(level):
             path[i][2+i] = node[2+i]
+        if self._aggs is not None:
+            if level > 1:
+                del self._aggs[id(node)]
+            self._apply_aggregates(updates)
         # Update skip counts
         value = node[1]
         node = node[2]
@@ -252,12 +694,485 @@ class SkipList(object):
                 j = min(len(node) - 3, self.level)
             node[-1] += distance[0] - distance[j-1] if j <= level else -1
             i = j+1
-        # Reduce level if last node on current level was removed
-        while self.level > 1 and self._head[1+self.level] is self._tail:
-            self._level -= 1
-            self._tail[-1] += self._tail[-1] - len(self)
+        self._size -= 1
+        self._reduce_level()
+        if self._levels == 'deterministic':
+            self._join_gaps(level)
         return value
 
+    def _remove_run(self, path, distance):
+        # Remove all nodes after *path* up to and including the node at the
+        # current _path. The run is unlinked with one pointer update and one
+        # skip count update per level. Afterwards _path is set to *path*.
+        rpath, rdistance = self._path, self._distance
+        count = rdistance[0] - distance[0]
+        if count <= 0:
+            return 0
+        if self._levels == 'deterministic':
+            # Unlinking the run at once would leave gaps that are too large.
+            # Remove the nodes one by one so that they are rebalanced.
+            for i in range(count):
+                self._find_pos(distance[0])
+                self._remove(rpath[0][2])
+            return count
+        if self._aggs is not None:
+            updates = self._aggregate_updates(path, rpath, rpath[0])
+        if self._log is not None:
+            self._log.remove(path[0], path[0][2], rpath[0])
+        if self._index is not None:
+            node = path[0]
+            while node is not rpath[0]:
+                node = node[2]
+                self._unindex(node, rpath[0][2])
+        if self._aggs is not None:
+            node = path[0]
+            while node is not rpath[0]:
+                node = node[2]
+                if len(node) > 3:
+                    del self._aggs[id(node)]
+        for i in range(self.level):
+            if rpath[i] is not path[i]:
+                path[i][2+i] = rpath[i][2+i]
+        # Update skip counts of the first nodes after the run
+        node = rpath[0][2]
+        i = 2; j = min(len(node) - 3, self.level)
+        while i <= self.level:
+            while j < i:
+                node = node[i]
+                j = min(len(node) - 3, self.level)
+            node[-1] += rdistance[j-1] - distance[j-1] - count
+            i = j+1
+        self._size -= count
+        rpath[:] = path
+        rdistance[:] = distance
+        self._reduce_level()
+        if self._aggs is not None:
+            self._apply_aggregates(updates)
+        return count
+
+    def _unindex(self, node, nnode):
+        # Remove *node* from the hash index. If it is the first node with its
+        # key, the next one becomes the first, unless *nnode*, the node that
+        # will follow it after the removal, has a different key.
+        index, key = self._index, node[0]
+        if index.get(key) is node:
+            if nnode is not self._tail and not key < nnode[0]:
+                index[key] = nnode
+            else:
+                del index[key]
+
+    def _reduce_level(self):
+        # Reduce level if last node on current level was removed
+        if self.level > 1 and self._head[1+self.level] is self._tail:
+            while self.level > 1 and self._head[1+self.level] is self._tail:
+                self._level -= 1
+            self._tail[-1] = self._size - self._last_distance()
+
+    def _last_distance(self):
+        # Return the position of the last node on the highest level.
+        idx = self.level + 1
+        if idx == 2:
+            return self._size
+        dist = 0
+        node = self._head[idx]
+        while node is not self._tail:
+            dist += node[-1]
+            node = node[idx]
+        return dist
+
+    def _update_aggregate(self, node, i):
+        # Recompute the aggregate of the link from *node* on level i > 0 by
+        # combining the links on level i-1 that it spans. Links to the tail
+        # do not have an aggregate.
+        stop = node[2+i]
+        if stop is self._tail:
+            return
+        func, aggs = self._aggregate, self._aggs
+        if i == 1:
+            key = self._key
+            node = node[2]
+            acc = node[1] if key is None else node[1][1]
+            while node is not stop:
+                node = node[2]
+                acc = func(acc, node[1] if key is None else node[1][1])
+        else:
+            node = node[1+i]
+            acc = aggs[id(node)][i-2]
+            while node is not stop:
+                node = node[1+i]
+                acc = func(acc, aggs[id(node)][i-2])
+        aggs[id(stop)][i-1] = acc
+
+    def _aggregate_updates(self, lpath, rpath, last, node=None, value=UNSET):
+        # Return the new aggregates of the links on levels 1 and up that
+        # span a change after lpath[0], as a list of (node, level, aggregate)
+        # tuples. The change replaces the nodes after lpath[0] up to and
+        # including *last* by *node* with *value*. *node* is None for a
+        # removal, and *last* is lpath[0] for an insertion. *rpath* is the
+        # search path to *last*. The aggregates are computed from the current
+        # links, before the list is changed, so that an aggregate function
+        # that raises leaves the list unchanged.
+        func, aggs, key, tail = self._aggregate, self._aggs, self._key, self._tail
+        unset = self.UNSET
+        def combine(acc, value):
+            return value if acc is unset else acc if value is unset else func(acc, value)
+        nlevel = 0 if node is None else len(node) - 3
+        updates = []
+        # The combined values after lpath[i] up to and including lpath[0],
+        # and after *last* up to and including its successor on level i.
+        left = right = unset
+        rnode = last
+        for i in range(1, self.level):
+            acc, lnode = unset, lpath[i]
+            while lnode is not lpath[i-1]:
+                lnode = lnode[1+i]
+                acc = combine(acc, aggs[id(lnode)][i-2] if i > 1 else
+                                   lnode[1] if key is None else lnode[1][1])
+            left = combine(acc, left)
+            stop = last[2+i] if len(last)-3 > i else rpath[i][2+i]
+            while rnode is not stop and stop is not tail:
+                rnode = rnode[1+i]
+                right = combine(right, aggs[id(rnode)][i-2] if i > 1 else
+                                       rnode[1] if key is None else rnode[1][1])
+            if i < nlevel:
+                updates.append((node, i, combine(left, value)))
+                if node is not last and stop is not tail:
+                    updates.append((stop, i, right))
+            elif stop is not tail:
+                updates.append((stop, i, combine(combine(left, value), right)))
+        return updates
+
+    def _apply_aggregates(self, updates):
+        # Store the aggregates returned by _aggregate_updates().
+        aggs = self._aggs
+        for node, i, agg in updates:
+            aggs[id(node)][i-1] = agg
+
+    def _build_aggregates(self):
+        # Compute the aggregates of all links, level by level. This takes
+        # O(N) time.
+        aggs, head, tail = self._aggs, self._head, self._tail
+        aggs.clear()
+        node = head[3]
+        while node is not tail:
+            aggs[id(node)] = [None] * (len(node)-4)
+            node = node[3]
+        for i in range(1, self.level):
+            node = head
+            while node is not tail:
+                self._update_aggregate(node, i)
+                node = node[2+i]
+
+    def _aggregate_run(self, node, path, default):
+        # Combine the values of the nodes after *node* up to and including
+        # path[0], where *path* is the search path to path[0]. A link on
+        # level i stays within the run unless it starts at path[i], the last
+        # node of the run on that level. We climb from *node* as long as the
+        # links stay within the run, and then descend to path[0].
+        func, aggs, key = self._aggregate, self._aggs, self._key
+        level = self.level
+        acc = default
+        first = True
+        i = 0
+        while True:
+            nlevel = min(level, max(1, len(node)-3))
+            while i+1 < nlevel and node is not path[i+1]:
+                i += 1
+            if node is path[i]:
+                break
+            node = node[2+i]
+            if i > 0:
+                value = aggs[id(node)][i-1]
+            else:
+                value = node[1] if key is None else node[1][1]
+            acc = value if first else func(acc, value)
+            first = False
+        while i > 0:
+            i -= 1
+            while node is not path[i]:
+                node = node[2+i]
+                if i > 0:
+                    value = aggs[id(node)][i-1]
+                else:
+                    value = node[1] if key is None else node[1][1]
+                acc = value if first else func(acc, value)
+                first = False
+        return acc
+
+    # The following functions maintain a deterministic 1-2-3 skip list. The
+    # gap of a node on level i is the run of nodes on level i between the
+    # node and its successor on level i+1. These nodes have exactly i+1
+    # links. Every gap has one to three nodes, except a gap that ends at the
+    # tail, which may be empty. An insertion can grow a gap to four nodes,
+    # and a removal can merge two gaps into one of up to seven nodes. These
+    # are split by promoting the middle node, which then joins the gap on
+    # the next level. A removal can also leave a gap empty. It is then
+    # joined with its neighbor by demoting the node between them, and split
+    # again if that makes it too large. The positions of the nodes do not
+    # change, so _path is updated to remain the path to _distance[0].
+
+    def _gap(self, node, i):
+        # Return the gap of *node* on level i.
+        stop = node[3+i]
+        gap = []
+        node = node[2+i]
+        while node is not stop:
+            gap.append(node)
+            node = node[2+i]
+        return gap
+
+    def _promote(self, node, pos, i, gap):
+        # Promote the middle node of *gap*, the gap of *node* on level i, to
+        # level i+1. The *pos* argument is the position of *node*.
+        ix = len(gap) // 2
+        mnode = gap[ix]
+        skip = ix+1 if i == 0 else sum(n[-1] for n in gap[:ix+1])
+        nnode = node[3+i]
+        if i == 0:
+            mnode.extend((nnode, skip))
+        else:
+            mnode.insert(3+i, nnode)
+            mnode[-1] = skip
+        node[3+i] = mnode
+        # The incoming link of the successor now starts at the new node.
+        if nnode is self._tail:
+            if i+1 == self.level:
+                self._level += 1
+                self._path[i+1], self._distance[i+1] = self._head, 0
+            if i+1 == self.level-1:
+                self._tail[-1] = self._size - pos - skip
+        elif len(nnode) == i+5:
+            nnode[-1] -= skip
+        if pos + skip <= self._distance[0]:
+            self._path[i+1], self._distance[i+1] = mnode, pos + skip
+        if self._aggs is not None:
+            # The link from *node* is split in two. The links above span the
+            # same nodes as before.
+            self._aggs.setdefault(id(mnode), []).append(None)
+            self._update_aggregate(node, i+1)
+            self._update_aggregate(mnode, i+1)
+        return mnode
+
+    def _demote(self, node, pos, i):
+        # Demote the successor of *node* on level i+1, which must have i+2
+        # links, to level i. The *pos* argument is the position of *node*.
+        mnode = node[3+i]
+        skip = mnode[-1]
+        nnode = node[3+i] = mnode[3+i]
+        if i == 0:
+            del mnode[3:]
+        else:
+            # The new incoming link starts at the last node of node's gap.
+            n = node[2+i]
+            while n is not mnode:
+                mnode[-1] -= n[-1]
+                n = n[2+i]
+            del mnode[3+i]
+        if nnode is self._tail:
+            if i+1 == self.level-1:
+                self._tail[-1] += skip
+                self._reduce_level()
+        elif len(nnode) == i+5:
+            nnode[-1] += skip
+        if self._path[i+1] is mnode:
+            self._path[i+1], self._distance[i+1] = node, pos
+        if self._aggs is not None:
+            if i == 0:
+                del self._aggs[id(mnode)]
+            else:
+                self._aggs[id(mnode)].pop()
+            self._update_aggregate(node, i+1)
+
+    def _split_gaps(self):
+        # Restore the gaps after a node was inserted after _path[0]. Only the
+        # gaps on the search path can have grown.
+        path, distance = self._path, self._distance
+        i = 0
+        while True:
+            if i+1 >= self._maxlevel:
+                if self._grow_at is None:
+                    break
+                self._raise_maxlevel()
+            if i+1 < self.level:
+                node, pos = path[i+1], distance[i+1]
+            else:
+                node, pos = self._head, 0
+            gap = self._gap(node, i)
+            if len(gap) <= 3:
+                break
+            self._promote(node, pos, i, gap)
+            i += 1
+
+    def _join_gaps(self, level):
+        # Restore the gaps after a node with *level* levels was removed after
+        # _path[0]. Its gaps below its level were merged, and the gap it was
+        # in on its own level can be empty.
+        path, distance, head, tail = self._path, self._distance, self._head, self._tail
+        i = 0
+        while i < self.level and i+1 < self._maxlevel:
+            if i+1 < self.level:
+                node, pos = path[i+1], distance[i+1]
+            else:
+                node, pos = head, 0
+            gap = self._gap(node, i)
+            changed = False
+            if len(gap) > 3:
+                self._promote(node, pos, i, gap)
+                changed = True
+            elif not gap and node[3+i] is not tail:
+                # Join with the next gap or else with the previous one, by
+                # demoting the node between them. This shrinks the gap on
+                # level i+1, unless the joined gap must be split again.
+                if len(node[3+i]) == i+5:
+                    self._demote(node, pos, i)
+                elif node is not head and len(node) == i+5:
+                    pnode = path[i+2] if i+2 < self.level else head
+                    while pnode[3+i] is not node:
+                        pnode = pnode[3+i]
+                    pos -= node[-1]
+                    node = pnode
+                    self._demote(node, pos, i)
+                else:
+                    break
+                gap = self._gap(node, i)
+                if len(gap) > 3:
+                    self._promote(node, pos, i, gap)
+                else:
+                    changed = True
+            if not changed and i+1 >= level:
+                break
+            i += 1
+
+    def _items(self, start, stop):
+        # Generator for items() in forward order.
+        if start is None:
+            node = self._head[2]
+        else:
+            node = self._locate_lt(start)[0][2]
+        pair = self._pair
+        while node is not self._tail and (stop is None or node[0] < stop):
+            yield pair(node)
+            node = node[2]
+
+    def _items_reverse(self, start, stop):
+        # Generator for items() in reverse order.
+        path = [None] * self.level
+        if stop is None:
+            self._locate_pos(self._size, path)
+        else:
+            self._locate_lt(stop, path)
+        pair = self._pair
+        for node in self._reverse_nodes(path):
+            if start is not None and node[0] < start:
+                break
+            yield pair(node)
+
+    def _reverse_nodes(self, path):
+        # Yield all nodes up to and including path[0] in reverse order. There
+        # are no backward links, so we expand the search path instead. The
+        # nodes between path[i+1] and path[i] are linked on level i. We walk
+        # them forward on that level, and then expand each gap between them
+        # on level i-1, last gap first. Only O(log N) nodes are buffered.
+        head = self._head
+        stack = [(head, path[-1], len(path)-1)]
+        for i in reversed(range(len(path)-1)):
+            stack.append((path[i+1], path[i], i))
+        while stack:
+            node, last, i = stack.pop()
+            if node is last:
+                continue
+            if i == 0:
+                chain = []
+                while node is not last:
+                    node = node[2]
+                    chain.append(node)
+                for node in reversed(chain):
+                    yield node
+                continue
+            while node is not last:
+                nnode = node[2+i]
+                stack.append((node, nnode, i-1))
+                node = nnode
+
+    def _append_sorted(self, pairs, check=False):
+        # Append sorted pairs at the end of the list in a single linear pass.
+        # The nodes are linked in directly from the path to the last node on
+        # each level, which avoids a descent and a skip count fix-up for each
+        # pair. All keys must be larger than or equal to the last key.
+        # A deterministic list is built with every third node on a level
+        # promoted to the next level, so that all gaps have two nodes. This
+        # is only valid for an empty list, so otherwise the pairs are
+        # inserted one by one.
+        if self._levels == 'deterministic' and self._size:
+            for key, value in pairs:
+                self._find_pos(self._size)
+                if check and key < self._path[0][0]:
+                    raise ValueError('pairs are not sorted on key')
+                self._insert(self._create_node(key, value))
+            return
+        self._find_pos(self._size)
+        path, distance = self._path, self._distance
+        head, tail = self._head, self._tail
+        rnd, p, maxlevel = self._random.getrandbits, self._p, self._maxlevel
+        levels, draw = self._levels, self._draw_level
+        grow_at = self._grow_at
+        level, size = self.level, self._size
+        last = path[0][0]
+        first = path[0]
+        try:
+            for key, value in pairs:
+                if check and size and key < last:
+                    raise ValueError('pairs are not sorted on key')
+                last = key
+                if grow_at is not None and size >= grow_at:
+                    self._raise_maxlevel()
+                    maxlevel, grow_at = self._maxlevel, self._grow_at
+                size += 1
+                nlevel = 1
+                if levels == 'random':
+                    while nlevel <= level and nlevel < maxlevel and rnd(31) < p:
+                        nlevel += 1
+                elif levels == 'deterministic':
+                    n = size
+                    while n % 3 == 0:
+                        n //= 3
+                        nlevel += 1
+                    if nlevel > maxlevel and grow_at is not None:
+                        self._raise_maxlevel()
+                        maxlevel, grow_at = self._maxlevel, self._grow_at
+                    nlevel = min(nlevel, maxlevel)
+                else:
+                    nlevel = draw(min(maxlevel, level+1))
+                if nlevel == 1:
+                    node = [key, value, None]
+                    path[0][2] = node
+                    path[0] = node
+                    distance[0] = size
+                    continue
+                if nlevel > level:
+                    path[level] = head
+                    distance[level] = 0
+                    level = nlevel
+                node = [key, value] + [None]*nlevel + [size - distance[nlevel-1]]
+                for i in range(nlevel):
+                    path[i][2+i] = node
+                    path[i] = node
+                    distance[i] = size
+        finally:
+            for i in range(level):
+                path[i][2+i] = tail
+            tail[-1] = size - distance[level-1] if level > 1 else 0
+            self._level, self._size = level, size
+            if self._index is not None:
+                # The new nodes follow any existing nodes with the same key.
+                index, node = self._index, first[2]
+                while node is not tail:
+                    if node[0] not in index:
+                        index[node[0]] = node
+                    node = node[2]
+            if self._aggs is not None:
+                self._build_aggregates()
+
     # PUBLIC API ...
 
     @property
@@ -265,54 +1180,256 @@ class SkipList(object):
         """The current level of the skip list."""
         return self._level
 
+    @property
+    def finger(self):
+        """Whether finger search is enabled."""
+        return self._finger
+
+    @property
+    def key(self):
+        """The key function, or ``None``."""
+        return self._key
+
+    @property
+    def probability(self):
+        """The probability that a node has the next level."""
+        return self._p / float(1<<31)
+
+    @property
+    def current_maxlevel(self):
+        """The current maximum level of a node."""
+        return self._maxlevel
+
+    @property
+    def levels(self):
+        """The level generator."""
+        return self._levels
+
+    @property
+    def hash_index(self):
+        """Whether the list keeps a hash index."""
+        return self._index is not None
+
+    @classmethod
+    def from_sorted(cls, pairs, values=None, check=False, **kwargs):
+        """Create a new list from pairs that are already sorted on key.
+
+        The *pairs* argument must be an iterable yielding ``(key, value)``
+        pairs. Alternatively, if *values* is provided, *pairs* must be an
+        iterable yielding keys, and *values* an iterable yielding the
+        corresponding values. Pairs with the same key are kept in the order in
+        which they are provided.
+
+        The list is built in a single O(N) pass, which is a lot faster than
+        calling :meth:`insert` for every pair. The input is trusted to be
+        sorted, unless *check* is true, in which case a ``ValueError`` is
+        raised if it is not.
+
+        Any keyword arguments are passed to the constructor. If a *key*
+        function is passed, the pairs must be sorted on their sort keys.
+        """
+        if values is not None:
+            pairs = zip(pairs, values)
+        sl = cls(**kwargs)
+        if sl._key is not None:
+            pairs = ((sl._key(key), (key, value)) for key, value in pairs)
+        sl._append_sorted(pairs, check)
+        return sl
+
+    @classmethod
+    def from_numpy(cls, keys, values, **kwargs):
+        """Create a new list from a NumPy array of keys and one of values.
+
+        The arrays must have the same length. If the keys are not sorted, both
+        arrays are first sorted with a stable ``argsort``. The list is then
+        built in a single O(N) pass like in :meth:`from_sorted`. The keys and
+        values are stored as Python objects.
+
+        Any keyword arguments are passed to the constructor. If a *key*
+        function is passed, the pairs are sorted on their sort keys instead.
+        This method requires NumPy.
+        """
+        import numpy
+        keys, values = numpy.asarray(keys), numpy.asarray(values)
+        if keys.shape != values.shape or keys.ndim != 1:
+            raise ValueError('keys and values must be 1-D arrays of the same length')
+        key = kwargs.get('key')
+        if key is not None:
+            pairs = sorted(zip(keys.tolist(), values.tolist()), key=lambda p: key(p[0]))
+            return cls.from_sorted(pairs, **kwargs)
+        if len(keys) > 1 and (keys[1:] < keys[:-1]).any():
+            order = keys.argsort(kind='mergesort')
+            keys, values = keys[order], values[order]
+        return cls.from_sorted(keys.tolist(), values.tolist(), **kwargs)
+
+    def to_numpy(self, start=None, stop=None):
+        """Return the pairs as a tuple of a NumPy array of keys and one of
+        values.
+
+        The *start* and *stop* arguments select a range of keys, like in
+        :meth:`items`. The data type of the arrays is inferred by NumPy. This
+        method requires NumPy.
+        """
+        import numpy
+        keys, values = [], []
+        for key, value in self.items(start, stop):
+            keys.append(key)
+            values.append(value)
+        return numpy.array(keys), numpy.array(values)
+
+    def _kwargs(self):
+        # Return the constructor arguments for a new list like this one.
+        kwargs = {}
+        if self._finger:
+            kwargs['finger'] = True
+        if self._key is not None:
+            kwargs['key'] = self._key
+        if self._p != self.p:
+            kwargs['p'] = self.probability
+        if self._grow_at is not None:
+            kwargs['maxlevel'] = 'auto'
+        elif self._maxlevel != self.maxlevel:
+            kwargs['maxlevel'] = self._maxlevel
+        if self._levels != 'random':
+            kwargs['levels'] = self._levels
+        if self._seed is not None:
+            kwargs['seed'] = self._seed
+        if self._index is not None:
+            kwargs['hash_index'] = True
+        if self._aggregate is not None:
+            kwargs['aggregate'] = self._aggregate
+        return kwargs
+
+    def __reduce__(self):
+        # Pickle the list as a flat list of sorted pairs, which is rebuilt in
+        # linear time by from_sorted(). Pickling the nodes themselves would
+        # recurse once for every node.
+        return (_unpickle, (type(self), list(self.items()), self._kwargs()))
+
+    def dump(self, fileobj, chunksize=10000):
+        """Write all pairs to the binary file object *fileobj*.
+
+        The pairs are pickled in chunks of *chunksize* pairs, so that only
+        one chunk is in memory at a time. Use :meth:`load` to read them back.
+        The key function and other options are not written.
+        """
+        _dump_pairs(self.items(), fileobj, chunksize)
+
+    @classmethod
+    def load(cls, fileobj, **kwargs):
+        """Create a new list from pairs written by :meth:`dump`.
+
+        The pairs are read in chunks and the list is built in a single O(N)
+        pass. Any keyword arguments are passed to the constructor.
+        """
+        return cls.from_sorted(_load_pairs(fileobj), **kwargs)
+
     def insert(self, key, value):
         """Insert a key-value pair in the list.
 
         The pair is inserted at the correct location so that the list remains
         sorted on *key*. If a pair with the same key is already in the list,
         then the pair is appended after all other pairs with that key.
+
+        Appending a pair with a key that is larger than or equal to the last
+        key takes amortized O(1) time if the previous operation was also an
+        append.
         """
-        self._find_lte(key)
+        if self._key is not None:
+            key, value = self._key(key), (key, value)
+        # Fast path for appends: the search can be skipped if the cached path
+        # is the path to the last node, i.e. the predecessors of the tail.
+        node = self._path[0]
+        if node[2] is not self._tail or node is not self._head and key < node[0]:
+            self._find_lte(key, self._finger)
         node = self._create_node(key, value)
         self._insert(node)
+        self._advance_path(node)
+
+    def append(self, key, value):
+        """Append a key-value pair at the end of the list.
+
+        The key must be larger than or equal to the key of the last pair in the
+        list, otherwise a ``ValueError`` is raised. Appending a series of pairs
+        takes amortized O(1) time per pair.
+        """
+        skey = key if self._key is None else self._key(key)
+        node = self._path[0]
+        if node[2] is not self._tail:
+            self._find_pos(self._size)
+            node = self._path[0]
+        if node is not self._head and skey < node[0]:
+            raise ValueError('key {!r} is smaller than last key'.format(key))
+        if self._key is not None:
+            key, value = skey, (key, value)
+        node = self._create_node(key, value)
+        self._insert(node)
+        self._advance_path(node)
 
     def replace(self, key, value):
         """Replace the value of the first key-value pair with key *key*.
 
         If the key was not found, the pair is inserted.
         """
-        self._find_lt(key)
+        skey = key if self._key is None else self._key(key)
+        if self._index is not None:
+            node = self._index.get(skey)
+            if node is not None:
+                self._setvalue(node, value)
+                return
+        self._find_lt(skey, self._finger)
         node = self._path[0][2]
-        if node is self._tail or key < node[0]:
+        if node is self._tail or skey < node[0]:
+            if self._key is not None:
+                key, value = skey, (key, value)
             node = self._create_node(key, value)
             self._insert(node)
         else:
-            node[1] = value
+            self._setvalue(node, value)
+
+    def update(self, pairs):
+        """Insert all pairs from the iterable *pairs*.
+
+        This is equivalent to calling :meth:`insert` for each pair, but faster.
+        The pairs are sorted first, and are then inserted in a single forward
+        pass over the list, where each search continues from the position of
+        the previous pair instead of from the start of the list. Inserting k
+        pairs takes O(k log(N/k)) instead of O(k log N).
+        """
+        if self._key is not None:
+            pairs = [(self._key(key), (key, value)) for key, value in pairs]
+        for key, value in sorted(pairs, key=itemgetter(0)):
+            self._find_lte(key, True)
+            node = self._create_node(key, value)
+            self._insert(node)
 
     def clear(self):
         """Remove all key-value pairs."""
-        for i in range(self.maxlevel):
+        if self._log is not None and self._size:
+            self._find_pos(self._size)
+            self._log.remove(self._head, self._head[2], self._path[0])
+        for i in range(self._maxlevel):
             self._head[2+i] = self._tail
-            self._tail[-1] = 0
+            self._path[i] = self._head
+            self._distance[i] = 0
+        self._tail[-1] = 0
         self._level = 1
+        self._size = 0
+        if self._index is not None:
+            self._index.clear()
+        if self._aggs is not None:
+            self._aggs.clear()
 
     def __len__(self):
         """Return the number of pairs in the list."""
-        dist = 0
-        idx = self.level + 1
-        node = self._head[idx]
-        while node is not self._tail:
-            dist += node[-1] if idx > 2 else 1
-            node = node[idx]
-        dist += node[-1]
-        return dist
+        return self._size
 
-    __bool__ = __nonzero__ = lambda self: len(self) > 0
+    __bool__ = __nonzero__ = lambda self: self._size > 0
 
     def __repr__(self):
         return type(self).__name__ + '((' + repr(list(self.items()))[1:-1] + '))'
 
-    def items(self, start=None, stop=None):
+    def items(self, start=None, stop=None, reverse=False):
         """Return an iterator yielding pairs.
 
         If *start* is specified, iteration starts at the first pair with a key
@@ -322,25 +1439,41 @@ class SkipList(object):
         If *stop* is specified, iteration stops at the last pair that is
         smaller than *stop*. If not specified, iteration end with the last pair
         in the list.
+
+        If *reverse* is true, the same pairs are yielded in reverse order. This
+        does not copy the pairs, and takes O(log N + k) time to yield k pairs.
         """
-        if start is None:
-            node = self._head[2]
-        else:
-            self._find_lt(start)
-            node = self._path[0][2]
-        while node is not self._tail and (stop is None or node[0] < stop):
-            yield (node[0], node[1])
-            node = node[2]
+        if self._key is not None:
+            start = None if start is None else self._sortkey(start)
+            stop = None if stop is None else self._sortkey(stop)
+        if reverse:
+            return self._items_reverse(start, stop)
+        return self._items(start, stop)
 
     __iter__ = items
 
-    def keys(self, start=None, stop=None):
+    def __reversed__(self):
+        """Return an iterator yielding all pairs in reverse order."""
+        return self._items_reverse(None, None)
+
+    def keys(self, start=None, stop=None, reverse=False):
         """Like :meth:`items` but returns only the keys."""
-        return (item[0] for item in self.items(start, stop))
+        return (item[0] for item in self.items(start, stop, reverse))
+
+    def snapshot(self):
+        """Return a read-only, point-in-time view of the list.
+
+        The view is a :class:`Snapshot`. It can be iterated while the list is
+        being changed, and yields the pairs that were in the list when it was
+        created. This takes O(1) time.
+        """
+        if self._log is None:
+            self._log = SnapshotLog()
+        return Snapshot(self, self._log)
 
-    def values(self, start=None, stop=None):
+    def values(self, start=None, stop=None, reverse=False):
         """Like :meth:`items` but returns only the values."""
-        return (item[1] for item in self.items(start, stop))
+        return (item[1] for item in self.items(start, stop, reverse))
 
     def popitem(self):
         """Removes the first key-value pair and return it.
@@ -352,7 +1485,40 @@ class SkipList(object):
             raise KeyError('list is empty')
         self._find_lt(node[0])
         self._remove(node)
-        return (node[0], node[1])
+        return self._pair(node)
+
+    # SET OPERATIONS ...
+
+    def union(self, other):
+        """Return a new list with the pairs in this list, and the pairs in
+        *other* with a key that is not in this list.
+
+        The set operations compare keys, and keep duplicate keys from this
+        list. Both lists are walked once, and the result is built with
+        :meth:`from_sorted`, so this takes O(N + M) time. The result has the
+        same type and options as this list. If this list has a key function,
+        it is used for the keys of both lists.
+        """
+        pairs = _union(self.items(), other.items(), self._key)
+        return type(self).from_sorted(pairs, **self._kwargs())
+
+    def intersection(self, other):
+        """Return a new list with the pairs in this list with a key that is
+        in *other*.
+
+        See :meth:`union`.
+        """
+        pairs = _intersection(self.items(), other.items(), self._key)
+        return type(self).from_sorted(pairs, **self._kwargs())
+
+    def difference(self, other):
+        """Return a new list with the pairs in this list with a key that is
+        not in *other*.
+
+        See :meth:`union`.
+        """
+        pairs = _difference(self.items(), other.items(), self._key)
+        return type(self).from_sorted(pairs, **self._kwargs())
 
     # BY KEY API ...
 
@@ -362,42 +1528,131 @@ class SkipList(object):
         If the key was not found, return *default*. If no default was provided,
         return ``None``. This method never raises a ``KeyError``.
         """
-        self._find_lt(key)
-        node = self._path[0][2]
-        if node is self._tail or key < node[0]:
-            return default
-        return node[1]
+        if self._key is not None:
+            key = self._sortkey(key)
+        if self._index is not None:
+            node = self._index.get(key)
+            if node is None:
+                return default
+        else:
+            node = self._locate_lt(key)[0][2]
+            if node is self._tail or key < node[0]:
+                return default
+        return node[1] if self._key is None else node[1][1]
+
+    def search_many(self, keys, default=None):
+        """Find the value of the first pair for each key in *keys*.
+
+        Return a list with the values in the same order as *keys*. For keys
+        that are not found, *default* is returned.
+
+        This is equivalent to calling :meth:`search` for each key, but faster.
+        The keys are sorted first, and are then looked up in a single forward
+        pass where each search continues from the previous one.
+        """
+        keys = list(keys) if self._key is None else list(map(self._sortkey, keys))
+        if self._index is not None:
+            nodes = map(self._index.get, keys)
+            if self._key is None:
+                return [default if node is None else node[1] for node in nodes]
+            return [default if node is None else node[1][1] for node in nodes]
+        result = [default] * len(keys)
+        # The search uses a path of its own, so that it does not change the
+        # list. See _locate_lt().
+        path, distances = [self._head] * self.level, [0] * self.level
+        for ix in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[ix]
+            self._find_lt(key, True, path, distances)
+            node = path[0][2]
+            if node is not self._tail and not key < node[0]:
+                result[ix] = node[1] if self._key is None else node[1][1]
+        return result
 
     def remove(self, key):
         """Remove the first key-value pair with key *key*.
 
         If the key was not found, a ``KeyError`` is raised.
         """
-        self._find_lt(key)
+        skey = key if self._key is None else self._sortkey(key)
+        if self._index is not None and skey not in self._index:
+            raise KeyError('{!r} is not in list'.format(key))
+        self._find_lt(skey, self._finger)
         node = self._path[0][2]
-        if node is self._tail or key < node[0]:
+        if node is self._tail or skey < node[0]:
             raise KeyError('{!r} is not in list'.format(key))
         self._remove(node)
 
+    def remove_many(self, keys):
+        """Remove the first key-value pair for each key in *keys*.
+
+        This is equivalent to calling :meth:`remove` for each key, but faster,
+        for the same reason as :meth:`update`. Keys that are not in the list
+        are ignored. Return the number of pairs that were removed.
+        """
+        if self._key is not None:
+            keys = map(self._sortkey, keys)
+        if self._index is not None:
+            keys = filter(self._index.__contains__, keys)
+        count = 0
+        for key in sorted(keys):
+            self._find_lt(key, True)
+            node = self._path[0][2]
+            if node is self._tail or key < node[0]:
+                continue
+            self._remove(node)
+            count += 1
+        return count
+
+    def delete_range(self, start=None, stop=None):
+        """Remove all pairs with a key in the range [*start*, *stop*).
+
+        If *start* is not specified, pairs are removed from the start of the
+        list. If *stop* is not specified, pairs are removed until the end of
+        the list. This is the same range that :meth:`items` iterates over.
+
+        The pairs are unlinked at once in O(log N) time, independent of the
+        number of pairs that are removed. Return the number of removed pairs.
+        """
+        if self._key is not None:
+            start = None if start is None else self._sortkey(start)
+            stop = None if stop is None else self._sortkey(stop)
+        if start is None:
+            path, distance = [self._head]*self._maxlevel, [0]*self._maxlevel
+        else:
+            self._find_lt(start, self._finger)
+            path, distance = self._path[:], self._distance[:]
+        if stop is None:
+            self._find_pos(self._size, True)
+        else:
+            self._find_lt(stop, True)
+        return self._remove_run(path, distance)
+
     def pop(self, key, default=UNSET):
         """Remove the first key-value pair with key *key*.
 
         If a pair was removed, return its value. Otherwise if *default* was
         provided, return *default*. Otherwise a ``KeyError`` is raised.
         """
-        self._find_lt(key)
-        node = self._path[0][2]
-        if node is self._tail or key < node[0]:
+        skey = key if self._key is None else self._sortkey(key)
+        if self._index is not None and skey not in self._index:
+            node = self._tail
+        else:
+            self._find_lt(skey, self._finger)
+            node = self._path[0][2]
+        if node is self._tail or skey < node[0]:
             if default is self.UNSET:
-                raise KeyError('key {!r} not in list')
+                raise KeyError('key {!r} not in list'.format(key))
             return default
         self._remove(node)
-        return node[1]
+        return node[1] if self._key is None else node[1][1]
 
     def __contains__(self, key):
         """Return whether *key* is contained in the list."""
-        self._find_lt(key)
-        node = self._path[0][2]
+        if self._key is not None:
+            key = self._sortkey(key)
+        if self._index is not None:
+            return key in self._index
+        node = self._locate_lt(key)[0][2]
         return node is not self._tail and not key < node[0]
 
     def index(self, key, default=UNSET):
@@ -406,74 +1661,211 @@ class SkipList(object):
         If the key is not found, return *default*. If default was not provided,
         raise a ``KeyError``
         """
-        self._find_lt(key)
-        node = self._path[0][2]
-        if node is self._tail or key < node[0]:
+        skey = key if self._key is None else self._sortkey(key)
+        node, pos = self._locate_lt(skey)
+        node = node[2]
+        if node is self._tail or skey < node[0]:
             if default is self.UNSET:
                 raise KeyError('key {!r} not in list'.format(key))
             return default
-        return self._distance[0]
+        return pos
+
+    def bisect_left(self, key):
+        """Return the position of the first pair with a key >= *key*.
+
+        If all keys are smaller than *key*, the length of the list is returned.
+        This is the position where :meth:`replace` would insert *key*.
+        """
+        if self._key is not None:
+            key = self._sortkey(key)
+        return self._locate_lt(key)[1]
+
+    def bisect_right(self, key):
+        """Return the position of the first pair with a key > *key*.
+
+        If no key is larger than *key*, the length of the list is returned.
+        This is the position where :meth:`insert` would insert *key*.
+        """
+        if self._key is not None:
+            key = self._sortkey(key)
+        return self._locate_lte(key)[1]
 
     def count(self, key):
-        """Return the number of pairs with key *key*."""
-        count = 0
-        pos = self.index(key, -1)
-        if pos == -1:
-            return count
-        count += 1
-        for i in range(pos+1, len(self)):
-            if self[i][0] != key:
-                break
-            count += 1
-        return count
+        """Return the number of pairs with key *key*.
+
+        This takes O(log N) time, independent of the number of duplicates.
+        """
+        if self._key is not None:
+            key = self._sortkey(key)
+        return self._locate_lte(key)[1] - self._locate_lt(key)[1]
+
+    def count_range(self, start=None, stop=None):
+        """Return the number of pairs with a key in the range [*start*, *stop*).
+
+        The range is the same as for :meth:`items`. This takes O(log N) time,
+        independent of the number of pairs in the range.
+        """
+        if self._key is not None:
+            start = None if start is None else self._sortkey(start)
+            stop = None if stop is None else self._sortkey(stop)
+        pos = 0 if start is None else self._locate_lt(start)[1]
+        if stop is None:
+            return self._size - pos
+        return max(0, self._locate_lt(stop)[1] - pos)
+
+    def aggregate(self, start=None, stop=None, default=None):
+        """Combine the values of the pairs with a key in the range [*start*,
+        *stop*) with the *aggregate* function of the list.
+
+        The range is the same as for :meth:`items`. The values are combined
+        in list order. If the range is empty, *default* is returned. This
+        takes O(log N) time, independent of the number of pairs in the
+        range. A ``ValueError`` is raised if the list was created without an
+        *aggregate* function.
+        """
+        if self._aggs is None:
+            raise ValueError('list has no aggregate function')
+        if self._key is not None:
+            start = None if start is None else self._sortkey(start)
+            stop = None if stop is None else self._sortkey(stop)
+        if start is not None and stop is not None and not start < stop:
+            return default
+        path = [None] * self.level
+        if stop is None:
+            self._locate_pos(self._size, path)
+        else:
+            self._locate_lt(stop, path)
+        node = self._head if start is None else self._locate_lt(start)[0]
+        return self._aggregate_run(node, path, default)
 
     # BY POSITION API ...
 
+    def aggregate_pos(self, start=None, stop=None, default=None):
+        """Combine the values of the pairs at the positions in the range
+        [*start*, *stop*) with the *aggregate* function of the list.
+
+        The positions are interpreted like a slice, so they may be negative,
+        and ``aggregate_pos(0, n)`` is a prefix sum if the function is
+        :func:`operator.add`. See :meth:`aggregate`.
+        """
+        if self._aggs is None:
+            raise ValueError('list has no aggregate function')
+        start, stop, _ = slice(start, stop).indices(self._size)
+        if start >= stop:
+            return default
+        path = [None] * self.level
+        self._locate_pos(stop, path)
+        node = self._locate_pos(start)[0]
+        return self._aggregate_run(node, path, default)
+
     def __getitem__(self, pos):
         """Return a pair by its position.
 
         If *pos* is a slice, then return a generator that yields pairs as
-        specified by the slice.
+        specified by the slice. A slice with a step of k yields each pair in
+        O(log k) time. A negative step yields the pairs in reverse order.
         """
-        size = len(self)
+        size, pair = self._size, self._pair
         if isinstance(pos, int):
             if pos < 0:
                 pos += size
             if not 0 <= pos < size:
                 raise IndexError('list index out of range')
-            self._find_pos(pos)
-            node = self._path[0][2]
-            return (node[0], node[1])
+            node = self._locate_pos(pos)[0][2]
+            return pair(node)
         elif isinstance(pos, slice):
-            start, stop = pos.start, pos.stop
-            if start is None:
-                start = 0
-            elif start < 0:
-                start += size
-            if stop is None:
-                stop = size
-            elif stop < 0:
-                stop += size
-            self._find_pos(start)
-            def genpairs():
-                pos = start; node = self._path[0][2]
-                while node is not self._tail and pos < stop:
-                    yield (node[0], node[1])
-                    node = node[2]; pos += 1
+            start, stop, step = pos.indices(size)
+            if step > 0:
+                count = max(0, (stop - start + step - 1) // step)
+            else:
+                count = max(0, (start - stop - step - 1) // -step)
+            if count == 0:
+                return iter(())
+            # For small steps it is faster to walk the nodes on level 0. For
+            # larger steps, we jump with a finger search which uses the skip
+            # counts and takes O(log step) time per pair. The cut-off is where
+            # the two break even in practice, which is a few times log N.
+            walk = abs(step) <= 4*self.level
+            if step > 0 and walk:
+                first = self._locate_pos(start)[0][2]
+                def genpairs():
+                    node = first
+                    yield pair(node)
+                    for i in range(count-1):
+                        for j in range(step):
+                            node = node[2]
+                        yield pair(node)
+            elif step < 0 and walk:
+                path = [None] * self.level
+                self._locate_pos(start+1, path)
+                nodes = self._reverse_nodes(path)
+                def genpairs():
+                    for node in islice(nodes, 0, count*-step, -step):
+                        yield pair(node)
+            else:
+                def genpairs():
+                    path, distances = [self._head] * self.level, [0] * self.level
+                    for pos in range(start, stop, step):
+                        self._find_pos(pos, True, path, distances)
+                        yield pair(path[0][2])
             return genpairs()
         else:
             raise TypeError('expecting int or slice, got {0.__name__!r}'.format(type(pos)))
 
+    def take(self, positions):
+        """Return a list with the pairs at each position in *positions*.
+
+        Positions may be negative, and an ``IndexError`` is raised if any of
+        them is out of range. The pairs are looked up in a single forward pass,
+        like in :meth:`search_many`.
+        """
+        size = self._size
+        positions = list(positions)
+        for ix, pos in enumerate(positions):
+            if pos < 0:
+                pos += size
+                positions[ix] = pos
+            if not 0 <= pos < size:
+                raise IndexError('list index out of range')
+        result = [None] * len(positions)
+        pair = self._pair
+        # See search_many().
+        path, distances = [self._head] * self.level, [0] * self.level
+        for ix in sorted(range(len(positions)), key=positions.__getitem__):
+            self._find_pos(positions[ix], True, path, distances)
+            result[ix] = pair(path[0][2])
+        return result
+
     def __delitem__(self, pos):
-        """Delete a pair by its position."""
+        """Delete a pair by its position.
+
+        If *pos* is a slice, then delete all pairs as specified by the slice.
+        Without a step, the pairs are unlinked at once in O(log N) time.
+        """
+        if isinstance(pos, slice):
+            start, stop, step = pos.indices(self._size)
+            if step == 1:
+                self._find_pos(start, self._finger)
+                path, distance = self._path[:], self._distance[:]
+                self._find_pos(stop, True)
+                self._remove_run(path, distance)
+                return
+            # Delete from the back so that positions remain valid.
+            positions = range(start, stop, step)
+            if step > 0:
+                positions = reversed(positions)
+            for pos in positions:
+                self._find_pos(pos, True)
+                self._remove(self._path[0][2])
+            return
         if not isinstance(pos, int):
-            raise TypeError('expecting int, got {0.__name__!r}'.format(type(pos)))
-        size = len(self)
+            raise TypeError('expecting int or slice, got {0.__name__!r}'.format(type(pos)))
+        size = self._size
         if pos < 0:
             pos += size
         if not 0 <= pos < size:
             raise IndexError('list index out of range')
-        self._find_pos(pos)
+        self._find_pos(pos, self._finger)
         node = self._path[0][2]
         self._remove(node)
 
@@ -481,11 +1873,11 @@ class SkipList(object):
         """Set a value by its position."""
         if not isinstance(pos, int):
             raise TypeError('expecting int, got {0.__name__!r}'.format(type(pos)))
-        size = len(self)
+        size = self._size
         if pos < 0:
             pos += size
         if not 0 <= pos < size:
             raise IndexError('list index out of range')
-        self._find_pos(pos)
+        self._find_pos(pos, self._finger)
         node = self._path[0][2]
-        node[1] = value
+        self._setvalue(node, value)
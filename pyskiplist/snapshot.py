@@ -0,0 +1,222 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import weakref
+
+__all__ = ['Snapshot']
+
+
+class SnapshotLog(object):
+    """The changes made to a skiplist while it has snapshots.
+
+    Every change gets a new version. Each snapshot records the version at which
+    it was taken, and uses the log to undo the changes with a later version:
+
+    * Nodes inserted while there are snapshots have their version in *born*.
+      Other nodes are older than all snapshots.
+    * Removed nodes are not forgotten. Each run of removed nodes is "hung" in
+      *hung* under the node that preceded it when it was removed, together
+      with the version of the removal. A removed node keeps its forward links
+      so the run can still be walked.
+    * Replaced values are stored in *values*, with the version of the change.
+
+    The log is cleared when the last snapshot is closed or garbage collected,
+    which releases the removed nodes.
+    """
+
+    __slots__ = ('version', 'born', 'hung', 'values', 'refs', '__weakref__')
+
+    def __init__(self):
+        self.version = 0
+        self.born = {}
+        self.hung = {}
+        self.values = {}
+        self.refs = set()
+
+    def register(self, snapshot):
+        """Register a new snapshot and return a reference for :meth:`release`."""
+        log = weakref.ref(self)
+        def callback(ref):
+            log_ = log()
+            if log_ is not None:
+                log_.release(ref)
+        ref = weakref.ref(snapshot, callback)
+        self.refs.add(ref)
+        return ref
+
+    def release(self, ref):
+        """Release a snapshot. Clear the log if it was the last one."""
+        self.refs.discard(ref)
+        if not self.refs:
+            self.born.clear()
+            self.hung.clear()
+            self.values.clear()
+
+    def insert(self, node):
+        """Record that *node* was inserted."""
+        if self.refs:
+            self.version += 1
+            self.born[id(node)] = self.version
+
+    def remove(self, pred, first, last):
+        """Record that the nodes *first* up to *last* after *pred* are removed."""
+        if self.refs:
+            self.version += 1
+            self.hung.setdefault(id(pred), []).append((first, last, self.version))
+
+    def setvalue(self, node, value):
+        """Record that the value of *node* is changed from *value*."""
+        if self.refs:
+            self.version += 1
+            self.values.setdefault(id(node), []).append((self.version, value))
+
+
+class Snapshot(object):
+    """A read-only, point-in-time view of a :class:`SkipList`.
+
+    A snapshot is created with :meth:`SkipList.snapshot`. It yields the pairs
+    that were in the list at that time, also while the list is changed. It
+    shares its nodes with the list, so it takes O(1) time to create.
+
+    While a list has snapshots, the nodes that are removed are kept alive and
+    every change is recorded in a log, which takes O(1) time and memory per
+    change. Iterating a snapshot takes O(log N + k + c) time, where k is the
+    number of pairs and c the number of changes since the snapshot that are in
+    the range. Call :meth:`close`, or use the snapshot as a context manager,
+    to release the log when done. It is also released when the last snapshot
+    is garbage collected.
+
+    A snapshot is not safe to use from another thread than the one that
+    changes the list.
+    """
+
+    __slots__ = ('_list', '_log', '_ref', '_version', '_size', '__weakref__')
+
+    def __init__(self, sl, log):
+        self._list = sl
+        self._log = log
+        self._ref = log.register(self)
+        self._version = log.version
+        self._size = len(sl)
+
+    def close(self):
+        """Close the snapshot."""
+        if self._log is not None:
+            self._log.release(self._ref)
+            self._log = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Return the number of pairs in the snapshot."""
+        return self._size
+
+    __bool__ = __nonzero__ = lambda self: self._size > 0
+
+    def __repr__(self):
+        return type(self).__name__ + '((' + repr(list(self.items()))[1:-1] + '))'
+
+    def _nodes(self, start):
+        # Yield the nodes in the snapshot from the first one >= start, and the
+        # content of their value slot at the time of the snapshot.
+        if self._log is None:
+            raise ValueError('snapshot is closed')
+        sl, version = self._list, self._version
+        born, hung, values = self._log.born, self._log.hung, self._log.values
+        head, tail = sl._head, sl._tail
+        node = head
+        if start is not None:
+            # Start from the last node on the search path that is in the
+            # snapshot. Any removed nodes that come after it were hung
+            # under it or under a node after it.
+            path = [None] * sl.level
+            sl._locate_lt(start, path)
+            for node in path:
+                if born.get(id(node), 0) <= version:
+                    break
+            else:
+                node = head
+        # Walk the nodes in their order at the time of the snapshot. This is
+        # a depth first walk: after a node, we walk the runs that were hung
+        # under it, and then its successor. Runs that were removed before the
+        # snapshot are skipped. Each chain is [node, last node or None].
+        chains = [[node, None]]
+        while chains:
+            chain = chains[-1]
+            node = chain[0]
+            if node is chain[1]:
+                chains.pop()
+            else:
+                chain[0] = node[2]
+                if chain[0] is tail:
+                    chains.pop()
+            runs = hung.get(id(node))
+            if runs:
+                for first, last, removed in reversed(runs):
+                    if removed > version:
+                        chains.append([first, last])
+            if node is head or born.get(id(node), 0) > version:
+                continue
+            if start is not None and node[0] < start:
+                continue
+            value = node[1]
+            changes = values.get(id(node))
+            if changes:
+                for changed, old in changes:
+                    if changed > version:
+                        value = old
+                        break
+            yield node, value
+
+    def items(self, start=None, stop=None):
+        """Return an iterator yielding pairs.
+
+        The *start* and *stop* arguments select a range of keys, like in
+        :meth:`SkipList.items`.
+        """
+        sl = self._list
+        if sl._key is not None:
+            start = None if start is None else sl._sortkey(start)
+            stop = None if stop is None else sl._sortkey(stop)
+        for node, value in self._nodes(start):
+            if stop is not None and not node[0] < stop:
+                break
+            yield value if sl._key is not None else (node[0], value)
+
+    __iter__ = items
+
+    def keys(self, start=None, stop=None):
+        """Like :meth:`items` but returns only the keys."""
+        return (item[0] for item in self.items(start, stop))
+
+    def values(self, start=None, stop=None):
+        """Like :meth:`items` but returns only the values."""
+        return (item[1] for item in self.items(start, stop))
+
+    def search(self, key, default=None):
+        """Find the first key-value pair with key *key* and return its value.
+
+        If the key was not found, return *default*.
+        """
+        sl = self._list
+        if sl._key is not None:
+            key = sl._sortkey(key)
+        for node, value in self._nodes(key):
+            if key < node[0]:
+                break
+            return value if sl._key is None else value[1]
+        return default
+
+    def __contains__(self, key):
+        """Return whether *key* is contained in the snapshot."""
+        return self.search(key, self) is not self
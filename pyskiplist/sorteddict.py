@@ -0,0 +1,295 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+try:
+    from collections.abc import MutableMapping, KeysView, ValuesView, ItemsView
+except ImportError:
+    from collections import MutableMapping, KeysView, ValuesView, ItemsView
+
+from operator import itemgetter
+
+from .skiplist import SkipList, _unpickle
+
+__all__ = ['SortedDict']
+
+
+def _last_of_runs(pairs):
+    # Yield the last pair of each run of pairs with equal keys. The pairs are
+    # sorted, so pairs with the same key are adjacent.
+    last = None
+    for pair in pairs:
+        if last is not None and (last[0] < pair[0] or pair[0] < last[0]):
+            yield last
+        last = pair
+    if last is not None:
+        yield last
+
+
+class _SortedKeysView(KeysView):
+    """A view on the keys of a :class:`SortedDict`, in key order."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return self._mapping._list.keys()
+
+    def __reversed__(self):
+        return self._mapping._list.keys(reverse=True)
+
+
+class _SortedValuesView(ValuesView):
+    """A view on the values of a :class:`SortedDict`, in key order."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return self._mapping._list.values()
+
+    def __reversed__(self):
+        return self._mapping._list.values(reverse=True)
+
+
+class _SortedItemsView(ItemsView):
+    """A view on the pairs of a :class:`SortedDict`, in key order."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return self._mapping._list.items()
+
+    def __reversed__(self):
+        return self._mapping._list.items(reverse=True)
+
+
+class SortedDict(MutableMapping):
+    """A mapping that keeps its keys sorted.
+
+    A SortedDict has at most one value per key. It is a
+    :class:`MutableMapping` that is implemented with a :class:`SkipList`.
+    Lookups, assignments and deletions by key take O(log N) time. Assigning
+    to a key, :meth:`setdefault` and :meth:`pop` do a single search, which
+    finds the pair if it exists, or otherwise the location to insert it.
+
+    Iteration and the views returned by :meth:`keys`, :meth:`values` and
+    :meth:`items` are in key order. Pairs can also be accessed by position
+    with :meth:`peekitem`, :meth:`popitem` and :meth:`index`, which take
+    O(log N) time as well.
+
+    The optional *pairs* argument is a mapping or an iterable yielding
+    ``(key, value)`` pairs to add. If a key occurs more than once, the last
+    value is kept. Any keyword arguments are passed to :class:`SkipList`,
+    for example a *key* function.
+    """
+
+    __slots__ = ('_list',)
+
+    def __init__(self, pairs=(), **kwargs):
+        self._list = SkipList(**kwargs)
+        if pairs:
+            self.update(pairs)
+
+    @classmethod
+    def from_sorted(cls, pairs, values=None, check=False, **kwargs):
+        """Create a new dict from pairs that are sorted on key.
+
+        See :meth:`SkipList.from_sorted`. If a key occurs more than once, the
+        last value is kept, like in :meth:`update`.
+        """
+        if values is not None:
+            pairs = zip(pairs, values)
+        sd = cls.__new__(cls)
+        sl = sd._list = SkipList(**kwargs)
+        if sl._key is not None:
+            pairs = ((sl._key(key), (key, value)) for key, value in pairs)
+        sl._append_sorted(_last_of_runs(pairs), check)
+        return sd
+
+    def __reduce__(self):
+        return (_unpickle, (type(self), list(self._list.items()), self._list._kwargs()))
+
+    def _find(self, key, remove=False):
+        # Search for *key*, leaving the path to its location in the list.
+        # Return the sort key and the node, or None if the key is not found.
+        # With a hash index the path is only needed to insert a key that is
+        # not found, or to remove one that is, as indicated by *remove*.
+        sl = self._list
+        skey = key if sl._key is None else sl._sortkey(key)
+        if sl._index is not None:
+            node = sl._index.get(skey)
+            if (node is None) == remove:
+                return skey, node
+        sl._find_lt(skey, sl._finger)
+        node = sl._path[0][2]
+        if node is sl._tail or skey < node[0]:
+            return skey, None
+        return skey, node
+
+    def _insert(self, key, skey, value):
+        # Insert a pair at the location found by _find().
+        sl = self._list
+        if sl._key is not None:
+            key, value = skey, (key, value)
+        sl._insert(sl._create_node(key, value))
+
+    def _value(self, node):
+        # Return the value of *node*.
+        return node[1] if self._list._key is None else node[1][1]
+
+    def __getitem__(self, key):
+        """Return the value for *key*.
+
+        A ``KeyError`` is raised if *key* is not in the dict.
+        """
+        value = self._list.search(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        """Set the value for *key*."""
+        skey, node = self._find(key)
+        if node is None:
+            self._insert(key, skey, value)
+        else:
+            self._list._setvalue(node, value)
+
+    def __delitem__(self, key):
+        """Remove *key* and its value.
+
+        A ``KeyError`` is raised if *key* is not in the dict.
+        """
+        node = self._find(key, True)[1]
+        if node is None:
+            raise KeyError(key)
+        self._list._remove(node)
+
+    def __contains__(self, key):
+        """Return whether *key* is contained in the dict."""
+        return key in self._list
+
+    def __iter__(self):
+        """Return an iterator over the keys in key order."""
+        return self._list.keys()
+
+    def __reversed__(self):
+        """Return an iterator over the keys in reverse key order."""
+        return self._list.keys(reverse=True)
+
+    def __len__(self):
+        """Return the number of pairs in the dict."""
+        return len(self._list)
+
+    def __repr__(self):
+        return type(self).__name__ + '((' + repr(list(self._list.items()))[1:-1] + '))'
+
+    def get(self, key, default=None):
+        """Return the value for *key*, or *default* if it does not exist."""
+        return self._list.search(key, default)
+
+    def setdefault(self, key, default=None):
+        """Return the value for *key*.
+
+        If *key* is not in the dict, it is inserted with value *default* first.
+        """
+        skey, node = self._find(key)
+        if node is None:
+            self._insert(key, skey, default)
+            return default
+        return self._value(node)
+
+    def pop(self, key, default=SkipList.UNSET):
+        """Remove *key* and return its value.
+
+        If *key* is not in the dict, return *default* if it was provided, or
+        else raise a ``KeyError``.
+        """
+        node = self._find(key, True)[1]
+        if node is None:
+            if default is SkipList.UNSET:
+                raise KeyError(key)
+            return default
+        self._list._remove(node)
+        return self._value(node)
+
+    def popitem(self, index=-1):
+        """Remove the pair at position *index* and return it.
+
+        By default the pair with the largest key is removed. A ``KeyError`` is
+        raised if the dict is empty, and an ``IndexError`` if *index* is out
+        of range.
+        """
+        sl = self._list
+        if not sl._size:
+            raise KeyError('dictionary is empty')
+        pos = index + sl._size if index < 0 else index
+        if not 0 <= pos < sl._size:
+            raise IndexError('dictionary index out of range')
+        sl._find_pos(pos, sl._finger)
+        node = sl._path[0][2]
+        sl._remove(node)
+        return sl._pair(node)
+
+    def peekitem(self, index=-1):
+        """Return the pair at position *index*.
+
+        By default the pair with the largest key is returned. An
+        ``IndexError`` is raised if *index* is out of range.
+        """
+        return self._list[index]
+
+    def index(self, key):
+        """Return the position of *key*.
+
+        A ``KeyError`` is raised if *key* is not in the dict.
+        """
+        return self._list.index(key)
+
+    def clear(self):
+        """Remove all pairs."""
+        self._list.clear()
+
+    def update(self, *args, **kwargs):
+        """Set the value for each pair in a mapping or an iterable of pairs.
+
+        This takes the same arguments as :meth:`dict.update`. The pairs are
+        sorted first, and are then added in a single forward pass, like in
+        :meth:`SkipList.update`. If a key occurs more than once, the last
+        value is kept.
+        """
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 argument, got {}'.format(len(args)))
+        pairs = args[0] if args else ()
+        if hasattr(pairs, 'keys'):
+            pairs = [(key, pairs[key]) for key in pairs.keys()]
+        else:
+            pairs = list(pairs)
+        pairs.extend(kwargs.items())
+        sl = self._list
+        sortkey = sl._key or (lambda key: key)
+        pairs = sorted(((sortkey(key), key, value) for key, value in pairs),
+                       key=itemgetter(0))
+        for skey, key, value in pairs:
+            sl._find_lt(skey, True)
+            node = sl._path[0][2]
+            if node is sl._tail or skey < node[0]:
+                self._insert(key, skey, value)
+            else:
+                sl._setvalue(node, value)
+
+    def keys(self):
+        """Return a view on the keys, in key order."""
+        return _SortedKeysView(self)
+
+    def values(self):
+        """Return a view on the values, in key order."""
+        return _SortedValuesView(self)
+
+    def items(self):
+        """Return a view on the pairs, in key order."""
+        return _SortedItemsView(self)
@@ -18,6 +18,7 @@ version_info = {
     'author_email': 'geertj@gmail.com',
     'url': 'https://github.com/geertj/pyskiplist',
     'license': 'MIT',
+    'extras_require': {'numpy': ['numpy']},
     'classifiers': [
         'Development Status :: 5 - Production/Stable',
         'License :: OSI Approved :: MIT License',
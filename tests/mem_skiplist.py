@@ -8,11 +8,14 @@
 from __future__ import absolute_import, print_function
 
 import sys
+import math
+import operator
 import unittest
 
 from support import MemoryTest
-from pyskiplist import SkipList
+from pyskiplist import SkipList, CompactSkipList
 from pyskiplist.skiplist import getsize
+from pyskiplist.compact import getsize as getsize_compact
 
 
 class MemSkipList(MemoryTest):
@@ -40,6 +43,84 @@ class MemSkipList(MemoryTest):
             overhead = getsize(sl) - items * 2 * sys.getsizeof(i)
             self.add_result(overhead/items, suffix=items)
 
+    def mem_node_overhead_large(self):
+        items = 10**6
+        sl = SkipList.from_sorted((i, i) for i in range(items))
+        overhead = getsize(sl) - items * 2 * sys.getsizeof(items)
+        self.add_result(overhead/items, suffix=items)
+
+    def mem_p_overhead(self):
+        items = 10**5
+        for p in (0.125, 0.25, 1/math.e, 0.5, 0.75):
+            sl = SkipList.from_sorted(((i, i) for i in range(items)), p=p)
+            overhead = getsize(sl) - items * 2 * sys.getsizeof(items)
+            self.add_result(overhead/items, suffix=items, params={'p': round(p, 3)})
+
+    def mem_small_lists(self):
+        for maxlevel in (None, 'auto'):
+            for items in (0, 10):
+                sl = SkipList.from_sorted(((i, i) for i in range(items)), maxlevel=maxlevel)
+                self.add_result(getsize(sl), suffix=items, params={'maxlevel': maxlevel})
+
+    def mem_hash_index(self):
+        for logN in range(3, 6):
+            items = 10**logN
+            for hash_index in (False, True):
+                sl = SkipList.from_sorted(((i, i) for i in range(items)), hash_index=hash_index)
+                overhead = getsize(sl) - items * 2 * sys.getsizeof(items)
+                self.add_result(overhead/items, suffix=items,
+                                params={'hash_index': hash_index})
+
+    def mem_aggregate(self):
+        for logN in range(3, 6):
+            items = 10**logN
+            for aggregate in (None, operator.add):
+                sl = SkipList.from_sorted(((i, i) for i in range(items)), aggregate=aggregate)
+                overhead = getsize(sl) - items * 2 * sys.getsizeof(items)
+                self.add_result(overhead/items, suffix=items,
+                                params={'aggregate': aggregate is not None})
+
+
+class MemCompactSkipList(MemoryTest):
+    """Memory usage tests for CompactSkipList."""
+
+    def mem_size(self):
+        sl = CompactSkipList()
+        self.add_result(getsize_compact(sl))
+
+    def mem_node_size(self):
+        for logN in range(3, 6):
+            items = 10**logN
+            sl = CompactSkipList()
+            for i in range(items):
+                sl.insert(i, i)
+            size = getsize_compact(sl)
+            self.add_result(size/items, suffix=items)
+
+    def mem_node_overhead(self):
+        for logN in range(3, 6):
+            items = 10**logN
+            sl = CompactSkipList()
+            for i in range(items):
+                sl.insert(i, i)
+            overhead = getsize_compact(sl) - items * 2 * sys.getsizeof(i)
+            self.add_result(overhead/items, suffix=items)
+
+    def mem_node_overhead_large(self):
+        items = 10**6
+        sl = CompactSkipList.from_sorted((i, i) for i in range(items))
+        overhead = getsize_compact(sl) - items * 2 * sys.getsizeof(items)
+        self.add_result(overhead/items, suffix=items)
+
+    def mem_keytype_node_size(self):
+        items = 10**6
+        for keytype in (None, 'int64', 'float64'):
+            cast = float if keytype == 'float64' else int
+            sl = CompactSkipList.from_sorted(((cast(i), i) for i in range(items)),
+                                             keytype=keytype)
+            size = getsize_compact(sl)
+            self.add_result(size/items, suffix=items, params={'keytype': keytype})
+
 
 if __name__ == '__main__':
     MemSkipList.setup_loader()
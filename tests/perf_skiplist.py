@@ -7,14 +7,42 @@
 
 from __future__ import absolute_import, print_function, division
 
+import io
+import math
 import time
+import pickle
 import random
+import threading
 import unittest
+from itertools import islice
+from operator import itemgetter, attrgetter, add
 
-from pyskiplist import SkipList
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pyskiplist import SkipList, CompactSkipList, ConcurrentSkipList, MappedSkipList
+from pyskiplist import Memtable, Segment, SortedDict, merge
 from support import PerformanceTest
 
 
+class Event(object):
+    """A record that compares on its timestamp, like a dataclass would."""
+
+    __slots__ = ('timestamp', 'name')
+
+    def __init__(self, timestamp, name):
+        self.timestamp = timestamp
+        self.name = name
+
+    def __lt__(self, other):
+        return self.timestamp < other.timestamp
+
+    def __le__(self, other):
+        return self.timestamp <= other.timestamp
+
+
 class PerfSkipList(PerformanceTest):
     """Performance tests for our skiplist."""
 
@@ -26,6 +54,14 @@ class PerfSkipList(PerformanceTest):
             sl.insert(random.randint(0, maxkey), i)
         return sl
 
+    def _create_sorted_skiplist(self, n):
+        # Create a skiplist with *n* elements with keys 0..n-1. This is faster
+        # than _create_skiplist() and is used for the larger list sizes.
+        sl = SkipList()
+        for i in range(n):
+            sl.insert(i, i)
+        return sl
+
     def _create_workload(self, sl, n):
         # Create a workload with *n* items.
         pairs = []
@@ -35,6 +71,21 @@ class PerfSkipList(PerformanceTest):
             pairs.append(pair)
         return pairs
 
+    def _create_stream(self, keys, kind, n):
+        # Create a stream of *n* keys from *keys* with the given locality.
+        if kind == 'sequential':
+            start = random.randrange(len(keys) - n)
+            return keys[start:start+n]
+        elif kind == 'clustered':
+            stream = []
+            pos = random.randrange(len(keys))
+            for i in range(n):
+                pos = min(max(0, pos + random.randint(-50, 50)), len(keys)-1)
+                stream.append(keys[pos])
+            return stream
+        else:
+            return [random.choice(keys) for i in range(n)]
+
     def perf_search_throughput(self):
         for logN in range(3, 6):
             items = 10**logN
@@ -52,6 +103,42 @@ class PerfSkipList(PerformanceTest):
             throughput = count / (t1 - t0)
             self.add_result(throughput, suffix=items)
 
+    def perf_finger_search(self):
+        sl = self._create_skiplist(10**5)
+        pairs = list(sl)
+        keys = [pair[0] for pair in pairs]
+        for kind in ('sequential', 'clustered', 'random'):
+            load = self._create_stream(keys, kind, 20000)
+            for finger in (False, True):
+                sl = SkipList.from_sorted(pairs, finger=finger)
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(load) and t1 - t0 < 1:
+                    sl.search(load[count])
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=kind, params={'finger': finger})
+
+    def perf_finger_insert(self):
+        sl = self._create_skiplist(10**5)
+        pairs = list(sl)
+        keys = [pair[0] for pair in pairs]
+        for kind in ('sequential', 'clustered', 'random'):
+            load = self._create_stream(keys, kind, 20000)
+            for finger in (False, True):
+                sl = SkipList.from_sorted(pairs, finger=finger)
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(load) and t1 - t0 < 1:
+                    sl.insert(load[count], count)
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=kind, params={'finger': finger})
+
     def perf_insert_throughput(self):
         for logN in range(3, 6):
             items = 10**logN
@@ -67,6 +154,80 @@ class PerfSkipList(PerformanceTest):
             throughput = count / (t1 - t0)
             self.add_result(throughput, suffix=items)
 
+    def perf_build_insert(self):
+        for logN in range(3, 7):
+            items = 10**logN
+            pairs = [(i, i) for i in range(items)]
+            t0 = time.time()
+            sl = SkipList()
+            for pair in pairs:
+                sl.insert(*pair)
+            t1 = time.time()
+            throughput = items / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_build_from_sorted(self):
+        for logN in range(3, 7):
+            items = 10**logN
+            pairs = [(i, i) for i in range(items)]
+            t0 = time.time()
+            _ = SkipList.from_sorted(pairs)
+            t1 = time.time()
+            throughput = items / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def perf_build_from_numpy(self):
+        for logN in range(4, 7):
+            items = 10**logN
+            keys = numpy.random.randint(0, 100*items, items)
+            values = numpy.arange(items)
+            t0 = time.time()
+            sl = SkipList()
+            for key, value in zip(keys.tolist(), values.tolist()):
+                sl.insert(key, value)
+            t1 = time.time()
+            throughput = items / (t1 - t0)
+            self.add_result(throughput, suffix=items, params={'method': 'insert'})
+            t0 = time.time()
+            sl = SkipList.from_numpy(keys, values)
+            t1 = time.time()
+            throughput = items / (t1 - t0)
+            self.add_result(throughput, suffix=items, params={'method': 'from_numpy'})
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def perf_to_numpy(self):
+        for logN in range(4, 7):
+            items = 10**logN
+            sl = SkipList.from_sorted((i, i) for i in range(items))
+            t0 = time.time()
+            pairs = list(sl.items())
+            keys = numpy.array([pair[0] for pair in pairs])
+            values = numpy.array([pair[1] for pair in pairs])
+            t1 = time.time()
+            throughput = items / (t1 - t0)
+            self.add_result(throughput, suffix=items, params={'method': 'items'})
+            t0 = time.time()
+            keys, values = sl.to_numpy()
+            t1 = time.time()
+            throughput = items / (t1 - t0)
+            self.add_result(throughput, suffix=items, params={'method': 'to_numpy'})
+
+    def perf_append_throughput(self):
+        for logN in range(3, 7):
+            items = 10**logN
+            sl = SkipList.from_sorted((i, i) for i in range(items))
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for i in range(items, items+1000):
+                    sl.append(i, i)
+                items += 1000
+                count += 1000
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=10**logN)
+
     def perf_remove_throughput(self):
         for logN in range(3, 6):
             items = 10**logN
@@ -84,6 +245,164 @@ class PerfSkipList(PerformanceTest):
             throughput = count / (t1 - t0)
             self.add_result(throughput, suffix=items)
 
+    def perf_update_throughput(self):
+        sl = self._create_skiplist(10**5)
+        for logK in range(1, 6):
+            batch = 10**logK
+            count = elapsed = 0
+            while elapsed < 1:
+                load = self._create_workload(sl, batch)
+                t0 = time.time()
+                sl.update(load)
+                elapsed += time.time() - t0
+                count += batch
+                sl.remove_many(pair[0] for pair in load)
+            throughput = count / elapsed
+            self.add_result(throughput, suffix=batch)
+
+    def perf_remove_many_throughput(self):
+        sl = self._create_skiplist(10**5)
+        for logK in range(1, 6):
+            batch = 10**logK
+            count = elapsed = 0
+            while elapsed < 1:
+                load = self._create_workload(sl, batch)
+                sl.update(load)
+                t0 = time.time()
+                sl.remove_many(pair[0] for pair in load)
+                elapsed += time.time() - t0
+                count += batch
+            throughput = count / elapsed
+            self.add_result(throughput, suffix=batch)
+
+    def perf_delete_range_throughput(self):
+        # Retention workload: repeatedly evict the oldest *batch* pairs.
+        items = 10**5
+        for logK in range(1, 5):
+            batch = 10**logK
+            sl = SkipList.from_sorted((i, i) for i in range(items))
+            count = elapsed = 0
+            while elapsed < 1:
+                start = sl[0][0]
+                t0 = time.time()
+                count += sl.delete_range(start, start+batch)
+                elapsed += time.time() - t0
+                sl.update((i, i) for i in range(start+items, start+items+batch))
+            throughput = count / elapsed
+            self.add_result(throughput, suffix=batch)
+
+    def perf_count_throughput(self):
+        # Count a hot key with many duplicates.
+        for logK in range(1, 5):
+            dups = 10**logK
+            sl = SkipList.from_sorted([(0, 0)] + [(1, i) for i in range(dups)] + [(2, 0)])
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for i in range(100):
+                    sl.count(1)
+                count += 100
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=dups)
+
+    def perf_iter_throughput(self):
+        for logN in range(3, 6):
+            items = 10**logN
+            sl = self._create_skiplist(items)
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for pair in sl:
+                    pass
+                count += items
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_reverse_iter_throughput(self):
+        for logN in range(3, 6):
+            items = 10**logN
+            sl = self._create_skiplist(items)
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for pair in reversed(sl):
+                    pass
+                count += items
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_reverse_newest(self):
+        # Get the newest 100 pairs in reverse order.
+        for logN in range(3, 7):
+            items = 10**logN
+            sl = SkipList.from_sorted((i, i) for i in range(items))
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for i in range(10):
+                    list(islice(reversed(sl), 100))
+                count += 10
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_search_many_throughput(self):
+        sl = self._create_skiplist(10**5)
+        keys = [pair[0] for pair in sl]
+        for logK in range(1, 5):
+            batch = 10**logK
+            for many in (False, True):
+                count = elapsed = 0
+                while elapsed < 1:
+                    load = [random.choice(keys) for i in range(batch)]
+                    t0 = time.time()
+                    if many:
+                        sl.search_many(load)
+                    else:
+                        for key in load:
+                            sl.search(key)
+                    elapsed += time.time() - t0
+                    count += batch
+                throughput = count / elapsed
+                self.add_result(throughput, suffix=batch, params={'many': many})
+
+    def perf_take_throughput(self):
+        items = 10**5
+        sl = self._create_skiplist(items)
+        for logK in range(1, 5):
+            batch = 10**logK
+            for many in (False, True):
+                count = elapsed = 0
+                while elapsed < 1:
+                    load = [random.randrange(items) for i in range(batch)]
+                    t0 = time.time()
+                    if many:
+                        sl.take(load)
+                    else:
+                        for pos in load:
+                            sl[pos]
+                    elapsed += time.time() - t0
+                    count += batch
+                throughput = count / elapsed
+                self.add_result(throughput, suffix=batch, params={'many': many})
+
+    def perf_slice_step_throughput(self):
+        items = 10**5
+        sl = SkipList.from_sorted((i, i) for i in range(items))
+        for step in (1, 10, 100, 1000, -1, -10, -100, -1000):
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for pair in sl[::step]:
+                    pass
+                count += items // abs(step)
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=step)
+
     def perf_index_throughput(self):
         for logN in range(3, 6):
             items = 10**logN
@@ -99,6 +418,516 @@ class PerfSkipList(PerformanceTest):
             throughput = count / (t1 - t0)
             self.add_result(throughput, suffix=items)
 
+    def perf_getitem_throughput(self):
+        for logN in range(5, 8):
+            items = 10**logN
+            sl = self._create_sorted_skiplist(items)
+            load = [random.randrange(items) for i in range(100000)]
+            count = 0
+            t0 = t1 = time.time()
+            while count < len(load) and t1 - t0 < 1:
+                sl[load[count]]
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_delitem_throughput(self):
+        for logN in range(5, 8):
+            items = 10**logN
+            sl = self._create_sorted_skiplist(items)
+            count = 0
+            t0 = t1 = time.time()
+            while count < items//2 and t1 - t0 < 1:
+                del sl[random.randrange(len(sl))]
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_bool_throughput(self):
+        for logN in range(5, 8):
+            items = 10**logN
+            sl = self._create_sorted_skiplist(items)
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 1:
+                for i in range(1000):
+                    if sl:
+                        pass
+                count += 1000
+                t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items)
+
+    def perf_compact_search(self):
+        for logN in range(3, 7, 3):
+            items = 10**logN
+            pairs = [(i, i) for i in range(items)]
+            load = [random.randrange(items) for i in range(20000)]
+            for cls in (SkipList, CompactSkipList):
+                sl = cls.from_sorted(pairs)
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(load) and t1 - t0 < 1:
+                    sl.search(load[count])
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=items, params={'class': cls.__name__})
+
+    def perf_compact_insert(self):
+        for logN in range(3, 7, 3):
+            items = 10**logN
+            pairs = [(2*i, i) for i in range(items)]
+            load = [2*random.randrange(items)+1 for i in range(20000)]
+            for cls in (SkipList, CompactSkipList):
+                sl = cls.from_sorted(pairs)
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(load) and t1 - t0 < 1:
+                    sl.insert(load[count], count)
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=items, params={'class': cls.__name__})
+
+    def perf_keytype_search(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(20000)]
+        for keytype in (None, 'int64', 'float64'):
+            cast = float if keytype == 'float64' else int
+            sl = CompactSkipList.from_sorted(((cast(i), i) for i in range(items)),
+                                             keytype=keytype)
+            keys = [cast(key) for key in load]
+            count = 0
+            t0 = t1 = time.time()
+            while count < len(keys) and t1 - t0 < 1:
+                sl.search(keys[count])
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items, params={'keytype': keytype})
+
+    def perf_keytype_insert(self):
+        items = 10**5
+        load = [2*random.randrange(items)+1 for i in range(20000)]
+        for keytype in (None, 'int64', 'float64'):
+            cast = float if keytype == 'float64' else int
+            sl = CompactSkipList.from_sorted(((cast(2*i), i) for i in range(items)),
+                                             keytype=keytype)
+            keys = [cast(key) for key in load]
+            count = 0
+            t0 = t1 = time.time()
+            while count < len(keys) and t1 - t0 < 1:
+                sl.insert(keys[count], count)
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            throughput = count / (t1 - t0)
+            self.add_result(throughput, suffix=items, params={'keytype': keytype})
+
+    def _key_workloads(self, n):
+        # Create key workloads for the key function tests. Each workload is
+        # (name, keys, key function).
+        timestamps = [random.randrange(100*n) for i in range(n)]
+        tuples = [(ts, 'source', i) for i, ts in enumerate(timestamps)]
+        events = [Event(ts, 'event') for ts in timestamps]
+        return [('tuple', tuples, itemgetter(0)),
+                ('object', events, attrgetter('timestamp'))]
+
+    def perf_key_search(self):
+        items = 10**5
+        for kind, keys, keyfunc in self._key_workloads(items):
+            load = random.sample(keys, 20000)
+            for key in (None, keyfunc):
+                sl = SkipList(key=key)
+                sl.update((k, None) for k in keys)
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(load) and t1 - t0 < 1:
+                    sl.search(load[count])
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=kind, params={'key': key is not None})
+
+    def perf_key_insert(self):
+        items = 10**5
+        for kind, keys, keyfunc in self._key_workloads(items):
+            for key in (None, keyfunc):
+                sl = SkipList(key=key)
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(keys) and t1 - t0 < 1:
+                    sl.insert(keys[count], None)
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=kind, params={'key': key is not None})
+
+    def _run_mixed(self, search, insert, remove, nthreads, items):
+        # Run a 95% search / 5% insert+remove mix from *nthreads* threads for
+        # one second and return the total number of operations per second.
+        counts = [0] * nthreads
+        deadline = time.time() + 1
+        def worker(ix):
+            count = 0
+            rnd = random.Random(ix)
+            while True:
+                for i in range(100):
+                    if rnd.random() < 0.05:
+                        key = 2*rnd.randrange(items) + 1
+                        insert(key, key)
+                        remove(key)
+                        count += 2
+                    else:
+                        search(2*rnd.randrange(items))
+                        count += 1
+                if time.time() > deadline:
+                    break
+            counts[ix] = count
+        threads = [threading.Thread(target=worker, args=(ix,)) for ix in range(nthreads)]
+        t0 = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts) / (time.time() - t0)
+
+    def perf_concurrent_mixed(self):
+        items = 10**5
+        pairs = [(2*i, i) for i in range(items)]
+        for nthreads in (1, 2, 4, 8):
+            sl = ConcurrentSkipList.from_sorted(pairs)
+            throughput = self._run_mixed(sl.search, sl.insert, sl.remove, nthreads, items)
+            self.add_result(throughput, suffix=nthreads, params={'lock': 'rwlock'})
+            sl = SkipList.from_sorted(pairs)
+            lock = threading.Lock()
+            def locked(func):
+                def method(*args):
+                    with lock:
+                        return func(*args)
+                return method
+            throughput = self._run_mixed(locked(sl.search), locked(sl.insert),
+                                         locked(sl.remove), nthreads, items)
+            self.add_result(throughput, suffix=nthreads, params={'lock': 'mutex'})
+
+    def perf_snapshot_create(self):
+        for logN in range(4, 7):
+            items = 10**logN
+            sl = SkipList.from_sorted((i, i) for i in range(items))
+            t0 = time.time()
+            _ = list(sl)
+            t1 = time.time()
+            self.add_result(1 / (t1 - t0), suffix=items, params={'method': 'copy'})
+            count = 0
+            t0 = t1 = time.time()
+            while t1 - t0 < 0.2:
+                for i in range(100):
+                    sl.snapshot().close()
+                count += 100
+                t1 = time.time()
+            self.add_result(count / (t1 - t0), suffix=items, params={'method': 'snapshot'})
+
+    def perf_snapshot_iter(self):
+        items = 10**5
+        for changes in (0, 10**3, 10**4):
+            sl = SkipList.from_sorted((2*i, i) for i in range(items))
+            snap = sl.snapshot()
+            for i in range(changes // 2):
+                sl.insert(2*random.randrange(items) + 1, i)
+                sl.pop(2*random.randrange(items), None)
+            t0 = time.time()
+            for pair in snap:
+                pass
+            t1 = time.time()
+            self.add_result(items / (t1 - t0), suffix=changes)
+
+    def perf_snapshot_insert(self):
+        items = 10**5
+        load = [2*random.randrange(items) + 1 for i in range(20000)]
+        for snapshots in (0, 1):
+            sl = SkipList.from_sorted((2*i, i) for i in range(items))
+            _ = sl.snapshot() if snapshots else None
+            count = 0
+            t0 = t1 = time.time()
+            while count < len(load) and t1 - t0 < 1:
+                sl.insert(load[count], count)
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            self.add_result(count / (t1 - t0), suffix=items, params={'snapshots': snapshots})
+
+    def perf_pickle(self):
+        for logN in range(5, 7):
+            items = 10**logN
+            sl = SkipList.from_sorted((i, i) for i in range(items))
+            # Baseline: pickle the pairs and rebuild with inserts.
+            t0 = time.time()
+            copy = SkipList()
+            for key, value in pickle.loads(pickle.dumps(list(sl), pickle.HIGHEST_PROTOCOL)):
+                copy.insert(key, value)
+            t1 = time.time()
+            self.add_result(items / (t1 - t0), suffix=items, params={'method': 'list'})
+            t0 = time.time()
+            copy = pickle.loads(pickle.dumps(sl, pickle.HIGHEST_PROTOCOL))
+            t1 = time.time()
+            self.add_result(items / (t1 - t0), suffix=items, params={'method': 'pickle'})
+            t0 = time.time()
+            fout = io.BytesIO()
+            sl.dump(fout)
+            copy = SkipList.load(io.BytesIO(fout.getvalue()))
+            t1 = time.time()
+            self.add_result(items / (t1 - t0), suffix=items, params={'method': 'dump'})
+
+    def perf_mapped_search(self):
+        for logN in range(3, 7, 3):
+            items = 10**logN
+            pairs = [(i, i) for i in range(items)]
+            load = [random.randrange(items) for i in range(20000)]
+            for cls in (SkipList, CompactSkipList, MappedSkipList):
+                if cls is SkipList:
+                    sl = cls.from_sorted(pairs)
+                else:
+                    sl = cls.from_sorted(pairs, keytype='int64')
+                count = 0
+                t0 = t1 = time.time()
+                while count < len(load) and t1 - t0 < 1:
+                    sl.search(load[count])
+                    count += 1
+                    if count % 100 == 0:
+                        t1 = time.time()
+                throughput = count / (t1 - t0)
+                self.add_result(throughput, suffix=items, params={'class': cls.__name__})
+
+    def perf_mapped_open(self):
+        # Time to get from a file to the first search result.
+        items = 10**6
+        fname = self.tempname()
+        MappedSkipList.from_sorted(((i, i) for i in range(items)), path=fname).close()
+        t0 = time.time()
+        with MappedSkipList(fname) as sl:
+            sl.search(items // 2)
+        t1 = time.time()
+        self.add_result(1 / (t1 - t0), suffix=items, params={'method': 'open'})
+        fname = self.tempname()
+        with open(fname, 'wb') as fout:
+            SkipList.from_sorted((i, i) for i in range(items)).dump(fout)
+        t0 = time.time()
+        with open(fname, 'rb') as fin:
+            sl = SkipList.load(fin)
+        sl.search(items // 2)
+        t1 = time.time()
+        self.add_result(1 / (t1 - t0), suffix=items, params={'method': 'load'})
+
+    def perf_memtable_replace(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(items)]
+        for cls in (SkipList, Memtable):
+            sl = cls()
+            t0 = time.time()
+            for key in load:
+                sl.replace(key, key)
+            t1 = time.time()
+            self.add_result(items / (t1 - t0), suffix=items, params={'class': cls.__name__})
+
+    def perf_sorteddict_setitem(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(items)]
+        # The search-then-replace idiom for unique keys on a SkipList.
+        sl = SkipList()
+        t0 = time.time()
+        for key in load:
+            if key in sl:
+                sl.replace(key, key)
+            else:
+                sl.insert(key, key)
+        t1 = time.time()
+        self.add_result(items / (t1 - t0), suffix=items, params={'class': 'SkipList'})
+        sd = SortedDict()
+        t0 = time.time()
+        for key in load:
+            sd[key] = key
+        t1 = time.time()
+        self.add_result(items / (t1 - t0), suffix=items, params={'class': 'SortedDict'})
+
+    def perf_hash_index(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(20000)]
+        misses = [-key-1 for key in load]
+        for hash_index in (False, True):
+            sl = SkipList.from_sorted(((i, i) for i in range(items)), hash_index=hash_index)
+            params = {'hash_index': hash_index}
+            for name, func, keys in (('search', sl.search, load),
+                                     ('contains', sl.__contains__, load),
+                                     ('pop_miss', lambda key: sl.pop(key, None), misses)):
+                t0 = time.time()
+                for key in keys:
+                    func(key)
+                t1 = time.time()
+                self.add_result(len(keys) / (t1 - t0), suffix='{}_{}'.format(name, items),
+                                params=params)
+            t0 = time.time()
+            for key in load:
+                sl.replace(key, key)
+            t1 = time.time()
+            self.add_result(len(load) / (t1 - t0), suffix='replace_{}'.format(items),
+                            params=params)
+            t0 = time.time()
+            for key in load[:10000]:
+                sl.remove(key)
+                sl.insert(key, key)
+            t1 = time.time()
+            self.add_result(10000 / (t1 - t0), suffix='remove_insert_{}'.format(items),
+                            params=params)
+
+    def perf_aggregate(self):
+        items = 10**5
+        pairs = [(i, i) for i in range(items)]
+        for aggregate in (None, add):
+            sl = SkipList.from_sorted(pairs, aggregate=aggregate)
+            params = {'aggregate': aggregate is not None}
+            load = random.sample(range(items), 10000)
+            t0 = time.time()
+            for key in load:
+                sl.replace(key, key)
+            t1 = time.time()
+            self.add_result(len(load) / (t1 - t0), suffix='replace_{}'.format(items),
+                            params=params)
+            t0 = time.time()
+            for key in load:
+                sl.remove(key)
+                sl.insert(key, key)
+            t1 = time.time()
+            self.add_result(len(load) / (t1 - t0), suffix='remove_insert_{}'.format(items),
+                            params=params)
+        # A sum over a window of 1000 keys, with a scan and with aggregates.
+        for name, func in (('scan', lambda start: sum(sl.values(start, start+1000))),
+                           ('aggregate', lambda start: sl.aggregate(start, start+1000))):
+            t0 = time.time()
+            for start in load[:1000]:
+                func(start)
+            t1 = time.time()
+            self.add_result(1000 / (t1 - t0), suffix='window_{}'.format(items),
+                            params={'method': name})
+
+    def perf_memtable_flush(self):
+        items = 10**5
+        mt = Memtable()
+        for i in range(items):
+            mt.replace(i, i)
+        t0 = time.time()
+        mt.flush(self.tempname()).close()
+        t1 = time.time()
+        self.add_result(items / (t1 - t0), suffix=items)
+
+    def perf_segment_search(self):
+        for logN in range(3, 7, 3):
+            items = 10**logN
+            load = [random.randrange(items) for i in range(20000)]
+            seg = Segment.write(self.tempname(), ((i, i) for i in range(items)))
+            count = 0
+            t0 = t1 = time.time()
+            while count < len(load) and t1 - t0 < 1:
+                seg.search(load[count])
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            seg.close()
+            self.add_result(count / (t1 - t0), suffix=items)
+
+    def perf_merge(self):
+        items = 10**5
+        for count in (2, 8, 32):
+            lists = [SkipList.from_sorted((random.randrange(items), i)
+                                          for i in range(items // count))
+                     for j in range(count)]
+            t0 = time.time()
+            for pair in merge(*lists):
+                pass
+            t1 = time.time()
+            self.add_result(items / (t1 - t0), suffix=items, params={'lists': count})
+
+    def perf_union(self):
+        items = 10**5
+        sl = SkipList.from_sorted((2*i, i) for i in range(items))
+        other = SkipList.from_sorted((3*i, i) for i in range(items))
+        # Baseline: insert the missing pairs one by one.
+        t0 = time.time()
+        result = SkipList.from_sorted(sl.items())
+        for key, value in other:
+            if key not in sl:
+                result.insert(key, value)
+        t1 = time.time()
+        self.add_result(2*items / (t1 - t0), suffix=items, params={'method': 'insert'})
+        t0 = time.time()
+        result = sl.union(other)
+        t1 = time.time()
+        self.add_result(2*items / (t1 - t0), suffix=items, params={'method': 'union'})
+
+    def perf_p_search(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(20000)]
+        for p in (0.125, 0.25, 1/math.e, 0.5, 0.75):
+            sl = SkipList.from_sorted(((i, i) for i in range(items)), p=p)
+            count = 0
+            t0 = t1 = time.time()
+            while count < len(load) and t1 - t0 < 1:
+                sl.search(load[count])
+                count += 1
+                if count % 100 == 0:
+                    t1 = time.time()
+            self.add_result(count / (t1 - t0), suffix=items, params={'p': round(p, 3)})
+
+    def perf_maxlevel_insert(self):
+        for logN in range(2, 7, 2):
+            items = 10**logN
+            load = [random.randrange(items) for i in range(items)]
+            for maxlevel in (None, 'auto'):
+                t0 = time.time()
+                sl = SkipList(maxlevel=maxlevel)
+                for key in load:
+                    sl.insert(key, key)
+                t1 = time.time()
+                self.add_result(items / (t1 - t0), suffix=items,
+                                params={'maxlevel': maxlevel})
+
+    def perf_levels_insert(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(items)]
+        for levels in ('random', 'geometric', 'deterministic'):
+            for p in (1/math.e, 0.75):
+                if levels == 'deterministic' and p != 1/math.e:
+                    continue
+                t0 = time.time()
+                sl = SkipList(p=p, levels=levels, seed=1)
+                for key in load:
+                    sl.insert(key, key)
+                t1 = time.time()
+                self.add_result(items / (t1 - t0), suffix=items,
+                                params={'levels': levels, 'p': round(p, 3)})
+
+    def perf_levels_search(self):
+        items = 10**5
+        load = [random.randrange(items) for i in range(20000)]
+        for levels in ('random', 'deterministic'):
+            sl = SkipList(levels=levels, seed=1)
+            for key in range(items):
+                sl.insert(key, key)
+            t0 = time.time()
+            for key in load:
+                sl.search(key)
+            t1 = time.time()
+            self.add_result(len(load) / (t1 - t0), suffix=items, params={'levels': levels})
+
 
 if __name__ == '__main__':
     PerfSkipList.setup_loader()
@@ -0,0 +1,155 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import sys
+import unittest
+import six
+
+from support import TestCase
+import test_skiplist
+from pyskiplist import SkipList, CompactSkipList
+from pyskiplist.compact import check, dump, getsize
+from pyskiplist.skiplist import getsize as getsize_skiplist
+
+
+class TestCompactSkipList(test_skiplist.TestSkipList):
+    """Unit test suite for CompactSkipList."""
+
+    skiplist = CompactSkipList
+    check = staticmethod(check)
+
+    def test_reuse_slots(self):
+        sl = CompactSkipList()
+        for i in range(100):
+            sl.insert(i, i)
+        nslots = len(sl._keys)
+        for i in range(0, 100, 2):
+            sl.remove(i)
+        check(sl)
+        for i in range(0, 100, 2):
+            sl.insert(i, i)
+        check(sl); self.assertEqual(list(sl), [(i, i) for i in range(100)])
+        # Slots are only reused for nodes with the same level.
+        self.assertLess(len(sl._keys), nslots + 50)
+
+    def test_reuse_slots_run(self):
+        sl = CompactSkipList.from_sorted((i, i) for i in range(100))
+        del sl[10:90]
+        check(sl)
+        self.assertEqual(sum(len(free) for free in sl._free), 80)
+        for i in range(10, 90):
+            sl.insert(i, i)
+        check(sl); self.assertEqual(list(sl), [(i, i) for i in range(100)])
+
+    def test_release_references(self):
+        sl = CompactSkipList()
+        key, value = ('foo',), ('bar',)
+        sl.insert(key, value)
+        sl.remove(key)
+        check(sl)
+        self.assertFalse(any(el is key for el in sl._keys))
+        self.assertFalse(any(el is value for el in sl._values))
+
+    @unittest.skipIf(sys.version_info >= (3, 3), 'int64 keys are available')
+    def test_int64_unavailable(self):
+        self.assertRaises(ValueError, CompactSkipList, keytype='int64')
+
+
+class TestCompactSkipListFinger(TestCompactSkipList):
+    """Unit test suite for CompactSkipList with finger search."""
+
+    options = {'finger': True}
+
+
+@unittest.skipIf(sys.version_info < (3, 3), 'int64 keys require Python 3.3')
+class TestCompactSkipListInt64(TestCompactSkipList):
+    """Unit test suite for CompactSkipList with int64 keys."""
+
+    options = {'keytype': 'int64'}
+
+    def test_keytype(self):
+        sl = CompactSkipList(keytype='int64')
+        self.assertEqual(sl.keytype, 'int64')
+        self.assertEqual(sl._keys.itemsize, 8)
+        self.assertRaises(ValueError, CompactSkipList, keytype='int32')
+
+    def test_invalid_key(self):
+        sl = CompactSkipList.from_sorted([(1, 'a'), (3, 'b')], keytype='int64')
+        self.assertRaises(TypeError, sl.insert, 2.5, 'c')
+        self.check(sl); self.assertEqual(list(sl), [(1, 'a'), (3, 'b')])
+        self.assertRaises(OverflowError, sl.insert, 2**63, 'c')
+        self.check(sl); self.assertEqual(list(sl), [(1, 'a'), (3, 'b')])
+        self.assertRaises(OverflowError, sl.update, [(2, 'c'), (2**64, 'd')])
+        self.check(sl); self.assertEqual(list(sl), [(1, 'a'), (2, 'c'), (3, 'b')])
+        pairs = [(i, i) for i in range(100)] + [(2**64, None)]
+        self.assertRaises(OverflowError, CompactSkipList.from_sorted, pairs,
+                          keytype='int64')
+        sl = CompactSkipList(keytype='int64')
+        self.assertRaises(OverflowError, sl._append_sorted, pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs[:-1])
+
+    def test_limits(self):
+        sl = CompactSkipList(keytype='int64')
+        for key in (0, -2**63, 2**63-1):
+            sl.insert(key, key)
+        self.check(sl)
+        self.assertEqual(list(sl.keys()), [-2**63, 0, 2**63-1])
+        self.assertIsInstance(sl[0][0], int)
+
+
+class TestCompactSkipListFloat64(TestCompactSkipList):
+    """Unit test suite for CompactSkipList with float64 keys."""
+
+    options = {'keytype': 'float64'}
+
+    def test_repr(self):
+        sl = CompactSkipList(keytype='float64')
+        sl.insert(1, 2)
+        sl.insert(3, 4)
+        self.assertEqual(repr(sl), 'CompactSkipList(((1.0, 2), (3.0, 4)))')
+
+    def test_float_keys(self):
+        sl = CompactSkipList(keytype='float64')
+        for key in (0.5, -1.25, 3, float('inf')):
+            sl.insert(key, key)
+        self.check(sl)
+        self.assertEqual(list(sl.keys()), [-1.25, 0.5, 3.0, float('inf')])
+        self.assertIsInstance(sl[2][0], float)
+        self.assertEqual(sl.search(3), 3)
+        self.assertEqual(sl.index(0.5), 1)
+        self.assertRaises(TypeError, sl.insert, 'foo', None)
+        self.check(sl); self.assertEqual(len(sl), 4)
+
+
+class TestCompactSkipListDebug(TestCase):
+    """Coverage for debugging tools."""
+
+    def test_node_size(self):
+        sl = CompactSkipList()
+        ref = SkipList()
+        for i in range(1000):
+            sl.insert(i, None)
+            ref.insert(i, None)
+        size = getsize(sl)
+        self.assertIsInstance(size, int)
+        self.assertLess(size, getsize_skiplist(ref))
+
+    def test_dump(self):
+        sl = CompactSkipList()
+        sl.insert('foo', 'bar')
+        sl.insert('baz', 'qux')
+        out = six.StringIO()
+        dump(sl, out)
+        s = out.getvalue()
+        self.assertIsInstance(s, str)
+        self.assertGreater(len(s), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
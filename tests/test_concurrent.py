@@ -0,0 +1,121 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import random
+import threading
+import unittest
+
+from support import TestCase
+import test_skiplist
+from pyskiplist import SkipList, ConcurrentSkipList, RWLock
+from pyskiplist.skiplist import check
+
+
+class TestConcurrentSkipList(test_skiplist.TestSkipList):
+    """Unit test suite for ConcurrentSkipList."""
+
+    skiplist = ConcurrentSkipList
+    check = staticmethod(lambda sl: check(sl._list))
+
+    def test_finger_search(self):
+        # This tests the internals, which are tested by TestSkipList.
+        pass
+
+    def test_append_no_search(self):
+        # This tests the internals, which are tested by TestSkipList.
+        pass
+
+    def test_readers_writers(self):
+        size = self.size
+        sl = ConcurrentSkipList.from_sorted((2*i, 2*i) for i in range(size))
+        errors = []
+        done = threading.Event()
+        def reader():
+            while not done.is_set():
+                key = 2 * random.randrange(size)
+                if sl.search(key) != key or key not in sl:
+                    errors.append(key)
+                # The writer has at most one odd key in the list.
+                if not key//2 <= sl.index(key) <= key//2 + 1:
+                    errors.append(key)
+                if not key//2 <= sl.bisect_left(key) <= key//2 + 1:
+                    errors.append(key)
+        def writer():
+            for i in range(10*size):
+                key = 2 * random.randrange(size) + 1
+                sl.insert(key, key)
+                sl.remove(key)
+            done.set()
+        threads = [threading.Thread(target=reader) for i in range(4)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.check(sl); self.assertEqual(list(sl), [(2*i, 2*i) for i in range(size)])
+
+
+class TestConcurrentSkipListFinger(TestConcurrentSkipList):
+    """Unit test suite for ConcurrentSkipList with finger search."""
+
+    options = {'finger': True}
+
+
+class TestSkipListReaders(TestCase):
+    """Test that the read-only operations of SkipList do not change it."""
+
+    def test_read_only(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(100)), aggregate=max)
+        sl.search(50)
+        path, distance = sl._path[:], sl._distance[:]
+        sl.search(10); 20 in sl; sl.index(30)
+        sl.bisect_left(40); sl.bisect_right(40); sl.count(60)
+        sl.count_range(10, 20); sl[70]; list(sl.items(80))
+        sl.aggregate(10, 20); sl.aggregate_pos(30, 40)
+        list(sl.items(10, 20, reverse=True)); list(sl[20:10:-1]); list(sl[10:20])
+        sl.search_many([30, 10, 200]); sl.take([5, 90, 40])
+        list(sl[::30]); list(sl[90:0:-30])
+        # Compare the ids, as the repr of a node includes the rest of the list.
+        self.assertEqual(list(map(id, sl._path)), list(map(id, path)))
+        self.assertEqual(sl._distance, distance)
+
+
+class TestRWLock(TestCase):
+    """Unit test suite for RWLock."""
+
+    def test_readers(self):
+        lock = RWLock()
+        lock.acquire_read()
+        lock.acquire_read()
+        self.assertEqual(lock._readers, 2)
+        lock.release_read()
+        lock.release_read()
+        lock.acquire_write()
+        self.assertTrue(lock._writer)
+        lock.release_write()
+
+    def test_writer_waits(self):
+        lock = RWLock()
+        lock.acquire_read()
+        acquired = threading.Event()
+        def writer():
+            lock.acquire_write()
+            acquired.set()
+            lock.release_write()
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        lock.release_read()
+        thread.join()
+        self.assertTrue(acquired.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
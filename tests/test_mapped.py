@@ -0,0 +1,184 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import copy
+import pickle
+import random
+import unittest
+import six
+
+from support import TestCase
+import test_skiplist
+from pyskiplist import MappedSkipList
+from pyskiplist.mapped import check, dump
+
+
+@unittest.skipIf(sys.version_info < (3, 3), 'requires Python 3.3')
+class TestMappedSkipList(test_skiplist.TestSkipList):
+    """Unit test suite for MappedSkipList."""
+
+    skiplist = MappedSkipList
+    check = staticmethod(check)
+
+    def test_reopen(self):
+        fname = self.tempname()
+        size = self.size
+        pairs = [(2*i, i) for i in range(size)]
+        sl = MappedSkipList.from_sorted(pairs, path=fname, **self.options)
+        self.assertEqual(sl.filename, fname)
+        for i in range(size//2):
+            sl.remove(pairs.pop(random.randrange(len(pairs)))[0])
+        sl.replace(-1, 'foo')
+        pairs.insert(0, (-1, 'foo'))
+        sl.close()
+        with MappedSkipList(fname, **self.options) as sl:
+            self.check(sl); self.assertEqual(list(sl), pairs)
+            sl.insert(2*size+1, None)
+            pairs.append((2*size+1, None))
+        # Removed slots are reused after reopening.
+        sl = MappedSkipList(fname, **self.options)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        nslots = len(sl._keys)
+        for i in range(size//2):
+            sl.insert(i, i)
+        self.check(sl)
+        self.assertEqual(len(sl._keys), nslots)
+        sl.close()
+
+    def test_values(self):
+        sl = MappedSkipList(**self.options)
+        values = [None, 'foo', b'bar', [1, (2, 3)], {'a': 1.5}, 10**30]
+        for i, value in enumerate(values):
+            sl.insert(i, value)
+        self.check(sl); self.assertEqual(list(sl.values()), values)
+        self.assertEqual(sl._vrefs[sl._links[sl._offsets[sl._head]]], -1)
+        self.assertRaises(Exception, sl.insert, 10, lambda: None)
+        self.check(sl); self.assertEqual(list(sl.values()), values)
+
+    def test_grow(self):
+        sl = MappedSkipList(**self.options)
+        nbytes = len(sl._mm)
+        pairs = []
+        for i in range(2000):
+            pair = (random.randint(0, 1000), 'x' * random.randint(0, 100))
+            sl.insert(*pair)
+            pairs.append(pair)
+        pairs.sort(key=lambda pair: pair[0])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertGreater(len(sl._mm), nbytes)
+        self.assertGreaterEqual(os.fstat(sl._file.fileno()).st_size, len(sl._mm))
+
+    def test_clear_keeps_size(self):
+        sl = MappedSkipList.from_sorted(((i, i) for i in range(1000)), **self.options)
+        nbytes = len(sl._mm)
+        it = sl.items()
+        next(it)
+        sl.clear()
+        self.check(sl); self.assertEqual(list(sl), [])
+        self.assertEqual(len(sl._mm), nbytes)
+
+    def test_open_invalid(self):
+        fname = self.tempname()
+        with open(fname, 'wb') as fout:
+            fout.write(b'foo' * 1000)
+        self.assertRaises(ValueError, MappedSkipList, fname)
+        fname = self.tempname()
+        MappedSkipList(fname, keytype='float64').close()
+        self.assertRaises(ValueError, MappedSkipList, fname, 'int64')
+        self.assertRaises(ValueError, MappedSkipList, keytype='int32')
+        self.assertRaises(ValueError, MappedSkipList, keytype=None)
+
+    def test_from_sorted_overwrite(self):
+        fname = self.tempname()
+        MappedSkipList.from_sorted([(1, 1), (2, 2)], path=fname, **self.options).close()
+        sl = MappedSkipList.from_sorted([(3, 3)], path=fname, **self.options)
+        self.check(sl); self.assertEqual(list(sl), [(3, 3)])
+        sl.close()
+
+    def test_pickle_file(self):
+        fname = self.tempname()
+        sl = MappedSkipList.from_sorted(((i, i) for i in range(100)), path=fname,
+                                        **self.options)
+        pairs = [(i, i) for i in range(100)]
+        # A copy holds the pairs in a temporary file, not a second handle on
+        # the same file.
+        for copied in (pickle.loads(pickle.dumps(sl)), copy.copy(sl), copy.deepcopy(sl)):
+            self.assertIsNone(copied.filename)
+            self.check(copied); self.assertEqual(list(copied), pairs)
+            copied.insert(3, 'x')
+            copied.close()
+        sl.remove(10)
+        self.check(sl); self.assertEqual(list(sl), pairs[:10] + pairs[11:])
+        sl.close()
+
+    def test_close(self):
+        sl = MappedSkipList.from_sorted((i, i) for i in range(100))
+        it = sl.items()
+        next(it)
+        sl.close()
+        sl.close()
+        self.assertTrue(sl._file.closed)
+
+    def test_invalid_key(self):
+        sl = MappedSkipList.from_sorted([(1, 'a'), (3, 'b')], keytype='int64')
+        self.assertRaises(TypeError, sl.insert, 'foo', 'c')
+        self.check(sl); self.assertEqual(list(sl), [(1, 'a'), (3, 'b')])
+        self.assertRaises(OverflowError, sl.insert, 2**64, 'c')
+        self.check(sl); self.assertEqual(list(sl), [(1, 'a'), (3, 'b')])
+        pairs = [(i, i) for i in range(100)] + [(2**64, None)]
+        sl = MappedSkipList(keytype='int64')
+        self.assertRaises(OverflowError, sl._append_sorted, pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs[:-1])
+
+
+class TestMappedSkipListFinger(TestMappedSkipList):
+    """Unit test suite for MappedSkipList with finger search."""
+
+    options = {'finger': True}
+
+
+class TestMappedSkipListFloat64(TestMappedSkipList):
+    """Unit test suite for MappedSkipList with float64 keys."""
+
+    options = {'keytype': 'float64'}
+
+    def test_repr(self):
+        sl = MappedSkipList(keytype='float64')
+        sl.insert(1, 2)
+        sl.insert(3, 4)
+        self.assertEqual(repr(sl), 'MappedSkipList(((1.0, 2), (3.0, 4)))')
+
+
+@unittest.skipIf(sys.version_info < (3, 3), 'requires Python 3.3')
+class TestMappedSkipListDebug(TestCase):
+    """Coverage for debugging tools."""
+
+    def test_dump(self):
+        sl = MappedSkipList()
+        sl.insert(1, 'bar')
+        sl.insert(2, 'qux')
+        out = six.StringIO()
+        dump(sl, out)
+        s = out.getvalue()
+        self.assertIsInstance(s, str)
+        self.assertGreater(len(s), 20)
+
+
+@unittest.skipIf(sys.version_info >= (3, 3), 'MappedSkipList is available')
+class TestMappedSkipListUnavailable(TestCase):
+    """Test that MappedSkipList fails clearly before Python 3.3."""
+
+    def test_unavailable(self):
+        self.assertRaises(RuntimeError, MappedSkipList)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import sys
+import random
+import unittest
+
+from support import TestCase
+from pyskiplist import Memtable, Segment
+from pyskiplist.skiplist import check
+
+
+class TestMemtable(TestCase):
+    """Unit test suite for Memtable."""
+
+    size = 100
+
+    def _create_memtable(self, size):
+        mt = Memtable()
+        ref = {}
+        for i in range(size):
+            key, value = random.randint(0, 2*size), random.randint(0, 10*size)
+            mt.replace(key, value)
+            ref[key] = value
+        return mt, sorted(ref.items())
+
+    def test_replace(self):
+        mt, pairs = self._create_memtable(self.size)
+        check(mt._list); self.assertEqual(list(mt), pairs)
+        self.assertEqual(len(mt), len(pairs))
+        for key, value in pairs:
+            self.assertEqual(mt.search(key), value)
+            self.assertIn(key, mt)
+        self.assertIsNone(mt.search(-1))
+        self.assertNotIn(-1, mt)
+
+    def test_items(self):
+        mt, pairs = self._create_memtable(self.size)
+        self.assertEqual(list(mt.items(10, 20)), [p for p in pairs if 10 <= p[0] < 20])
+        self.assertEqual(list(mt.keys(reverse=True)), [p[0] for p in reversed(pairs)])
+        self.assertEqual(list(mt.values()), [p[1] for p in pairs])
+
+    def test_nbytes(self):
+        mt = Memtable()
+        empty = mt.nbytes
+        self.assertGreater(empty, 0)
+        mt.replace(1, 'foo')
+        size = mt.nbytes - empty
+        self.assertGreater(size, sys.getsizeof(1) + sys.getsizeof('foo'))
+        mt.replace(1, 'x' * 1000)
+        self.assertEqual(mt.nbytes - empty, size + 1000 - len('foo'))
+        mt.replace(1, 'bar')
+        self.assertEqual(mt.nbytes - empty, size)
+        for i in range(2, 1001):
+            mt.replace(i, 'foo')
+        self.assertGreater(mt.nbytes, 1000 * size)
+
+    def test_freeze(self):
+        mt, pairs = self._create_memtable(self.size)
+        self.assertFalse(mt.frozen)
+        mt.freeze()
+        self.assertTrue(mt.frozen)
+        self.assertRaises(ValueError, mt.replace, 1, 2)
+        self.assertEqual(list(mt), pairs)
+
+    def test_flush(self):
+        mt, pairs = self._create_memtable(self.size)
+        fname = self.tempname()
+        with mt.flush(fname, 7) as seg:
+            self.assertTrue(mt.frozen)
+            self.assertEqual(len(seg), len(pairs))
+            self.assertEqual(list(seg), pairs)
+        with Segment(fname) as seg:
+            self.assertEqual(list(seg), pairs)
+
+    def test_flush_empty(self):
+        fname = self.tempname()
+        with Memtable().flush(fname) as seg:
+            self.assertEqual(len(seg), 0)
+            self.assertFalse(seg)
+            self.assertEqual(list(seg), [])
+            self.assertIsNone(seg.search(1))
+
+
+class TestSegment(TestCase):
+    """Unit test suite for Segment."""
+
+    size = 1000
+
+    def _create_segment(self, size, blocksize):
+        pairs = [(2*i, str(i)) for i in range(size)]
+        return Segment.write(self.tempname(), pairs, blocksize), pairs
+
+    def test_search(self):
+        for blocksize in (1, 10, 64, 2000):
+            seg, pairs = self._create_segment(self.size, blocksize)
+            for key, value in pairs:
+                self.assertEqual(seg.search(key), value)
+                self.assertIn(key, seg)
+                self.assertIsNone(seg.search(key+1))
+                self.assertNotIn(key+1, seg)
+            self.assertEqual(seg.search(-1, 'foo'), 'foo')
+            self.assertIsNone(seg.search(2*self.size))
+            seg.close()
+
+    def test_items(self):
+        for blocksize in (1, 10, 64, 2000):
+            seg, pairs = self._create_segment(self.size, blocksize)
+            self.assertEqual(list(seg), pairs)
+            for i in range(100):
+                start = random.randint(-1, 2*self.size+1)
+                stop = random.randint(start, 2*self.size+2)
+                ref = [pair for pair in pairs if start <= pair[0] < stop]
+                self.assertEqual(list(seg.items(start, stop)), ref)
+                self.assertEqual(list(seg.keys(start)), [p[0] for p in pairs if p[0] >= start])
+                self.assertEqual(list(seg.values(None, stop)),
+                                 [p[1] for p in pairs if p[0] < stop])
+            seg.close()
+
+    def test_sparse_index(self):
+        seg, pairs = self._create_segment(self.size, 64)
+        self.assertEqual(len(seg._firstkeys), (self.size + 63) // 64)
+        # A lookup reads only the block that may contain the key.
+        for key in (0, 200, 201, 2*self.size-2):
+            block = key // 128
+            seg.search(key)
+            self.assertEqual(seg._file.tell(), seg._offsets[block+1])
+        seg.close()
+
+    def test_invalid(self):
+        fname = self.tempname()
+        with open(fname, 'wb') as fout:
+            fout.write(b'foo' * 100)
+        self.assertRaises(ValueError, Segment, fname)
+        seg, pairs = self._create_segment(10, 4)
+        seg.close()
+        fname = self.tempname()
+        with open(seg._file.name, 'rb') as fin:
+            data = fin.read()
+        with open(fname, 'wb') as fout:
+            fout.write(data[:-4])
+        self.assertRaises(ValueError, Segment, fname)
+
+
+if __name__ == '__main__':
+    unittest.main()
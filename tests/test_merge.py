@@ -0,0 +1,68 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import sys
+import random
+import unittest
+
+from support import TestCase
+from pyskiplist import SkipList, CompactSkipList, ConcurrentSkipList, merge
+
+
+class TestMerge(TestCase):
+    """Unit test suite for merge()."""
+
+    size = 100
+
+    def _create_lists(self, count, size):
+        lists, pairs = [], []
+        for i in range(count):
+            keys = sorted(random.randint(0, size) for j in range(random.randint(0, size)))
+            lpairs = [(key, (i, j)) for j, key in enumerate(keys)]
+            lists.append(SkipList.from_sorted(lpairs))
+            pairs.extend(lpairs)
+        # Pairs with the same key are in the order of the lists.
+        pairs.sort(key=lambda pair: pair[0])
+        return lists, pairs
+
+    def test_merge(self):
+        for count in range(6):
+            lists, pairs = self._create_lists(count, self.size)
+            self.assertEqual(list(merge(*lists)), pairs)
+
+    def test_merge_range(self):
+        lists, pairs = self._create_lists(4, self.size)
+        for i in range(self.size):
+            start = random.randint(-1, self.size+1)
+            stop = random.randint(start, self.size+2)
+            ref = [pair for pair in pairs if start <= pair[0] < stop]
+            self.assertEqual(list(merge(*lists, start=start, stop=stop)), ref)
+        self.assertEqual(list(merge(*lists, start=10)), [p for p in pairs if p[0] >= 10])
+        self.assertRaises(TypeError, list, merge(*lists, foo=1))
+
+    @unittest.skipIf(sys.version_info < (3, 3), 'int64 keys require Python 3.3')
+    def test_merge_types(self):
+        lists = [SkipList.from_sorted([(1, 'a'), (4, 'd')]),
+                 CompactSkipList.from_sorted([(2, 'b')], keytype='int64'),
+                 ConcurrentSkipList.from_sorted([(3, 'c'), (4, 'e')])]
+        self.assertEqual(list(merge(*lists)),
+                         [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (4, 'e')])
+
+    def test_merge_key(self):
+        def negate(x):
+            return -x
+        lists = [SkipList.from_sorted([(4, 'a'), (1, 'b')], key=negate),
+                 SkipList.from_sorted([(3, 'c'), (2, 'd'), (0, 'e')], key=negate)]
+        self.assertEqual(list(merge(*lists)),
+                         [(4, 'a'), (3, 'c'), (2, 'd'), (1, 'b'), (0, 'e')])
+        self.assertEqual(list(merge(*lists, start=3, stop=1)), [(3, 'c'), (2, 'd')])
+
+
+if __name__ == '__main__':
+    unittest.main()
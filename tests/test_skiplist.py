@@ -7,22 +7,36 @@
 
 from __future__ import absolute_import, print_function
 
+import io
+import sys
 import random
+import bisect
+import pickle
+import operator
 import unittest
 import six
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from support import TestCase
-from pyskiplist import SkipList
+from pyskiplist import SkipList, SortKey
 from pyskiplist.skiplist import check, dump, getsize
 
 
 class TestSkipList(TestCase):
     """Unit test suite for SkipList."""
 
+    skiplist = SkipList
+    check = staticmethod(check)
+
     size = 100
+    options = {}
 
     def _create_skiplist(self, size, keysize, valuesize):
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         pairs = []
         values = {}
         for i in range(size):
@@ -37,78 +51,337 @@ class TestSkipList(TestCase):
 
     # GENERAL API ...
 
+    def test_finger(self):
+        sl = self.skiplist(**self.options)
+        self.assertEqual(sl.finger, self.options.get('finger', False))
+        self.check(sl)
+
+    def test_finger_search(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        ref = self.skiplist.from_sorted(pairs)
+        keys = [random.randint(-1, 2*size+1) for i in range(size)]
+        keys += sorted(keys) + sorted(keys, reverse=True)
+        for key in keys:
+            for func in ('_find_lt', '_find_lte'):
+                getattr(sl, func)(key, True)
+                getattr(ref, func)(key)
+                self.assertEqual(sl._distance[0], ref._distance[0])
+                self.check(sl)
+        positions = [random.randint(0, size) for i in range(size)]
+        positions += sorted(positions) + sorted(positions, reverse=True)
+        for pos in positions:
+            sl._find_pos(pos, True)
+            ref._find_pos(pos)
+            self.assertEqual(sl._distance[0], ref._distance[0])
+            self.check(sl)
+
     def test_level(self):
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         self.assertEqual(sl.level, 1)
-        check(sl)
+        self.check(sl)
 
     def test_insert(self):
         size = self.size
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         pairs = []
         for i in range(size):
             pair = (random.randint(0, 2*size), random.randint(0, 10*size))
             sl.insert(*pair)
             pairs = sorted(pairs + [pair], key=lambda x: x[0])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertGreater(sl.level, 1)
 
+    def test_insert_append(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        for i in range(size):
+            pair = (2*size + i//2, i)
+            sl.insert(*pair)
+            pairs.append(pair)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+            if i % 10 == 0:
+                self.assertIn(random.choice(pairs)[0], sl)
+                self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_append(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        for i in range(size):
+            pair = (2*size + i//2, i)
+            sl.append(*pair)
+            pairs.append(pair)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+            if i % 10 == 0:
+                self.assertIn(random.choice(pairs)[0], sl)
+                self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertRaises(ValueError, sl.append, 2*size, None)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertRaises(ValueError, sl.append, 0, None)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_append_no_search(self):
+        if self.options.get('levels') == 'deterministic':
+            self.skipTest('promotions move nodes after the path')
+        searches = []
+        class SkipList(self.skiplist):
+            def _find_lte(self, *args):
+                searches.append(args)
+                return super(SkipList, self)._find_lte(*args)
+            def _find_pos(self, *args):
+                searches.append(args)
+                return super(SkipList, self)._find_pos(*args)
+        sl = SkipList(**self.options)
+        pairs = []
+        for i in range(self.size):
+            pair = (i//2, i)
+            if i % 2:
+                sl.append(*pair)
+            else:
+                sl.insert(*pair)
+            pairs.append(pair)
+        self.assertEqual(searches, [])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        # An insertion elsewhere needs a search, and so does the next append.
+        sl.insert(-1, 0)
+        sl.append(self.size, 0)
+        self.assertEqual(len(searches), 2)
+        pairs = [(-1, 0)] + pairs + [(self.size, 0)]
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_append_empty(self):
+        sl = self.skiplist(**self.options)
+        sl.append(1, 2)
+        self.check(sl); self.assertEqual(list(sl), [(1, 2)])
+        del sl[0]
+        sl.append(0, 1)
+        self.check(sl); self.assertEqual(list(sl), [(0, 1)])
+
     def test_replace(self):
         size = self.size
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         values = {}
         for i in range(size):
             pair = (random.randint(0, 2*size), random.randint(0, 10*size))
             sl.replace(*pair)
             values[pair[0]] = pair[1]
             pairs = sorted(values.items(), key=lambda x: x[0])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertGreater(sl.level, 1)
 
+    def test_from_sorted(self):
+        size = self.size
+        pairs = sorted((random.randint(0, 2*size), random.randint(0, 10*size))
+                            for i in range(size))
+        sl = self.skiplist.from_sorted(pairs, **self.options)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(len(sl), size)
+        self.assertGreater(sl.level, 1)
+        sl = self.skiplist.from_sorted(iter(pairs), check=True, **self.options)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        keys = [pair[0] for pair in pairs]
+        values = [pair[1] for pair in pairs]
+        sl = self.skiplist.from_sorted(keys, values, **self.options)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        for i in range(size):
+            self.assertEqual(sl[i], pairs[i])
+        sl.insert(2*size+1, size)
+        pairs.append((2*size+1, size))
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_from_sorted_empty(self):
+        sl = self.skiplist.from_sorted([], **self.options)
+        self.check(sl); self.assertEqual(list(sl), [])
+        self.assertEqual(len(sl), 0)
+        self.assertEqual(sl.level, 1)
+
+    def test_from_sorted_duplicates(self):
+        pairs = [(1, 'a'), (1, 'b'), (2, 'c'), (2, 'd'), (2, 'e')]
+        sl = self.skiplist.from_sorted(pairs, **self.options)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.search(2), 'c')
+
+    def test_from_sorted_check(self):
+        pairs = [(1, 'a'), (3, 'b'), (2, 'c')]
+        self.assertRaises(ValueError, self.skiplist.from_sorted, pairs, check=True)
+        sl = self.skiplist.from_sorted(pairs[:2], check=True, **self.options)
+        self.check(sl); self.assertEqual(list(sl), pairs[:2])
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_from_numpy(self):
+        keys = numpy.arange(self.size) * 2
+        values = numpy.arange(self.size)
+        sl = self.skiplist.from_numpy(keys, values, **self.options)
+        self.check(sl); self.assertEqual(list(sl), list(zip(range(0, 2*self.size, 2),
+                                                            range(self.size))))
+        self.assertNotIsInstance(sl[0][0], numpy.generic)
+        self.assertNotIsInstance(sl[0][1], numpy.generic)
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_from_numpy_unsorted(self):
+        keys = [3, 1, 2, 1, 3, 0]
+        values = ['a', 'b', 'c', 'd', 'e', 'f']
+        sl = self.skiplist.from_numpy(keys, values, **self.options)
+        self.check(sl)
+        self.assertEqual(list(sl), [(0, 'f'), (1, 'b'), (1, 'd'), (2, 'c'),
+                                    (3, 'a'), (3, 'e')])
+        sl = self.skiplist.from_numpy([], [], **self.options)
+        self.check(sl); self.assertEqual(list(sl), [])
+        self.assertRaises(ValueError, self.skiplist.from_numpy, [1, 2], [1])
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_to_numpy(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        keys, values = sl.to_numpy()
+        self.assertIsInstance(keys, numpy.ndarray)
+        self.assertEqual(keys.tolist(), [pair[0] for pair in pairs])
+        self.assertEqual(values.tolist(), [pair[1] for pair in pairs])
+        start, stop = pairs[size//4][0], pairs[size//2][0]
+        keys, values = sl.to_numpy(start, stop)
+        ref = [pair for pair in pairs if start <= pair[0] < stop]
+        self.assertEqual(list(zip(keys.tolist(), values.tolist())), ref)
+        keys, values = self.skiplist(**self.options).to_numpy()
+        self.assertEqual(len(keys), 0)
+        self.assertEqual(len(values), 0)
+
+    def test_pickle(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        for protocol in range(pickle.HIGHEST_PROTOCOL+1):
+            copy = pickle.loads(pickle.dumps(sl, protocol))
+            self.assertIs(type(copy), type(sl))
+            self.check(copy); self.assertEqual(list(copy), pairs)
+            self.assertEqual(copy.finger, sl.finger)
+        copy = pickle.loads(pickle.dumps(self.skiplist(**self.options)))
+        self.check(copy); self.assertEqual(list(copy), [])
+
+    def test_pickle_large(self):
+        # The size exceeds the recursion limit, so the nodes should not be
+        # pickled recursively.
+        size = sys.getrecursionlimit() * 2
+        sl = self.skiplist.from_sorted(((i, i) for i in range(size)), **self.options)
+        copy = pickle.loads(pickle.dumps(sl, pickle.HIGHEST_PROTOCOL))
+        self.check(copy); self.assertEqual(len(copy), size)
+        self.assertEqual(list(copy), list(sl))
+
+    def test_dump_load(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        for chunksize in (1, 7, 10000):
+            fout = io.BytesIO()
+            sl.dump(fout, chunksize)
+            fin = io.BytesIO(fout.getvalue())
+            copy = self.skiplist.load(fin, **self.options)
+            self.check(copy); self.assertEqual(list(copy), pairs)
+            self.assertEqual(fin.read(), b'')
+        fout = io.BytesIO()
+        self.skiplist(**self.options).dump(fout)
+        copy = self.skiplist.load(io.BytesIO(fout.getvalue()), **self.options)
+        self.check(copy); self.assertEqual(list(copy), [])
+
+    def test_load_invalid(self):
+        fin = io.BytesIO(pickle.dumps(('foo', 1)))
+        self.assertRaises(ValueError, self.skiplist.load, fin, **self.options)
+
+    def test_set_operations(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        other, opairs, ovalues = self._create_skiplist(size, size, 10*size)
+        union = sorted(pairs + [p for p in opairs if p[0] not in values],
+                       key=lambda pair: pair[0])
+        refs = [(sl.union, union),
+                (sl.intersection, [p for p in pairs if p[0] in ovalues]),
+                (sl.difference, [p for p in pairs if p[0] not in ovalues])]
+        for method, ref in refs:
+            result = method(other)
+            self.assertIs(type(result), type(sl))
+            self.assertEqual(result.finger, sl.finger)
+            self.check(result); self.assertEqual(list(result), ref)
+        empty = self.skiplist(**self.options)
+        self.assertEqual(list(sl.union(empty)), pairs)
+        self.assertEqual(list(empty.union(sl)), pairs)
+        self.assertEqual(list(sl.union(sl)), pairs)
+        self.assertEqual(list(sl.intersection(empty)), [])
+        self.assertEqual(list(sl.intersection(sl)), pairs)
+        self.assertEqual(list(sl.difference(empty)), pairs)
+        self.assertEqual(list(sl.difference(sl)), [])
+        self.assertEqual(list(empty.difference(sl)), [])
+
+    def test_update(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        for batch in (1, 10, size, 2*size):
+            load = [(random.randint(0, 2*size), random.randint(0, 10*size))
+                        for i in range(batch)]
+            sl.update(load)
+            pairs = sorted(pairs + load, key=lambda x: x[0])
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        sl.update([])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_update_empty(self):
+        sl = self.skiplist(**self.options)
+        pairs = [(random.randint(0, 100), i) for i in range(100)]
+        sl.update(iter(pairs))
+        pairs = sorted(pairs, key=lambda x: x[0])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
     def test_clear(self):
         size = self.size
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         for i in range(size):
             sl.insert(random.randint(0, 2*size), random.randint(0, 10*size))
         self.assertGreater(sl.level, 1)
         self.assertEqual(len(sl), size)
         sl.clear()
-        check(sl); self.assertEqual(list(sl), [])
+        self.check(sl); self.assertEqual(list(sl), [])
         self.assertEqual(sl.level, 1)
 
     def test_len(self):
         size = self.size
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         pairs = []
         for i in range(size):
             pair = (random.randint(0, 2*size), random.randint(0, 10*size))
             sl.insert(*pair)
             pairs = sorted(pairs + [pair], key=lambda x: x[0])
             self.assertEqual(len(sl), i+1)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_len_remove(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        while pairs:
+            key = random.choice(pairs)[0]
+            sl.remove(key)
+            del pairs[[pair[0] for pair in pairs].index(key)]
+            self.assertEqual(len(sl), len(pairs))
+            self.check(sl)
+        self.assertEqual(sl.level, 1)
 
     def test_bool(self):
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         self.assertFalse(sl)
         self.assertFalse(bool(sl))
-        check(sl)
-        sl.insert('foo', 'bar')
+        self.check(sl)
+        sl.insert(1, 'bar')
         self.assertTrue(sl)
         self.assertTrue(bool(sl))
-        check(sl)
+        self.check(sl)
 
     def test_repr(self):
-        sl = SkipList()
+        sl = self.skiplist(**self.options)
         sl.insert(1, 2)
         sl.insert(3, 4)
-        self.assertEqual(repr(sl), 'SkipList(((1, 2), (3, 4)))')
-        check(sl)
+        self.assertEqual(repr(sl), self.skiplist.__name__ + '(((1, 2), (3, 4)))')
+        self.check(sl)
 
     def test_iter(self):
         size = self.size
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         self.assertEqual(list(sl), pairs)
-        check(sl)
+        self.check(sl)
 
     def test_items(self):
         size = self.size
@@ -130,7 +403,37 @@ class TestSkipList(TestCase):
             self.assertEqual(list(func(start=10.1, stop=90)), ref(10.1, 90))
             self.assertEqual(list(func(start=10, stop=90.1)), ref(10, 90.1))
             self.assertEqual(list(func(start=10.1, stop=90.1)), ref(10.1, 90.1))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_reversed(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        self.assertEqual(list(reversed(sl)), pairs[::-1])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        sl = self.skiplist(**self.options)
+        self.assertEqual(list(reversed(sl)), [])
+        self.check(sl)
+
+    def test_items_reverse(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        for ix, func in ((slice(0, 2), sl.items), (0, sl.keys), (1, sl.values)):
+            def ref(start, stop):
+                return [pair[ix] for pair in reversed(pairs)
+                            if (start is None or pair[0] >= start)
+                                    and (stop is None or pair[0] < stop)]
+            for start, stop in ((None, None), (None, 10), (10, None), (10, 90),
+                                (10.1, 90.1), (90, 10), (50, 50), (-1, 1000)):
+                self.assertEqual(list(func(start, stop, reverse=True)), ref(start, stop))
+                self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_items_reverse_partial(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        it = sl.items(reverse=True)
+        self.assertEqual([next(it) for i in range(10)], pairs[-10:][::-1])
+        sl.insert(-1, -1)
+        self.check(sl)
 
     def test_popitem(self):
         size = self.size
@@ -138,9 +441,9 @@ class TestSkipList(TestCase):
         while pairs:
             self.assertEqual(sl.popitem(), pairs[0])
             del pairs[0]
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(KeyError, sl.popitem)
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
 
     # KEY BASED API ...
 
@@ -149,11 +452,23 @@ class TestSkipList(TestCase):
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         for key in values:
             self.assertEqual(sl.search(key), values[key][0])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertIsNone(sl.search(random.randint(3*size, 10*size)))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertEqual(sl.search(random.randint(3*size, 10*size), -1), -1)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_search_many(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        keys = [random.randint(-1, 2*size+1) for i in range(size)]
+        ref = [values[key][0] if key in values else None for key in keys]
+        self.assertEqual(sl.search_many(keys), ref)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        ref = [values[key][0] if key in values else -1 for key in keys]
+        self.assertEqual(sl.search_many(iter(keys), -1), ref)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.search_many([]), [])
 
     def test_remove(self):
         size = self.size
@@ -162,9 +477,49 @@ class TestSkipList(TestCase):
             for value in values[key]:
                 sl.remove(key)
                 pairs.remove((key, value))
-                check(sl); self.assertEqual(list(sl), pairs)
+                self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertRaises(KeyError, sl.remove, key)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_remove_many(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        keys = [pair[0] for pair in pairs]
+        random.shuffle(keys)
+        while keys:
+            batch, keys = keys[:10], keys[10:]
+            missing = [random.randint(3*size, 10*size), -1]
+            self.assertEqual(sl.remove_many(batch + missing), len(batch))
+            for key in batch:
+                del pairs[[pair[0] for pair in pairs].index(key)]
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.remove_many([1, 2, 3]), 0)
+        self.check(sl); self.assertEqual(list(sl), [])
+
+    def test_delete_range(self):
+        size = self.size
+        for start, stop in ((None, None), (None, 10), (10, None), (10, 90),
+                            (10.1, 90.1), (90, 10), (50, 50), (-1, 1000)):
+            sl, pairs, values = self._create_skiplist(size, size, 10*size)
+            ref = [pair for pair in pairs
+                        if (start is not None and pair[0] < start)
+                                or (stop is not None and pair[0] >= stop)]
+            self.assertEqual(sl.delete_range(start, stop), len(pairs) - len(ref))
+            self.check(sl); self.assertEqual(list(sl), ref)
+            self.assertEqual(sl.delete_range(start, stop), 0)
+            self.check(sl); self.assertEqual(list(sl), ref)
+
+    def test_delete_range_random(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        while pairs:
+            start = random.randint(0, 2*size)
+            stop = start + random.randint(0, 20)
+            ref = [pair for pair in pairs if not start <= pair[0] < stop]
+            self.assertEqual(sl.delete_range(start, stop), len(pairs) - len(ref))
+            pairs = ref
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.level, 1)
 
     def test_pop(self):
         size = self.size
@@ -173,40 +528,77 @@ class TestSkipList(TestCase):
             for value in values[key]:
                 self.assertEqual(sl.pop(key), value)
                 pairs.remove((key, value))
-                check(sl); self.assertEqual(list(sl), pairs)
+                self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertRaises(KeyError, sl.pop, key)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertIsNone(sl.pop(key, None))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertEqual(sl.pop(key, -1), -1)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
 
     def test_contains(self):
         size = self.size
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         for key in values:
             self.assertIn(key, sl)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertNotIn(random.randint(3*size, 10*size), sl)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
 
     def test_index(self):
         size = self.size
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         for key in values:
             self.assertEqual(sl.index(key), pairs.index((key, values[key][0])))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertRaises(KeyError, sl.index, random.randint(3*size, 10*size))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
 
     def test_count(self):
         size = self.size
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         for key in values:
             self.assertEqual(sl.count(key), len(values[key]))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertEqual(sl.count(random.randint(3*size, 10*size)), 0)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_count_duplicates(self):
+        sl = self.skiplist.from_sorted([(1, 0)] + [(2, i) for i in range(100)] + [(3, 0)],
+                                  **self.options)
+        self.assertEqual(sl.count(1), 1)
+        self.assertEqual(sl.count(2), 100)
+        self.assertEqual(sl.count(3), 1)
+        self.assertEqual(sl.count(2.5), 0)
+        self.check(sl)
+
+    def test_bisect(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        keys = [pair[0] for pair in pairs]
+        for key in range(-1, size+2):
+            for k in (key, key + 0.5):
+                self.assertEqual(sl.bisect_left(k), bisect.bisect_left(keys, k))
+                self.check(sl); self.assertEqual(list(sl), pairs)
+                self.assertEqual(sl.bisect_right(k), bisect.bisect_right(keys, k))
+                self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_count_range(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        def ref(start, stop):
+            return len([pair for pair in pairs
+                            if (start is None or pair[0] >= start)
+                                    and (stop is None or pair[0] < stop)])
+        for start, stop in ((None, None), (None, 10), (10, None), (10, 90),
+                            (10.1, 90.1), (90, 10), (50, 50), (-1, 1000)):
+            self.assertEqual(sl.count_range(start, stop), ref(start, stop))
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        for i in range(size):
+            start = random.randint(0, size)
+            stop = start + random.randint(0, 10)
+            self.assertEqual(sl.count_range(start, stop), ref(start, stop))
+            self.check(sl); self.assertEqual(list(sl), pairs)
 
     # BY POSITION API ...
 
@@ -215,24 +607,53 @@ class TestSkipList(TestCase):
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         for i in range(size):
             self.assertEqual(sl[i], pairs[i])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertEqual(sl[-i-1], pairs[-i-1])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(IndexError, sl.__getitem__, size)
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(IndexError, sl.__getitem__, -size-1)
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(TypeError, sl.__getitem__, 'foo')
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
 
     def test_getitem_slice(self):
         size = self.size
         sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
         for ix in (slice(None, None), slice(None, 10), slice(10, None),
                    slice(10, 90), slice(10, -10), slice(-10, None),
-                   slice(-10, -1), slice(None, -10), slice(None, -1)):
+                   slice(-10, -1), slice(None, -10), slice(None, -1),
+                   slice(90, 10), slice(-1000, 1000), slice(None, None, 2),
+                   slice(None, None, 3), slice(5, 95, 7), slice(1, None, 30),
+                   slice(None, None, 1000), slice(None, None, -1),
+                   slice(None, None, -2), slice(90, 10, -3), slice(-1, -1000, -1),
+                   slice(None, None, -30), slice(80, None, -41), slice(10, 90, -1)):
             self.assertEqual(list(sl[ix]), pairs[ix])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_take(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        positions = [random.randrange(-size, size) for i in range(size)]
+        self.assertEqual(sl.take(positions), [pairs[pos] for pos in positions])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.take(iter(range(size))), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.take([]), [])
+        self.assertRaises(IndexError, sl.take, [0, size])
+        self.assertRaises(IndexError, sl.take, [-size-1])
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_getitem_slice_step(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+        for i in range(size):
+            start = random.randint(-size, size)
+            stop = random.randint(-size, size)
+            step = random.choice([-1, 1]) * random.randint(1, size)
+            self.assertEqual(list(sl[start:stop:step]), pairs[start:stop:step])
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertRaises(ValueError, sl.__getitem__, slice(None, None, 0))
 
     def test_delitem(self):
         size = self.size
@@ -241,13 +662,26 @@ class TestSkipList(TestCase):
             ix = random.randrange(-len(pairs), len(pairs))
             del sl[ix]
             del pairs[ix]
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertRaises(IndexError, sl.__delitem__, len(pairs))
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
             self.assertRaises(IndexError, sl.__delitem__, -len(pairs)-1)
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(TypeError, sl.__delitem__, 'foo')
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_delitem_slice(self):
+        size = self.size
+        for ix in (slice(None, None), slice(None, 10), slice(10, None),
+                   slice(10, 90), slice(10, -10), slice(-10, None),
+                   slice(-10, -1), slice(None, -10), slice(None, -1),
+                   slice(90, 10), slice(-1000, 1000), slice(None, None, 2),
+                   slice(5, 95, 7), slice(None, None, -1), slice(90, 10, -3),
+                   slice(-1, -1000, -1), slice(None, None, 200)):
+            sl, pairs, values = self._create_skiplist(size, 2*size, 10*size)
+            del sl[ix]
+            del pairs[ix]
+            self.check(sl); self.assertEqual(list(sl), pairs)
 
     def test_setitem(self):
         size = self.size
@@ -255,13 +689,480 @@ class TestSkipList(TestCase):
         for ix, pair in enumerate(pairs):
             sl[ix] = 2*pair[1]
             pairs[ix] = (pair[0], 2*pair[1])
-            check(sl); self.assertEqual(list(sl), pairs)
+            self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(IndexError, sl.__setitem__, size, None)
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(IndexError, sl.__setitem__, -size-1, None)
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
         self.assertRaises(TypeError, sl.__setitem__, 'foo', None)
-        check(sl); self.assertEqual(list(sl), pairs)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+
+class TestSkipListFinger(TestSkipList):
+    """Unit test suite for SkipList with finger search."""
+
+    options = {'finger': True}
+
+
+class TestSkipListAuto(TestSkipList):
+    """Unit test suite for SkipList with an adaptive maximum level."""
+
+    options = {'maxlevel': 'auto'}
+
+    def test_maxlevel_auto(self):
+        sl = SkipList(maxlevel='auto')
+        self.assertEqual(sl.current_maxlevel, 4)
+        self.assertEqual(len(sl._head), 4+3)
+        for i in range(1000):
+            sl.insert(random.randint(0, 1000), i)
+        self.check(sl)
+        # e^7 < 1000 < e^8
+        self.assertEqual(sl.current_maxlevel, 7)
+        self.assertEqual(len(sl._head), 7+3)
+        self.assertEqual(len(sl._path), 7)
+        sl = SkipList.from_sorted(((i, i) for i in range(10000)), maxlevel='auto')
+        self.check(sl); self.assertEqual(sl.current_maxlevel, 10)
+        self.assertEqual(list(sl), [(i, i) for i in range(10000)])
+        sl.clear()
+        self.check(sl); self.assertEqual(sl.current_maxlevel, 10)
+
+    def test_p(self):
+        for p in (0.1, 0.25, 0.5, 0.75):
+            sl = SkipList(p=p)
+            self.assertAlmostEqual(sl.probability, p)
+            for i in range(1000):
+                sl.insert(random.randint(0, 1000), i)
+            self.check(sl)
+        sl = SkipList(p=0.5, maxlevel='auto')
+        for i in range(1000):
+            sl.insert(i, i)
+        self.check(sl); self.assertEqual(sl.current_maxlevel, 10)
+        self.assertRaises(ValueError, SkipList, p=0)
+        self.assertRaises(ValueError, SkipList, p=1)
+
+    def test_maxlevel(self):
+        for maxlevel in (2, 3, 32):
+            sl = SkipList(maxlevel=maxlevel)
+            self.assertEqual(sl.current_maxlevel, maxlevel)
+            for i in range(100):
+                sl.insert(random.randint(0, 100), i)
+            self.check(sl)
+            self.assertLessEqual(sl.level, maxlevel)
+        self.assertRaises(ValueError, SkipList, maxlevel=1)
+        self.assertRaises(ValueError, SkipList, maxlevel='foo')
+
+    def test_options_preserved(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(100)), p=0.25, maxlevel='auto')
+        for copy in (pickle.loads(pickle.dumps(sl)), sl.union(sl)):
+            self.assertEqual(copy.probability, 0.25)
+            self.assertEqual(copy.current_maxlevel, sl.current_maxlevel)
+            self.assertEqual(copy._grow_at, sl._grow_at)
+        sl = SkipList(maxlevel=8)
+        self.assertEqual(pickle.loads(pickle.dumps(sl)).current_maxlevel, 8)
+
+    def test_class_defaults(self):
+        # The class attributes are the defaults for new lists.
+        sl = SkipList()
+        self.assertEqual(sl._p, SkipList.p)
+        self.assertAlmostEqual(sl.probability, 0.3679, places=4)
+        self.assertEqual(sl.current_maxlevel, SkipList.maxlevel)
+        class Subclass(SkipList):
+            p = 1<<29
+            maxlevel = 30
+        sl = Subclass()
+        self.assertEqual(sl.probability, 0.25)
+        self.assertEqual(sl.current_maxlevel, 30)
+        self.assertEqual(sl._kwargs(), {})
+
+
+class TestSkipListGeometric(TestSkipList):
+    """Unit test suite for SkipList with the geometric level generator."""
+
+    options = {'levels': 'geometric'}
+
+    def test_distribution(self):
+        for p in (0.25, 0.5, 0.75):
+            sl = SkipList(p=p, levels='geometric', seed=1)
+            counts = [0] * 4
+            for i in range(10000):
+                level = sl._draw_level(4)
+                counts[level-1] += 1
+            for i in range(3):
+                share = counts[i] / 10000.0
+                expected = p**i * (1 - p) if i < 3 else p**3
+                self.assertAlmostEqual(share, expected, delta=0.03)
+
+    def test_seed(self):
+        def shape(sl):
+            node, levels = sl._head[2], []
+            while node is not sl._tail:
+                levels.append(len(node))
+                node = node[2]
+            return levels
+        for levels in ('random', 'geometric'):
+            lists = []
+            for seed in (42, 42, 43):
+                sl = SkipList(levels=levels, seed=seed)
+                for i in range(self.size):
+                    sl.insert(i, i)
+                lists.append(shape(sl))
+            self.assertEqual(lists[0], lists[1])
+            self.assertNotEqual(lists[0], lists[2])
+        sl = SkipList.from_sorted(((i, i) for i in range(self.size)), seed=42)
+        copy = pickle.loads(pickle.dumps(sl))
+        self.assertEqual(copy._seed, 42)
+        self.assertEqual(shape(copy), shape(sl))
+
+    def test_callable(self):
+        sl = SkipList(levels=lambda: 3)
+        for i in range(self.size):
+            sl.insert(i, i)
+        self.check(sl); self.assertEqual(sl.level, 3)
+        sl = SkipList(levels=lambda: 100, maxlevel=5)
+        for i in range(self.size):
+            sl.insert(i, i)
+        self.check(sl); self.assertEqual(sl.level, 5)
+        self.assertRaises(ValueError, SkipList, levels='foo')
+
+
+class TestSkipListDeterministic(TestSkipList):
+    """Unit test suite for the deterministic 1-2-3 skip list."""
+
+    options = {'levels': 'deterministic'}
+
+    def test_balanced(self):
+        size = 2000
+        for order in ('forward', 'reverse', 'random'):
+            keys = list(range(size))
+            if order == 'reverse':
+                keys.reverse()
+            elif order == 'random':
+                random.shuffle(keys)
+            sl = SkipList(levels='deterministic')
+            for key in keys:
+                sl.insert(key, key)
+            self.check(sl); self.assertEqual(list(sl.keys()), list(range(size)))
+            # log3(2000) < 7 <= log2(2000)
+            self.assertGreaterEqual(sl.level, 7)
+            self.assertLessEqual(sl.level, 11)
+            random.shuffle(keys)
+            for key in keys[:size//2]:
+                sl.remove(key)
+                self.assertLessEqual(sl.level, 11)
+            self.check(sl)
+            self.assertEqual(list(sl.keys()), sorted(keys[size//2:]))
+            for key in keys[size//2:]:
+                sl.remove(key)
+            self.check(sl); self.assertEqual(sl.level, 1)
+
+    def test_from_sorted(self):
+        for size in (1, 2, 3, 9, 10, 27, 100, 1000):
+            sl = SkipList.from_sorted(((i, i) for i in range(size)), levels='deterministic')
+            self.check(sl); self.assertEqual(list(sl.keys()), list(range(size)))
+            sl.update((i, i) for i in range(size))
+            self.check(sl); self.assertEqual(len(sl), 2*size)
+        sl = SkipList(levels='deterministic')
+        sl.insert(10, 10)
+        sl._append_sorted([(11, 11), (12, 12), (13, 13), (14, 14)])
+        self.check(sl); self.assertEqual(list(sl.keys()), list(range(10, 15)))
+
+    def test_maxlevel_auto(self):
+        # With p=0.1 the maximum level would only be raised at 10^4 pairs.
+        sl = SkipList(levels='deterministic', maxlevel='auto', p=0.1)
+        for i in range(1000):
+            sl.insert(i, i)
+        self.check(sl); self.assertGreater(sl.level, 4)
+        self.assertGreater(sl.current_maxlevel, sl.level)
+        sl = SkipList.from_sorted(((i, i) for i in range(1000)), levels='deterministic',
+                                  maxlevel='auto')
+        self.check(sl); self.assertEqual(sl.level, 7)
+
+    def test_small_maxlevel(self):
+        sl = SkipList(levels='deterministic', maxlevel=3)
+        for i in range(1000):
+            sl.insert(random.randint(0, 1000), i)
+        self.check(sl); self.assertEqual(sl.level, 3)
+
+
+class TestSkipListHashIndex(TestSkipList):
+    """Unit test suite for SkipList with a hash index."""
+
+    options = {'hash_index': True}
+
+    def test_duplicates(self):
+        sl = SkipList(hash_index=True)
+        for i in range(3):
+            for key in (1, 2, 3):
+                sl.insert(key, i)
+        self.check(sl)
+        self.assertIs(sl._index[2], sl._head[2][2][2][2])
+        sl.remove(2)
+        self.check(sl); self.assertEqual(sl.search(2), 1)
+        sl.replace(2, 'foo')
+        self.check(sl); self.assertEqual(list(sl.values(2, 3)), ['foo', 2])
+        del sl[4:6]
+        self.check(sl); self.assertEqual(list(sl.keys()), [1, 1, 1, 2, 3, 3])
+        sl.delete_range(2, 3)
+        self.check(sl); self.assertNotIn(2, sl)
+        self.assertEqual(sl.pop(3), 1)
+        self.check(sl); self.assertEqual(sl.search(3), 2)
+        sl.clear()
+        self.check(sl); self.assertEqual(sl._index, {})
+
+    def test_lookup_keeps_path(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(self.size)), hash_index=True)
+        path = sl._path[:]
+        for i in range(self.size):
+            self.assertEqual(sl.search(i), i)
+            self.assertIn(i, sl)
+        self.assertEqual(sl.search_many([3, -1, 5], 'x'), [3, 'x', 5])
+        self.assertRaises(KeyError, sl.remove, -1)
+        self.assertEqual(sl.pop(-1, None), None)
+        self.assertEqual(sl.remove_many([-1, -2]), 0)
+        self.assertEqual(sl._path, path)
+
+    def test_options_preserved(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(10)), hash_index=True)
+        for copy in (pickle.loads(pickle.dumps(sl)), sl.union(sl)):
+            self.assertTrue(copy.hash_index)
+            self.check(copy)
+        self.assertFalse(SkipList().hash_index)
+
+
+class TestSkipListAggregate(TestSkipList):
+    """Unit test suite for SkipList with aggregates."""
+
+    options = {'aggregate': operator.add}
+
+    def test_aggregate(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        def ref(start, stop):
+            return sum(pair[1] for pair in pairs
+                            if (start is None or pair[0] >= start)
+                                    and (stop is None or pair[0] < stop))
+        for start, stop in ((None, None), (None, 10), (10, None), (10, 90),
+                            (10.1, 90.1), (90, 10), (50, 50), (-1, 1000)):
+            self.assertEqual(sl.aggregate(start, stop, 0), ref(start, stop))
+        for i in range(size):
+            start = random.randint(0, size)
+            stop = start + random.randint(0, size//2)
+            self.assertEqual(sl.aggregate(start, stop, 0), ref(start, stop))
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertIsNone(sl.aggregate(-2, -1))
+
+    def test_aggregate_pos(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        for i in range(size):
+            start = random.randint(-size-2, size+2)
+            stop = random.randint(-size-2, size+2)
+            self.assertEqual(sl.aggregate_pos(start, stop, 0),
+                             sum(pair[1] for pair in pairs[start:stop]))
+        prefix = 0
+        for i in range(size+1):
+            self.assertEqual(sl.aggregate_pos(0, i, 0), prefix)
+            if i < size:
+                prefix += pairs[i][1]
+        self.assertEqual(sl.aggregate_pos(), prefix)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+
+    def test_aggregate_changes(self):
+        size = self.size
+        sl, pairs, values = self._create_skiplist(size, size, 10*size)
+        for i in range(size):
+            sl.replace(random.randint(0, size), i)
+            sl[random.randint(0, len(sl)-1)] = i
+            del sl[random.randint(0, len(sl)-1)]
+            sl.insert(random.randint(0, size), i)
+            self.check(sl)
+            self.assertEqual(sl.aggregate(), sum(sl.values()))
+        sl.delete_range(size//4, size//2)
+        del sl[10:20]
+        self.check(sl); self.assertEqual(sl.aggregate(), sum(sl.values()))
+        sl.clear()
+        self.check(sl); self.assertIsNone(sl.aggregate())
+
+    def test_not_commutative(self):
+        sl = self.skiplist(**dict(self.options, aggregate=operator.concat))
+        for i in range(self.size):
+            sl.insert(random.randint(0, 10), str(i))
+        values = list(sl.values())
+        self.check(sl)
+        self.assertEqual(sl.aggregate(3, 7, ''), ''.join(sl.values(3, 7)))
+        self.assertEqual(sl.aggregate_pos(10, -10), ''.join(values[10:-10]))
+
+    def test_min_max(self):
+        pairs = [(i, random.random()) for i in range(self.size)]
+        for func in (min, max):
+            sl = SkipList.from_sorted(pairs, **dict(self.options, aggregate=func))
+            self.check(sl)
+            self.assertEqual(sl.aggregate(20, 80), func(pair[1] for pair in pairs[20:80]))
+
+    def test_aggregate_error(self):
+        # The aggregates are computed before the list is changed, so a value
+        # that cannot be combined leaves the list unchanged.
+        pairs = [(i, i) for i in range(self.size)]
+        sl = SkipList.from_sorted(pairs, **self.options)
+        for key in range(0, self.size//2, 3):
+            self.assertRaises(TypeError, sl.insert, key + 0.5, 'x')
+            self.check(sl); self.assertEqual(list(sl), pairs)
+            self.assertRaises(TypeError, sl.replace, key, 'x')
+            self.check(sl); self.assertEqual(list(sl), pairs)
+            self.assertRaises(TypeError, sl.__setitem__, key, 'x')
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(len(sl), self.size)
+        self.assertEqual(sl.aggregate(0, self.size//2), sum(range(self.size//2)))
+
+    def test_no_aggregate(self):
+        sl = SkipList()
+        self.assertRaises(ValueError, sl.aggregate)
+        self.assertRaises(ValueError, sl.aggregate_pos)
+
+    def test_options_preserved(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(100)), **self.options)
+        for copy in (pickle.loads(pickle.dumps(sl)), sl.union(sl)):
+            self.check(copy)
+            self.assertEqual(copy.aggregate(10, 20), sum(range(10, 20)))
+
+
+class TestSkipListAggregateDeterministic(TestSkipListAggregate):
+    """Unit test suite for a deterministic SkipList with aggregates."""
+
+    options = {'aggregate': operator.add, 'levels': 'deterministic'}
+
+
+class Record(object):
+    """A key with an expensive comparison, for the key function tests."""
+
+    def __init__(self, name, priority):
+        self.name = name
+        self.priority = priority
+
+    def __lt__(self, other):
+        raise AssertionError('records should not be compared')
+
+    __le__ = __lt__
+
+    def __repr__(self):
+        return 'Record({!r}, {!r})'.format(self.name, self.priority)
+
+
+class TestSkipListKey(TestSkipList):
+    """Unit test suite for SkipList with a key function."""
+
+    options = {'key': operator.pos}
+
+    def _create_records(self, size):
+        records = [Record('r{}'.format(i), random.randint(0, size)) for i in range(size)]
+        pairs = [(rec, i) for i, rec in enumerate(records)]
+        sl = SkipList(key=lambda rec: rec.priority)
+        for pair in pairs:
+            sl.insert(*pair)
+        pairs.sort(key=lambda pair: pair[0].priority)
+        return sl, pairs
+
+    def test_key(self):
+        def key(rec):
+            return rec.priority
+        sl = SkipList(key=key)
+        self.assertIs(sl.key, key)
+        self.assertIsNone(SkipList().key)
+
+    def test_key_insert(self):
+        sl, pairs = self._create_records(self.size)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(list(reversed(sl)), pairs[::-1])
+        self.assertEqual([sl[i] for i in range(len(sl))], pairs)
+        self.assertEqual(list(sl[::3]), pairs[::3])
+        self.assertEqual(sl.take([3, 1]), [pairs[3], pairs[1]])
+
+    def test_key_called_once(self):
+        calls = []
+        def key(rec):
+            calls.append(rec)
+            return rec.priority
+        sl = SkipList(key=key)
+        records = [Record(str(i), i % 10) for i in range(self.size)]
+        for rec in records:
+            sl.insert(rec, None)
+        self.assertEqual(calls, records)
+
+    def test_key_search(self):
+        sl, pairs = self._create_records(self.size)
+        for rec, value in pairs:
+            first = min(i for i, pair in enumerate(pairs)
+                            if pair[0].priority == rec.priority)
+            self.assertEqual(sl.search(rec), pairs[first][1])
+            self.assertEqual(sl.search(SortKey(rec.priority)), pairs[first][1])
+            self.assertIn(rec, sl)
+            self.assertIn(SortKey(rec.priority), sl)
+            self.assertEqual(sl.index(rec), first)
+            self.assertEqual(sl.bisect_left(SortKey(rec.priority)), first)
+        self.assertNotIn(SortKey(-1), sl)
+        self.assertIsNone(sl.search(Record('x', -1)))
+        self.assertEqual(sl.search_many([SortKey(-1), pairs[0][0]]), [None, pairs[0][1]])
+
+    def test_key_items(self):
+        sl, pairs = self._create_records(self.size)
+        start, stop = self.size//4, self.size//2
+        ref = [pair for pair in pairs if start <= pair[0].priority < stop]
+        self.assertEqual(list(sl.items(SortKey(start), SortKey(stop))), ref)
+        self.assertEqual(list(sl.items(Record('a', start), Record('b', stop))), ref)
+        self.assertEqual(list(sl.keys(SortKey(start), SortKey(stop))), [p[0] for p in ref])
+        self.assertEqual(list(sl.items(SortKey(start), SortKey(stop), reverse=True)), ref[::-1])
+        self.assertEqual(sl.count_range(SortKey(start), SortKey(stop)), len(ref))
+        self.assertEqual(sl.delete_range(SortKey(start), SortKey(stop)), len(ref))
+        self.check(sl); self.assertEqual(list(sl), [p for p in pairs if p not in ref])
+
+    def test_key_remove(self):
+        sl, pairs = self._create_records(self.size)
+        while pairs:
+            rec, value = pairs[0]
+            if len(pairs) % 2:
+                self.assertEqual(sl.pop(SortKey(rec.priority)), value)
+            else:
+                sl.remove(rec)
+            del pairs[0]
+            self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertRaises(KeyError, sl.remove, SortKey(0))
+        self.assertEqual(sl.pop(Record('x', 0), None), None)
+
+    def test_key_replace(self):
+        sl = SkipList(key=lambda rec: rec.priority)
+        a, b, c = Record('a', 1), Record('b', 1), Record('c', 2)
+        sl.insert(a, 1)
+        sl.replace(b, 2)
+        sl.replace(c, 3)
+        self.check(sl); self.assertEqual(list(sl), [(a, 2), (c, 3)])
+        sl[1] = 4
+        self.check(sl); self.assertEqual(list(sl), [(a, 2), (c, 4)])
+        self.assertEqual(sl.popitem(), (a, 2))
+
+    def test_key_bulk(self):
+        size = self.size
+        def key(rec):
+            return rec.priority
+        records = [Record(str(i), i) for i in range(size)]
+        pairs = [(rec, rec.name) for rec in records]
+        sl = SkipList.from_sorted(pairs, key=key, check=True)
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        sl.append(Record('last', size), None)
+        self.assertRaises(ValueError, sl.append, Record('first', -1), None)
+        sl = SkipList(key=key)
+        sl.update(reversed(pairs))
+        self.check(sl); self.assertEqual(list(sl), pairs)
+        self.assertEqual(sl.remove_many([SortKey(0), records[1], SortKey(-1)]), 2)
+        self.check(sl); self.assertEqual(list(sl), pairs[2:])
+
+    def test_key_tuples(self):
+        sl = SkipList(key=lambda key: key[1])
+        pairs = [((i, -i), i) for i in range(self.size)]
+        for pair in pairs:
+            sl.insert(*pair)
+        self.check(sl); self.assertEqual(list(sl), pairs[::-1])
+        self.assertEqual(sl.search((0, -5)), 5)
+        self.assertEqual(sl.search(SortKey(-5)), 5)
 
 
 class TestSkipListDebug(TestCase):
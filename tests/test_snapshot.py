@@ -0,0 +1,157 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import gc
+import random
+import unittest
+
+from support import TestCase
+from pyskiplist import SkipList, SortKey
+from pyskiplist.skiplist import check
+
+
+class TestSnapshot(TestCase):
+    """Unit test suite for Snapshot."""
+
+    size = 100
+    options = {}
+
+    def _mutate(self, sl, size):
+        # Make a random change to *sl*.
+        op = random.randrange(10)
+        key = random.randint(0, 2*size)
+        if op < 3:
+            sl.insert(key, random.randint(0, 10*size))
+        elif op < 5 and sl:
+            sl.remove(sl[random.randrange(len(sl))][0])
+        elif op == 5:
+            sl.replace(key, random.randint(0, 10*size))
+        elif op == 6 and sl:
+            sl[random.randrange(len(sl))] = -1
+        elif op == 7:
+            sl.delete_range(key, key + random.randint(0, size//10))
+        elif op == 8 and sl:
+            del sl[random.randrange(len(sl))::random.randint(1, 3)]
+        elif op == 9:
+            sl.update((random.randint(0, 2*size), i) for i in range(5))
+
+    def test_empty(self):
+        sl = SkipList(**self.options)
+        snap = sl.snapshot()
+        sl.insert(1, 2)
+        self.assertEqual(list(snap), [])
+        self.assertEqual(len(snap), 0)
+        self.assertFalse(snap)
+        self.assertEqual(repr(snap), 'Snapshot(())')
+
+    def test_snapshot(self):
+        size = self.size
+        sl = SkipList(**self.options)
+        snapshots = []
+        for i in range(20):
+            for j in range(size//5):
+                self._mutate(sl, size)
+            snapshots.append((sl.snapshot(), list(sl)))
+            for snap, pairs in snapshots:
+                self.assertEqual(list(snap), pairs)
+                self.assertEqual(len(snap), len(pairs))
+            check(sl)
+
+    def test_items_range(self):
+        size = self.size
+        sl = SkipList.from_sorted(((i, i) for i in range(0, 2*size, 2)), **self.options)
+        snap = sl.snapshot()
+        pairs = list(sl)
+        for i in range(size):
+            self._mutate(sl, size)
+        for i in range(size):
+            start = random.randint(-1, 2*size+1)
+            stop = random.randint(start, 2*size+2)
+            ref = [pair for pair in pairs if start <= pair[0] < stop]
+            self.assertEqual(list(snap.items(start, stop)), ref)
+            self.assertEqual(list(snap.keys(start)), [p[0] for p in pairs if p[0] >= start])
+            self.assertEqual(list(snap.values(None, stop)), [p[1] for p in pairs if p[0] < stop])
+
+    def test_search(self):
+        size = self.size
+        sl = SkipList.from_sorted(((i, i) for i in range(0, 2*size, 2)), **self.options)
+        snap = sl.snapshot()
+        sl.delete_range(size//2, size)
+        for i in range(0, size, 3):
+            sl.replace(i, -i)
+            sl.insert(i+1, -i)
+        for i in range(2*size):
+            self.assertEqual(snap.search(i), i if i % 2 == 0 else None)
+            self.assertEqual(i in snap, i % 2 == 0)
+
+    def test_iterate_while_changing(self):
+        size = self.size
+        sl = SkipList.from_sorted(((i, i) for i in range(size)), **self.options)
+        pairs = list(sl)
+        result = []
+        with sl.snapshot() as snap:
+            for pair in snap:
+                result.append(pair)
+                self._mutate(sl, size)
+                self._mutate(sl, size)
+        self.assertEqual(result, pairs)
+        check(sl)
+
+    def test_clear(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(self.size)), **self.options)
+        pairs = list(sl)
+        snap = sl.snapshot()
+        sl.clear()
+        sl.insert(1, 1)
+        self.assertEqual(list(snap), pairs)
+
+    def test_key(self):
+        sl = SkipList(key=lambda key: -key, **self.options)
+        for i in range(self.size):
+            sl.insert(i, i)
+        pairs = list(sl)
+        snap = sl.snapshot()
+        sl.replace(10, -1)
+        sl.remove(20)
+        self.assertEqual(list(snap), pairs)
+        self.assertEqual(snap.search(10), 10)
+        self.assertEqual(snap.search(SortKey(-20)), 20)
+        self.assertEqual(list(snap.keys(30, 20)), list(range(30, 20, -1)))
+
+    def test_close(self):
+        sl = SkipList.from_sorted(((i, i) for i in range(self.size)), **self.options)
+        snap1 = sl.snapshot()
+        snap2 = sl.snapshot()
+        sl.remove(10)
+        log = sl._log
+        self.assertEqual(len(log.hung), 1)
+        snap1.close()
+        self.assertEqual(len(log.hung), 1)
+        snap1.close()
+        self.assertRaises(ValueError, list, snap1)
+        del snap2
+        gc.collect()
+        self.assertEqual(len(log.hung), 0)
+        sl.remove(20)
+        self.assertEqual(len(log.hung), 0)
+        snap = sl.snapshot()
+        sl.remove(30)
+        self.assertEqual(len(log.hung), 1)
+        self.assertNotIn(30, list(sl.keys()))
+        self.assertIn(30, list(snap.keys()))
+
+
+class TestSnapshotFinger(TestSnapshot):
+    """Unit test suite for Snapshot with finger search."""
+
+    options = {'finger': True}
+
+
+if __name__ == '__main__':
+    unittest.main()
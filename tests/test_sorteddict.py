@@ -0,0 +1,202 @@
+#
+# This file is part of PySkiplist. PySkiplist is Copyright (c) 2012-2015 by
+# the PySkiplist authors.
+#
+# PySkiplist is free software available under the MIT license. See the file
+# named LICENSE distributed with this file for the exact licensing terms.
+
+from __future__ import absolute_import, print_function
+
+import pickle
+import random
+import operator
+import unittest
+
+from support import TestCase
+from pyskiplist import SortedDict, SortKey
+from pyskiplist.skiplist import check
+
+
+def last(x, y):
+    """An associative function that works for values of any type."""
+    return y
+
+
+class TestSortedDict(TestCase):
+    """Unit test suite for SortedDict."""
+
+    size = 100
+    options = {}
+
+    def _create_dict(self, size):
+        sd = SortedDict(**self.options)
+        ref = {}
+        for i in range(size):
+            key, value = random.randint(0, 2*size), random.randint(0, 10*size)
+            sd[key] = value
+            ref[key] = value
+        return sd, ref
+
+    def test_setitem(self):
+        sd, ref = self._create_dict(self.size)
+        check(sd._list)
+        self.assertEqual(list(sd), sorted(ref))
+        self.assertEqual(len(sd), len(ref))
+        for key in ref:
+            self.assertEqual(sd[key], ref[key])
+            self.assertIn(key, sd)
+        self.assertRaises(KeyError, sd.__getitem__, -1)
+        self.assertNotIn(-1, sd)
+        self.assertEqual(sd, ref)
+
+    def test_delitem(self):
+        sd, ref = self._create_dict(self.size)
+        for key in list(ref):
+            del sd[key]
+            del ref[key]
+            check(sd._list); self.assertEqual(sd, ref)
+            self.assertRaises(KeyError, sd.__delitem__, key)
+        self.assertEqual(len(sd), 0)
+        self.assertFalse(sd)
+
+    def test_get_setdefault(self):
+        sd, ref = self._create_dict(self.size)
+        for key in range(-1, 2*self.size+2):
+            self.assertEqual(sd.get(key), ref.get(key))
+            self.assertEqual(sd.get(key, 'foo'), ref.get(key, 'foo'))
+            self.assertEqual(sd.setdefault(key, key), ref.setdefault(key, key))
+        check(sd._list); self.assertEqual(sd, ref)
+        self.assertEqual(sd.setdefault(2*self.size+10), None)
+        self.assertIsNone(sd[2*self.size+10])
+
+    def test_pop(self):
+        sd, ref = self._create_dict(self.size)
+        for key in range(-1, 2*self.size+2):
+            self.assertEqual(sd.pop(key, None), ref.pop(key, None))
+        check(sd._list); self.assertEqual(len(sd), 0)
+        self.assertRaises(KeyError, sd.pop, 1)
+
+    def test_popitem_peekitem(self):
+        sd, ref = self._create_dict(self.size)
+        items = sorted(ref.items())
+        self.assertEqual(sd.peekitem(), items[-1])
+        self.assertEqual(sd.peekitem(0), items[0])
+        self.assertEqual(sd.popitem(), items.pop())
+        self.assertEqual(sd.popitem(0), items.pop(0))
+        self.assertEqual(sd.popitem(3), items.pop(3))
+        self.assertEqual(sd.popitem(-2), items.pop(-2))
+        check(sd._list); self.assertEqual(list(sd.items()), items)
+        self.assertRaises(IndexError, sd.peekitem, len(items))
+        self.assertRaises(IndexError, sd.popitem, len(items))
+        sd.clear()
+        self.assertRaises(KeyError, sd.popitem)
+
+    def test_index(self):
+        sd, ref = self._create_dict(self.size)
+        for ix, key in enumerate(sorted(ref)):
+            self.assertEqual(sd.index(key), ix)
+            self.assertEqual(sd.peekitem(ix), (key, ref[key]))
+        self.assertRaises(KeyError, sd.index, -1)
+
+    def test_views(self):
+        sd, ref = self._create_dict(self.size)
+        keys, values, items = sd.keys(), sd.values(), sd.items()
+        self.assertEqual(list(keys), sorted(ref))
+        self.assertEqual(list(values), [ref[key] for key in sorted(ref)])
+        self.assertEqual(list(items), sorted(ref.items()))
+        self.assertEqual(list(reversed(sd)), sorted(ref, reverse=True))
+        self.assertEqual(list(reversed(items)), sorted(ref.items(), reverse=True))
+        self.assertEqual(len(keys), len(ref))
+        self.assertIn(next(iter(ref.items())), items)
+        self.assertNotIn((-1, None), items)
+        self.assertEqual(keys & {-1, next(iter(ref))}, {next(iter(ref))})
+        # Views are live.
+        sd[-1] = 'foo'
+        self.assertEqual(next(iter(keys)), -1)
+        self.assertEqual(next(iter(values)), 'foo')
+
+    def test_update(self):
+        sd, ref = self._create_dict(self.size)
+        pairs = [(random.randint(0, 3*self.size), i) for i in range(self.size)]
+        sd.update(pairs)
+        ref.update(pairs)
+        check(sd._list); self.assertEqual(sd, ref)
+        sd.update({1: 'foo', 2: 'bar'})
+        ref.update({1: 'foo', 2: 'bar'})
+        self.assertEqual(sd, ref)
+        sd = SortedDict()
+        sd.update(foo=1, bar=2)
+        self.assertEqual(list(sd.items()), [('bar', 2), ('foo', 1)])
+        self.assertRaises(TypeError, sd.update, {}, {})
+        # The last value of a duplicate key is kept.
+        sd = SortedDict([(1, 'a'), (2, 'b'), (1, 'c')], **self.options)
+        self.assertEqual(list(sd.items()), [(1, 'c'), (2, 'b')])
+
+    def test_repr(self):
+        sd = SortedDict({2: 'b', 1: 'a'}, **self.options)
+        self.assertEqual(repr(sd), "SortedDict(((1, 'a'), (2, 'b')))")
+
+    def test_pickle(self):
+        sd, ref = self._create_dict(self.size)
+        copy = pickle.loads(pickle.dumps(sd))
+        self.assertIsInstance(copy, SortedDict)
+        check(copy._list); self.assertEqual(copy, ref)
+        sd = SortedDict.from_sorted(sorted(ref.items()), **self.options)
+        check(sd._list); self.assertEqual(sd, ref)
+
+    def test_from_sorted(self):
+        sd = SortedDict.from_sorted([(1, 'a'), (1, 'b'), (2, 'c'), (2, 'd'), (3, 'e')],
+                                    check=True, **self.options)
+        check(sd._list); self.assertEqual(list(sd.items()), [(1, 'b'), (2, 'd'), (3, 'e')])
+        self.assertEqual(len(sd), 3)
+        sd = SortedDict.from_sorted([1, 2, 2], 'abc', **self.options)
+        check(sd._list); self.assertEqual(list(sd.items()), [(1, 'a'), (2, 'c')])
+        self.assertRaises(ValueError, SortedDict.from_sorted, [(2, 'a'), (1, 'b')],
+                          check=True, **self.options)
+
+
+class TestSortedDictFinger(TestSortedDict):
+    """Unit test suite for SortedDict with finger search."""
+
+    options = {'finger': True}
+
+
+class TestSortedDictHashIndex(TestSortedDict):
+    """Unit test suite for SortedDict with a hash index."""
+
+    options = {'hash_index': True}
+
+
+class TestSortedDictAggregate(TestSortedDict):
+    """Unit test suite for SortedDict with a hash index and aggregates."""
+
+    options = {'hash_index': True, 'aggregate': last}
+
+    def test_aggregate(self):
+        sd, ref = self._create_dict(self.size)
+        sd[3*self.size] = 'foo'
+        self.assertEqual(sd._list.aggregate(), 'foo')
+        sd[3*self.size] = 'bar'
+        check(sd._list); self.assertEqual(sd._list.aggregate(), 'bar')
+
+
+class TestSortedDictKey(TestSortedDict):
+    """Unit test suite for SortedDict with a key function."""
+
+    options = {'key': operator.pos}
+
+    def test_key(self):
+        sd = SortedDict({-3: 'a', 1: 'b', -2: 'c'}, key=abs)
+        self.assertEqual(list(sd), [1, -2, -3])
+        # Keys with the same sort key are the same key.
+        sd[3] = 'd'
+        self.assertEqual(list(sd.items()), [(1, 'b'), (-2, 'c'), (-3, 'd')])
+        self.assertEqual(sd[3], 'd')
+        self.assertEqual(sd[SortKey(2)], 'c')
+        self.assertEqual(sd.setdefault(-1, 'e'), 'b')
+        self.assertEqual(sd.pop(2), 'c')
+        self.assertEqual(sd.index(-3), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()